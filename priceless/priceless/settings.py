@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -84,6 +85,46 @@ DATABASES = {
     }
 }
 
+# PRAGMAs applied to each SQLite connection, matching the profiles used by the scraper's Database class
+# "concurrent" uses WAL so searches can run while the scraper is writing, "default" keeps SQLite's own settings
+SQLITE_PROFILES = {
+    'default': {},
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'concurrent')
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Search results are cached in the 'search' cache, in memory or in files depending on SEARCH_CACHE_BACKEND
+# Entries don't need to expire quickly, as the scraper's catalogue generation is part of every key
+
+SEARCH_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'search_cache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': dict(SEARCH_CACHE_BACKENDS[os.environ.get('SEARCH_CACHE_BACKEND', 'locmem')],
+                   TIMEOUT=24 * 60 * 60, OPTIONS={'MAX_ENTRIES': 5000}),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
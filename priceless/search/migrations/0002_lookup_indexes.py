@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+# The scraper may already have created these indexes on the shared database, so only create them if they're missing
+create_indexes = [
+    'CREATE INDEX IF NOT EXISTS ix_categories_name ON supermarket_categories (supermarket_category_name)',
+    'CREATE INDEX IF NOT EXISTS ix_products_name ON supermarket_products (product_name)',
+    'CREATE INDEX IF NOT EXISTS ix_allergens_product_allergen '
+    'ON supermarket_product_allergens (supermarket_product_id, allergen)',
+]
+drop_indexes = [
+    'DROP INDEX IF EXISTS ix_categories_name',
+    'DROP INDEX IF EXISTS ix_products_name',
+    'DROP INDEX IF EXISTS ix_allergens_product_allergen',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(sql, reverse_sql=reverse_sql)
+                for sql, reverse_sql in zip(create_indexes, drop_indexes)
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='supermarketcategories',
+                    index=models.Index(fields=['supermarket_category_name'], name='ix_categories_name'),
+                ),
+                migrations.AddIndex(
+                    model_name='supermarketproducts',
+                    index=models.Index(fields=['product_name'], name='ix_products_name'),
+                ),
+                migrations.AddIndex(
+                    model_name='supermarketproductallergens',
+                    index=models.Index(fields=['supermarket_product', 'allergen'], name='ix_allergens_product_allergen'),
+                ),
+            ],
+        ),
+    ]
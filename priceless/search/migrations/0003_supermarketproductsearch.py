@@ -0,0 +1,51 @@
+import django.db.models.deletion
+import search.models
+from django.db import migrations, models
+
+
+# The same full-text index and triggers the scraper creates, so whichever runs first builds them
+create_search_index = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS supermarket_products_fts USING fts5(product_name, "
+    "content='supermarket_products', content_rowid='id', tokenize='unicode61 remove_diacritics 2', "
+    "prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_insert AFTER INSERT ON supermarket_products BEGIN "
+    "INSERT INTO supermarket_products_fts (rowid, product_name) VALUES (new.id, new.product_name); END",
+    "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_delete AFTER DELETE ON supermarket_products BEGIN "
+    "INSERT INTO supermarket_products_fts (supermarket_products_fts, rowid, product_name) "
+    "VALUES ('delete', old.id, old.product_name); END",
+    "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_update AFTER UPDATE OF product_name "
+    "ON supermarket_products WHEN old.product_name IS NOT new.product_name BEGIN "
+    "INSERT INTO supermarket_products_fts (supermarket_products_fts, rowid, product_name) "
+    "VALUES ('delete', old.id, old.product_name); "
+    "INSERT INTO supermarket_products_fts (rowid, product_name) VALUES (new.id, new.product_name); END",
+    "INSERT INTO supermarket_products_fts (supermarket_products_fts) VALUES ('rebuild')",
+]
+drop_search_index = [
+    'DROP TRIGGER IF EXISTS supermarket_products_fts_insert',
+    'DROP TRIGGER IF EXISTS supermarket_products_fts_delete',
+    'DROP TRIGGER IF EXISTS supermarket_products_fts_update',
+    'DROP TABLE IF EXISTS supermarket_products_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_search_index, reverse_sql=drop_search_index),
+        migrations.CreateModel(
+            name='SupermarketProductSearch',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='search.supermarketproducts')),
+                ('product_name', search.models.MatchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'supermarket_products_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_supermarketproductsearch'),
+    ]
+
+    operations = [
+        # The scraper also creates this table, so only create it if it's missing
+        migrations.RunSQL(
+            'CREATE TABLE IF NOT EXISTS catalogue_generation '
+            '(id INTEGER NOT NULL PRIMARY KEY, generation INTEGER NOT NULL, updated_at DATETIME NOT NULL)',
+            reverse_sql='DROP TABLE IF EXISTS catalogue_generation',
+        ),
+        migrations.CreateModel(
+            name='CatalogueGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.IntegerField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'catalogue_generation',
+                'managed': False,
+            },
+        ),
+    ]
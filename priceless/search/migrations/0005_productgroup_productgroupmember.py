@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The scraper builds these tables after each run and also creates them, so only create them if they're missing
+create_product_groups = [
+    'CREATE TABLE IF NOT EXISTS product_groups (id INTEGER NOT NULL PRIMARY KEY, group_key VARCHAR NOT NULL UNIQUE, '
+    'product_name VARCHAR NOT NULL, member_count INTEGER NOT NULL, '
+    'cheapest_product_id INTEGER NOT NULL REFERENCES supermarket_products (id), cheapest_price FLOAT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS product_group_members '
+    '(supermarket_product_id INTEGER NOT NULL PRIMARY KEY REFERENCES supermarket_products (id), '
+    'product_group_id INTEGER NOT NULL REFERENCES product_groups (id))',
+    'CREATE INDEX IF NOT EXISTS ix_group_members_group ON product_group_members (product_group_id)',
+]
+drop_product_groups = [
+    'DROP TABLE IF EXISTS product_group_members',
+    'DROP TABLE IF EXISTS product_groups',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_cataloguegeneration'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_product_groups, reverse_sql=drop_product_groups),
+        migrations.CreateModel(
+            name='ProductGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_key', models.CharField(max_length=100, unique=True)),
+                ('product_name', models.CharField(max_length=100)),
+                ('member_count', models.IntegerField()),
+                ('cheapest_price', models.FloatField()),
+            ],
+            options={
+                'db_table': 'product_groups',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductGroupMember',
+            fields=[
+                ('product', models.OneToOneField(db_column='supermarket_product_id', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='group_membership', serialize=False, to='search.supermarketproducts')),
+            ],
+            options={
+                'db_table': 'product_group_members',
+                'managed': False,
+            },
+        ),
+    ]
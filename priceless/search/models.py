@@ -1,3 +1,5 @@
+import re
+
 from django.db import models
 
 
@@ -18,6 +20,31 @@ class SupermarketCategories(models.Model):
 
     class Meta:
         db_table = 'supermarket_categories'
+        indexes = [models.Index(fields=['supermarket_category_name'], name='ix_categories_name')]
+
+
+class MatchField(models.TextField):
+    # A column of an FTS5 table, which can be searched with the match lookup
+    pass
+
+
+@MatchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SupermarketProductsQuerySet(models.QuerySet):
+    def search(self, query):
+        # Products whose names contain every word of the query as a prefix, using the full-text index
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return self.none()
+        return self.filter(search_entry__product_name__match=' '.join(f'"{word}"*' for word in words))
 
 
 class SupermarketProducts(models.Model):
@@ -30,8 +57,24 @@ class SupermarketProducts(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField()
 
+    objects = SupermarketProductsQuerySet.as_manager()
+
     class Meta:
         db_table = 'supermarket_products'
+        indexes = [models.Index(fields=['product_name'], name='ix_products_name')]
+
+
+# Full-text index over product names, an FTS5 table kept in step with supermarket_products by triggers
+# rank is FTS5's BM25 score for the current match, where lower is more relevant
+class SupermarketProductSearch(models.Model):
+    product = models.OneToOneField(SupermarketProducts, on_delete=models.DO_NOTHING, primary_key=True,
+                                   db_column='rowid', related_name='search_entry')
+    product_name = MatchField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'supermarket_products_fts'
 
 
 class SupermarketProductDetails(models.Model):
@@ -56,4 +99,39 @@ class SupermarketProductAllergens(models.Model):
 
     class Meta:
         db_table = 'supermarket_product_allergens'
+        indexes = [models.Index(fields=['supermarket_product', 'allergen'], name='ix_allergens_product_allergen')]
 
+
+# Products from different supermarkets that are the same item, rebuilt by the scraper after each run along with the
+# group's cheapest product
+class ProductGroup(models.Model):
+    group_key = models.CharField(max_length=100, unique=True)
+    product_name = models.CharField(max_length=100)
+    member_count = models.IntegerField()
+    cheapest_product = models.ForeignKey(SupermarketProducts, on_delete=models.DO_NOTHING, related_name='+')
+    cheapest_price = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'product_groups'
+
+
+class ProductGroupMember(models.Model):
+    product = models.OneToOneField(SupermarketProducts, on_delete=models.DO_NOTHING, primary_key=True,
+                                   db_column='supermarket_product_id', related_name='group_membership')
+    group = models.ForeignKey(ProductGroup, on_delete=models.DO_NOTHING, db_column='product_group_id',
+                              related_name='members')
+
+    class Meta:
+        managed = False
+        db_table = 'product_group_members'
+
+
+# Counts the scraper's runs, so cached search results from before the latest run can be ignored
+class CatalogueGeneration(models.Model):
+    generation = models.IntegerField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'catalogue_generation'
@@ -0,0 +1,56 @@
+import hashlib
+import re
+
+from django.core.cache import caches
+
+from .models import CatalogueGeneration
+
+HITS_KEY = 'search:hits'
+MISSES_KEY = 'search:misses'
+
+
+def get_search_cache():
+    return caches['search']
+
+
+def get_catalogue_generation():
+    # Number of scraper runs so far, which changes whenever new products land
+    return CatalogueGeneration.objects.filter(id=1).values_list('generation', flat=True).first() or 0
+
+
+def get_cache_key(query, allergens, page_size, cursor):
+    # Searches differing only in case, spacing or punctuation share a key, as do users with the same allergens
+    normalised_query = ' '.join(re.findall(r'\w+', query.lower()))
+    parts = [normalised_query, ','.join(sorted(allergens)), str(page_size), cursor or '']
+    digest = hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+    return f'search:{get_catalogue_generation()}:{digest}'
+
+
+def get_cached_results(key):
+    # Cached page of results for a key, counting the lookup as a hit or a miss
+    results = get_search_cache().get(key)
+    increment(HITS_KEY if results is not None else MISSES_KEY)
+    return results
+
+
+def cache_results(key, results):
+    get_search_cache().set(key, results)
+
+
+def increment(key):
+    search_cache = get_search_cache()
+    search_cache.add(key, 0, timeout=None)
+    try:
+        search_cache.incr(key)
+    except ValueError:
+        # The counter was evicted between adding and incrementing it
+        search_cache.set(key, 1, timeout=None)
+
+
+def get_statistics():
+    search_cache = get_search_cache()
+    hits = search_cache.get(HITS_KEY, 0)
+    misses = search_cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0,
+            'generation': get_catalogue_generation()}
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def apply_sqlite_profile(sender, connection, **kwargs):
+    # Run the selected profile's PRAGMAs on each new SQLite connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PROFILES[settings.SQLITE_PROFILE].items():
+            cursor.execute(f'PRAGMA {name} = {value}')
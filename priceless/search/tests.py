@@ -1,3 +1,300 @@
-from django.test import TestCase
+import html
+import re
+import tempfile
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Allergen, Choice, CustomUser
+from shopping_list.views import query_matching_products
+from .models import (Supermarkets, SupermarketCategories, SupermarketProducts, SupermarketProductAllergens,
+                     CatalogueGeneration, ProductGroup, ProductGroupMember)
+
 
 # Create your tests here.
+class IndexTests(TestCase):
+    def assertUsesIndex(self, queryset, index_name):
+        # Check SQLite plans the queryset's query using the given index
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn(index_name, plan, msg=f'Query should use an index: {sql}')
+
+    def test_category_name_lookup_uses_index(self):
+        self.assertUsesIndex(SupermarketCategories.objects.filter(supermarket_category_name='bakery'),
+                             'ix_categories_name')
+
+    def test_matching_products_use_index(self):
+        self.assertUsesIndex(query_matching_products(SupermarketProducts(id=1), 1), 'ix_group_members_group')
+
+    def test_allergen_check_uses_index(self):
+        self.assertUsesIndex(SupermarketProductAllergens.objects.filter(supermarket_product_id=1,
+                                                                        allergen__in=['Milk', 'Egg']),
+                             'ix_allergens_product_allergen')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        supermarket = Supermarkets.objects.create(supermarket_name='Aldi', supermarket_logo='aldi.png',
+                                                  supermarket_base_url='https://groceries.aldi.co.uk')
+        category = SupermarketCategories.objects.create(supermarket=supermarket, supermarket_category_name='bakery',
+                                                        supermarket_category_part_url='/en-GB/bakery')
+        for name, price in [('Warburtons Toastie White Bread 800G', 1.45), ('Breaded Chicken Goujons', 2.99),
+                            ('Bread', 0.75), ('Semi Skimmed Milk', 1.25)]:
+            SupermarketProducts.objects.create(supermarket_category=category, product_name=name, product_price=price,
+                                               product_image=f'{name}.jpg', product_part_url=f'/{name}',
+                                               is_available=True)
+        cls.user = CustomUser.objects.create_user(username='shopper', password='password')
+
+    def setUp(self):
+        caches['search'].clear()
+
+    def test_search_matches_word_prefixes(self):
+        names = SupermarketProducts.objects.search('bread').values_list('product_name', flat=True)
+        self.assertEqual({'Warburtons Toastie White Bread 800G', 'Breaded Chicken Goujons', 'Bread'}, set(names))
+        self.assertFalse(SupermarketProducts.objects.search('  ').exists())
+
+    def test_search_ranks_closest_match_first(self):
+        products = SupermarketProducts.objects.search('bread').order_by('search_entry__rank')
+        self.assertEqual('Bread', products.first().product_name)
+
+    def test_search_index_follows_renames(self):
+        SupermarketProducts.objects.filter(product_name='Semi Skimmed Milk').update(product_name='Whole Milk')
+        self.assertTrue(SupermarketProducts.objects.search('whole').exists())
+        self.assertFalse(SupermarketProducts.objects.search('skimmed').exists())
+
+    def test_search_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'query': 'bre'})
+        names = [name for name, products in response.context['grouped_results_without_allergens']]
+        self.assertEqual(3, len(names))
+        self.assertNotIn('Semi Skimmed Milk', names)
+
+    def test_search_view_hides_delisted_products(self):
+        SupermarketProducts.objects.filter(product_name='Bread').update(is_available=False)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'query': 'bre'})
+        names = [name for name, products in response.context['grouped_results_without_allergens']]
+        self.assertEqual(['Warburtons Toastie White Bread 800G', 'Breaded Chicken Goujons'], names)
+
+    def test_search_view_marks_cheapest_in_group(self):
+        # Another supermarket sells the same bread for less
+        morrisons = Supermarkets.objects.create(supermarket_name='Morrisons', supermarket_logo='morrisons.png',
+                                                supermarket_base_url='https://groceries.morrisons.com')
+        category = SupermarketCategories.objects.create(supermarket=morrisons, supermarket_category_name='Bakery',
+                                                        supermarket_category_part_url='/bakery')
+        aldi_bread = SupermarketProducts.objects.get(product_name='Bread')
+        morrisons_bread = SupermarketProducts.objects.create(supermarket_category=category, product_name='Bread',
+                                                             product_price=0.65, product_image='bread.jpg',
+                                                             product_part_url='/bread', is_available=True)
+        group = ProductGroup.objects.create(group_key='bread', product_name='Bread', member_count=2,
+                                            cheapest_product=morrisons_bread, cheapest_price=0.65)
+        ProductGroupMember.objects.create(product=aldi_bread, group=group)
+        ProductGroupMember.objects.create(product=morrisons_bread, group=group)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'query': 'bread'})
+        grouped_results = dict(response.context['grouped_results_without_allergens'])
+
+        self.assertEqual([morrisons_bread, aldi_bread], grouped_results['Bread'])
+        self.assertEqual([True, False], [product.is_cheaper for product in grouped_results['Bread']])
+
+    def test_search_view_query_count_is_constant(self):
+        # Give the user an allergen which some of the matching products contain
+        milk = Allergen.objects.create(name='Milk')
+        Choice.objects.create(user=self.user, allergen=milk, chosen=True)
+        category = SupermarketCategories.objects.get()
+        self.client.force_login(self.user)
+
+        query_counts = []
+        for count in [3, 30]:
+            for number in range(count):
+                product = SupermarketProducts.objects.create(
+                    supermarket_category=category, product_name=f'Cheese {count} {number}', product_price=number,
+                    product_image=f'{count}-{number}.jpg', product_part_url=f'/cheese/{count}/{number}',
+                    is_available=True)
+                if number % 2:
+                    SupermarketProductAllergens.objects.create(supermarket_product=product, allergen='Milk')
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('search'), {'query': f'cheese {count}'})
+            query_counts.append(len(queries))
+
+            # Check the allergen flag and product links were still worked out for every result
+            with_allergens = response.context['grouped_results_with_allergens']
+            without_allergens = response.context['grouped_results_without_allergens']
+            self.assertEqual(count // 2, len(with_allergens))
+            self.assertEqual(count - count // 2, len(without_allergens))
+            self.assertEqual(f'https://groceries.aldi.co.uk/cheese/{count}/0', without_allergens[0][1][0].product_url)
+
+        self.assertEqual(query_counts[0], query_counts[1], msg='The number of queries should not grow with results')
+
+
+class SearchPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        supermarket = Supermarkets.objects.create(supermarket_name='Aldi', supermarket_logo='aldi.png',
+                                                  supermarket_base_url='https://groceries.aldi.co.uk')
+        bakery = SupermarketCategories.objects.create(supermarket=supermarket, supermarket_category_name='bakery',
+                                                      supermarket_category_part_url='/en-GB/bakery')
+        offers = SupermarketCategories.objects.create(supermarket=supermarket, supermarket_category_name='offers',
+                                                      supermarket_category_part_url='/en-GB/offers')
+
+        # Several products share a price, so pages have to be split between products with the same price
+        for number in range(25):
+            SupermarketProducts.objects.create(supermarket_category=bakery, product_name=f'Bread {number}',
+                                               product_price=number // 3, product_image=f'{number}.jpg',
+                                               product_part_url=f'/bread/{number}', is_available=True)
+
+        # The same product stored again under a second category
+        SupermarketProducts.objects.create(supermarket_category=offers, product_name='Bread 0', product_price=0,
+                                           product_image='0.jpg', product_part_url='/bread/0', is_available=True)
+        cls.user = CustomUser.objects.create_user(username='shopper', password='password')
+
+    def setUp(self):
+        caches['search'].clear()
+        self.client.force_login(self.user)
+
+    def get_page(self, **parameters):
+        response = self.client.get(reverse('search'), dict(query='bread', **parameters))
+        names = [name for name, products in response.context['grouped_results_without_allergens']]
+        return names, response.context['next_cursor']
+
+    def test_pages_cover_every_result_once(self):
+        names, cursor = self.get_page(page_size=10)
+        pages = [names]
+        while cursor:
+            names, cursor = self.get_page(page_size=10, after=cursor)
+            pages.append(names)
+
+        self.assertEqual([10, 10, 5], [len(page) for page in pages])
+        all_names = [name for page in pages for name in page]
+        self.assertEqual(sorted(f'Bread {number}' for number in range(25)), sorted(all_names),
+                         msg='Every product should be shown once, without the copy in the second category')
+
+    def test_page_size_is_bounded(self):
+        names, cursor = self.get_page(page_size=0)
+        self.assertEqual(1, len(names))
+        names, cursor = self.get_page(page_size='many')
+        self.assertEqual(25, len(names))
+        self.assertIsNone(cursor)
+
+    def test_streamed_page_matches_rendered_page(self):
+        rendered = self.client.get(reverse('search'), {'query': 'bread', 'page_size': 10})
+        streamed = self.client.get(reverse('search'), {'query': 'bread', 'page_size': 10, 'stream': 1})
+        content = b''.join(streamed.streaming_content).decode()
+
+        for name, products in rendered.context['grouped_results_without_allergens']:
+            self.assertIn(f'<h3>{name}</h3>', content)
+        self.assertEqual(10, content.count('<h3>'))
+        self.assertIn(f'after={rendered.context["next_cursor"]}', content)
+
+    def test_streamed_next_page_stays_streamed(self):
+        response = self.client.get(reverse('search'), {'query': 'bread', 'page_size': 10, 'stream': 1})
+        headings = []
+        pages = 0
+        while response is not None:
+            self.assertTrue(response.streaming, msg='Every page reached from a streamed page should be streamed')
+            content = b''.join(response.streaming_content).decode()
+            headings += re.findall(r'<h3>(.*?)</h3>', content)
+            pages += 1
+
+            next_link = re.search(r'href="(\?[^"]*)">Next page</a>', content)
+            response = None
+            if next_link:
+                self.assertIn('stream=1', next_link.group(1))
+                response = self.client.get(reverse('search') + html.unescape(next_link.group(1)))
+
+        self.assertEqual(3, pages)
+        self.assertEqual(sorted(f'Bread {number}' for number in range(25)), sorted(headings))
+
+    def test_streamed_page_groups_products(self):
+        bread = SupermarketProducts.objects.filter(product_name__in=['Bread 1', 'Bread 4']).order_by('id')
+        group = ProductGroup.objects.create(group_key='bread', product_name='Sliced Bread', member_count=2,
+                                            cheapest_product=bread[0], cheapest_price=bread[0].product_price)
+        for product in bread:
+            ProductGroupMember.objects.create(product=product, group=group)
+
+        rendered = self.client.get(reverse('search'), {'query': 'bread', 'page_size': 10})
+        streamed = self.client.get(reverse('search'), {'query': 'bread', 'page_size': 10, 'stream': 1})
+        content = b''.join(streamed.streaming_content).decode()
+
+        self.assertEqual([name for name, products in rendered.context['grouped_results_without_allergens']],
+                         re.findall(r'<h3>(.*?)</h3>', content),
+                         msg='Grouped products should be streamed together under the group, in the rendered order')
+        self.assertEqual(1, content.count('<h3>Sliced Bread</h3>'))
+
+
+class SearchCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        supermarket = Supermarkets.objects.create(supermarket_name='Aldi', supermarket_logo='aldi.png',
+                                                  supermarket_base_url='https://groceries.aldi.co.uk')
+        category = SupermarketCategories.objects.create(supermarket=supermarket, supermarket_category_name='bakery',
+                                                        supermarket_category_part_url='/en-GB/bakery')
+        product = SupermarketProducts.objects.create(supermarket_category=category, product_name='Milk Loaf',
+                                                     product_price=1.0, product_image='loaf.jpg',
+                                                     product_part_url='/loaf', is_available=True)
+        SupermarketProductAllergens.objects.create(supermarket_product=product, allergen='Milk')
+        cls.milk = Allergen.objects.create(name='Milk')
+        cls.user = CustomUser.objects.create_user(username='shopper', password='password')
+        cls.staff = CustomUser.objects.create_user(username='staff', password='password', is_staff=True)
+
+    def setUp(self):
+        caches['search'].clear()
+        self.client.force_login(self.user)
+
+    def search(self, query='milk'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('search'), {'query': query})
+        product_queries = [query for query in queries if 'supermarket_products_fts' in query['sql']]
+        return response, len(product_queries)
+
+    def test_repeated_search_is_cached(self):
+        response, product_queries = self.search('Milk')
+        self.assertEqual(1, product_queries)
+
+        # The same search, written differently, should be answered from the cache
+        response, product_queries = self.search('  milk!')
+        self.assertEqual(0, product_queries)
+        self.assertEqual(1, len(response.context['grouped_results_without_allergens']))
+
+    def test_allergens_are_part_of_the_key(self):
+        self.search()
+        Choice.objects.create(user=self.user, allergen=self.milk, chosen=True)
+
+        response, product_queries = self.search()
+        self.assertEqual(1, product_queries, msg='A different allergen set should not share cached results')
+        self.assertEqual(1, len(response.context['grouped_results_with_allergens']))
+
+    def test_new_catalogue_generation_invalidates_cache(self):
+        self.search()
+        CatalogueGeneration.objects.create(id=1, generation=1, updated_at='2026-01-01T00:00:00Z')
+
+        response, product_queries = self.search()
+        self.assertEqual(1, product_queries, msg='Results cached before the scraper ran should not be used')
+
+    def test_statistics(self):
+        self.search()
+        self.search()
+        self.client.force_login(self.staff)
+
+        statistics = self.client.get(reverse('search_cache_statistics')).json()
+        self.assertEqual({'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'generation': 0}, statistics)
+
+    def test_file_based_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        file_cache = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name}
+
+        with override_settings(CACHES={'default': file_cache, 'search': file_cache}):
+            self.search()
+            response, product_queries = self.search()
+
+        self.assertEqual(0, product_queries)
+        self.assertEqual('Milk Loaf', response.context['grouped_results_without_allergens'][0][0])
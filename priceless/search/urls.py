@@ -2,5 +2,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.search_view, name='search')
+    path('', views.search_view, name='search'),
+    path('cache-statistics/', views.search_cache_statistics, name='search_cache_statistics'),
 ]
\ No newline at end of file
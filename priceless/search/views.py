@@ -1,99 +1,241 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Exists, OuterRef, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 
 from accounts.models import Choice
-from .models import Supermarkets, SupermarketCategories, SupermarketProducts, SupermarketProductAllergens
+from .models import SupermarketProducts, SupermarketProductAllergens
+from .result_cache import get_cache_key, get_cached_results, cache_results, get_statistics
 
 from urllib.parse import urljoin
-import itertools
 
 
 # Create your views here.
 
+# Number of results shown per page when the request doesn't ask for a page size, and the most it can ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Placeholder the streamed page is split on, where each section's results are written as they're fetched
+STREAM_MARKER = '<!-- search results -->'
+
+
 def search_view(request):
     if request.method == 'GET':
         query = request.GET.get('query')
 
         if query:
-            # Query the database for products matching the search query
-            all_results = SupermarketProducts.objects.filter(product_name__icontains=query).order_by('product_price')
+            page_size = get_page_size(request)
+            cursor = parse_cursor(request.GET.get('after'))
+            context = {'query': query, 'page_size': page_size}
 
-            # Remove duplicates that are caused by products being in multiple distinct categories
-            unique_results = []
-            seen_pairs = set()
+            # Retrieve the user's selected allergen information, which is part of the cache key
+            user_allergens = list(Choice.objects.filter(user=request.user,
+                                                        chosen=True).values_list('allergen__name', flat=True))
+            cache_key = get_cache_key(query, user_allergens, page_size,
+                                      format_cursor(*cursor) if cursor is not None else None)
+            results = get_search_page(query, user_allergens, page_size, cursor, cache_key)
 
-            for result in all_results:
-                # Product name and image together are unique as the image contains identifying supermarket link
-                pair = (result.product_name, result.product_image)
-                if pair not in seen_pairs:
-                    unique_results.append(result)
-                    seen_pairs.add(pair)
+            if request.GET.get('stream'):
+                context['stream'] = True
+                return StreamingHttpResponse(stream_search_results(request, results, context))
 
-            # Retrieve the user's selected allergen information
-            user_allergens = Choice.objects.filter(user=request.user,
-                                                   chosen=True).values_list('allergen__name', flat=True)
+            results = list(results)
+            context['next_cursor'] = get_next_cursor(results, page_size)
 
             # Filter search results based on the user's allergens
             results_without_allergens = []
             results_with_allergens = []
 
-            for result in unique_results:
-                supermarket_category = result.supermarket_category
-
-                if supermarket_category:
-                    supermarket = supermarket_category.supermarket
-
-                    if supermarket:
-                        result.logo_url = supermarket.supermarket_logo
-
-                contains_allergen = SupermarketProductAllergens.objects.filter(
-                    supermarket_product_id=result.id,
-                    allergen__in=user_allergens
-                ).exists()
+            for result in results[:page_size]:
+                add_supermarket_details(result)
 
-                if contains_allergen:
+                if result.contains_allergen:
                     results_with_allergens.append(result)
                 else:
                     results_without_allergens.append(result)
 
             # Group and compare prices of search results
-            grouped_results_without_allergens = compare_prices(results_without_allergens)
-            grouped_results_with_allergens = compare_prices(results_with_allergens)
-
-            # Calculate product URL for each result without allergens
-            for grouped_result in grouped_results_without_allergens:
-                for product in grouped_result[1]:  # Accessing the list of products in each grouped result
-                    supermarket_category = SupermarketCategories.objects.get(id=product.supermarket_category_id)
-                    if supermarket_category:
-                        supermarket = Supermarkets.objects.get(id=supermarket_category.supermarket_id)
-                        if supermarket:
-                            product.product_url = urljoin(supermarket.supermarket_base_url, product.product_part_url)
-
-            # Calculate product URL for each result with allergens
-            for grouped_result in grouped_results_with_allergens:
-                for product in grouped_result[1]:  # Accessing the list of products in each grouped result
-                    supermarket_category = SupermarketCategories.objects.get(id=product.supermarket_category_id)
-                    if supermarket_category:
-                        supermarket = Supermarkets.objects.get(id=supermarket_category.supermarket_id)
-                        if supermarket:
-                            product.product_url = urljoin(supermarket.supermarket_base_url, product.product_part_url)
-
-            return render(request, 'search_results.html',
-                          {'grouped_results_with_allergens': grouped_results_with_allergens,
-                           'grouped_results_without_allergens': grouped_results_without_allergens,
-                           'query': query})
+            context['grouped_results_without_allergens'] = compare_prices(results_without_allergens)
+            context['grouped_results_with_allergens'] = compare_prices(results_with_allergens)
+
+            return render(request, 'search_results.html', context)
+
+
+@staff_member_required
+def search_cache_statistics(request):
+    # Hit and miss counts for the search result cache
+    return JsonResponse(get_statistics())
+
+
+def get_search_page(query, user_allergens, page_size, cursor, cache_key):
+    # A page of search results, plus one more if there is a next page, from the cache if this search has been run
+    # since the scraper last ran, otherwise read from the database as they're needed and then cached
+    cached_results = get_cached_results(cache_key)
+    if cached_results is not None:
+        yield from cached_results
+        return
+
+    # Query the full-text index for products matching the search query, ordered by price, fetching each
+    # product's supermarket and whether it contains one of the user's allergens in the same query
+    results = search_products(query, user_allergens)
+
+    # Keyset pagination carries on from the last result of the previous page
+    if cursor is not None:
+        after_price, after_id = cursor
+        results = results.filter(Q(product_price__gt=after_price) | Q(product_price=after_price, id__gt=after_id))
+
+    page = []
+    for result in results[:page_size + 1].iterator(chunk_size=page_size + 1):
+        page.append(result)
+        yield result
+    cache_results(cache_key, page)
+
+
+def search_products(query, user_allergens):
+    # Products matching a search in price order, with their supermarkets and allergen flag fetched in one query
+    # Products in several categories can be stored more than once, so only the first copy of each is kept
+    # Products the scraper no longer finds listed are left out, while rows stored before it tracked this are kept
+    earlier_copies = SupermarketProducts.objects.filter(product_name=OuterRef('product_name'),
+                                                        product_image=OuterRef('product_image'),
+                                                        id__lt=OuterRef('id'))
+
+    return SupermarketProducts.objects.search(query).select_related(
+        'supermarket_category__supermarket', 'group_membership__group'
+    ).annotate(
+        contains_allergen=Exists(SupermarketProductAllergens.objects.filter(
+            supermarket_product=OuterRef('pk'),
+            allergen__in=user_allergens
+        ))
+    ).filter(
+        Q(is_available=True) | Q(is_available__isnull=True), ~Exists(earlier_copies)
+    ).order_by('product_price', 'id')
+
+
+def stream_search_results(request, results, context):
+    # Render the page around the results first, then write each result as it is read from the database
+    head, between_sections, before_pagination, tail = render_to_string(
+        'search_results.html', dict(context, stream_marker=STREAM_MARKER), request
+    ).split(STREAM_MARKER)
+    page_size = context['page_size']
+    yield head
+
+    # Results with allergens are shown after those without, so they are held back until the first section is done
+    results_with_allergens = []
+    last_result = None
+    count = 0
+
+    # Results are grouped as compare_prices groups them, where each group is written once every product in it and
+    # in the groups before it has been read, and groups with products on other pages are written at the end
+    pending_groups = {}
+
+    for result in results:
+        # The extra result only shows there is a next page, but is still read so the page gets cached
+        count += 1
+        if count > page_size:
+            continue
+
+        add_supermarket_details(result)
+        last_result = result
+
+        if result.contains_allergen:
+            results_with_allergens.append(result)
+            continue
+
+        key, name, member_count = get_price_group(result)
+        pending_groups.setdefault(key, (name, [], member_count))[1].append(result)
+        while pending_groups:
+            key = next(iter(pending_groups))
+            name, products, member_count = pending_groups[key]
+            if len(products) < member_count:
+                break
+            del pending_groups[key]
+            yield render_search_result(request, name, products)
+
+    for name, products, member_count in pending_groups.values():
+        yield render_search_result(request, name, products)
+
+    yield between_sections
+    for name, products in compare_prices(results_with_allergens):
+        yield render_search_result(request, name, products)
+
+    yield before_pagination
+    if count > page_size:
+        yield render_to_string('search_pagination.html',
+                               dict(context, next_cursor=format_cursor(last_result.product_price, last_result.id)),
+                               request)
+    yield tail
+
+
+def render_search_result(request, name, products):
+    # Render a streamed product group, or a single product that isn't in one
+    return render_to_string('search_result.html', {'name': name, 'products': products}, request)
+
+
+def add_supermarket_details(result):
+    # Add the supermarket's logo and the product's page on the supermarket's site to a search result
+    supermarket = result.supermarket_category.supermarket
+    result.logo_url = supermarket.supermarket_logo
+    result.product_url = urljoin(supermarket.supermarket_base_url, result.product_part_url)
+
+
+def get_page_size(request):
+    # Number of results to show, from the page_size parameter if it is a sensible number
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def parse_cursor(cursor):
+    # Price and id of the last result on the previous page, from a cursor written by format_cursor
+    if not cursor:
+        return None
+    try:
+        price, product_id = cursor.split('_')
+        return float(price), int(product_id)
+    except ValueError:
+        return None
+
+
+def format_cursor(price, product_id):
+    return f'{price!r}_{product_id}'
+
+
+def get_next_cursor(results, page_size):
+    # Cursor for the next page, if more results were fetched than fit on this one
+    if len(results) > page_size:
+        return format_cursor(results[page_size - 1].product_price, results[page_size - 1].id)
+    return None
 
 
 def compare_prices(results):
-    grouped_results = []
-    for name, group in itertools.groupby(results, key=lambda x: (x.product_name, x.product_image)):
-        products = list(group)
-        if len(products) > 1:
-            cheapest_product = min(products, key=lambda x: x.product_price)
-            for product in products:
-                product.is_cheaper = product == cheapest_product
-        else:
-            products[0].is_cheaper = True
-        grouped_results.append((name[0], products))  # Using name[0] to extract product name
-    return grouped_results
+    # Group results by their product group, marking each product that is the cheapest in its group across every
+    # supermarket, as worked out by the scraper
+    grouped_results = {}
+    for product in results:
+        key, name, member_count = get_price_group(product)
+        grouped_results.setdefault(key, (name, []))[1].append(product)
+    return list(grouped_results.values())
+
+
+def get_price_group(product):
+    # Key, name and size of the product group a result is compared within, marking the result if it is the group's
+    # cheapest product
+    try:
+        group = product.group_membership.group
+    except ObjectDoesNotExist:
+        # Products added since the scraper last built the groups are compared with nothing
+        group = None
+
+    if group is None:
+        product.is_cheaper = True
+        return ('product', product.id), product.product_name, 1
+
+    product.is_cheaper = group.cheapest_product_id == product.id
+    return ('group', group.id), group.product_name, group.member_count
@@ -1,3 +1,57 @@
 from django.test import TestCase
 
+from accounts.models import CustomUser
+from search.models import Supermarkets, SupermarketCategories, SupermarketProducts, ProductGroup, ProductGroupMember
+from .models import ShoppingListItem
+from .views import compare_supermarkets, find_matching_products
+
+
 # Create your tests here.
+class CompareSupermarketsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='shopper', password='password')
+        cls.supermarkets = []
+        products = []
+        for name, price in [('Aldi', 0.75), ('Morrisons', 0.65), ('Iceland', 0.85)]:
+            supermarket = Supermarkets.objects.create(supermarket_name=name, supermarket_logo=f'{name}.png',
+                                                      supermarket_base_url=f'https://{name}.example')
+            category = SupermarketCategories.objects.create(supermarket=supermarket, supermarket_category_name='bakery',
+                                                            supermarket_category_part_url='/bakery')
+            products.append(SupermarketProducts.objects.create(supermarket_category=category,
+                                                               product_name=f'{name} White Bread 800g',
+                                                               product_price=price, product_image=f'{name}.jpg',
+                                                               product_part_url='/bread', is_available=True))
+            cls.supermarkets.append(supermarket)
+
+        # The scraper grouped Aldi's and Morrisons' bread together, but not Iceland's
+        group = ProductGroup.objects.create(group_key='white bread 800g', product_name='White Bread 800g',
+                                            member_count=2, cheapest_product=products[1], cheapest_price=0.65)
+        for product in products[:2]:
+            ProductGroupMember.objects.create(product=product, group=group)
+        cls.products = products
+
+    def test_find_matching_products_uses_groups(self):
+        matching_products = find_matching_products(self.products[0], self.supermarkets[0].id)
+        self.assertEqual([self.products[1]], list(matching_products))
+
+    def test_compare_supermarkets(self):
+        ShoppingListItem.objects.create(user=self.user, product=self.products[0], product_price=0.75)
+        comparison_results, supermarket_names = compare_supermarkets(
+            ShoppingListItem.objects.filter(user=self.user), self.supermarkets[0].id)
+
+        self.assertEqual({self.supermarkets[0].id: 0.75, self.supermarkets[1].id: 0.65},
+                         comparison_results['Aldi White Bread 800g'])
+
+    def test_find_matching_products_one_per_supermarket(self):
+        # A group built before each group was limited to one product per supermarket may hold two of Morrisons' loaves
+        group = ProductGroup.objects.get(group_key='white bread 800g')
+        category = self.products[1].supermarket_category
+        dearer_product = SupermarketProducts.objects.create(supermarket_category=category,
+                                                            product_name='Morrisons Thick White Bread 800g',
+                                                            product_price=0.95, product_image='Morrisons.jpg',
+                                                            product_part_url='/thick-bread', is_available=True)
+        ProductGroupMember.objects.create(product=dearer_product, group=group)
+
+        matching_products = find_matching_products(self.products[0], self.supermarkets[0].id)
+        self.assertEqual([self.products[1]], list(matching_products))
@@ -58,15 +58,22 @@ def remove_from_shopping_list(request, item_id):
     return redirect('shopping_list')
 
 
-def find_matching_products(product_name, current_supermarket_id):
-    # Query for products from other supermarkets with the same name
-    matching_products = SupermarketProducts.objects.filter(
-        product_name=product_name
+def query_matching_products(product, current_supermarket_id):
+    # Query for products from other supermarkets in the same product group, built by the scraper after each run
+    return SupermarketProducts.objects.filter(
+        group_membership__group__members__product=product
     ).exclude(
         supermarket_category__supermarket_id=current_supermarket_id
-    ).distinct()
+    ).select_related('supermarket_category').order_by('supermarket_category__supermarket_id', 'product_price', 'id')
 
-    return matching_products
+
+def find_matching_products(product, current_supermarket_id):
+    # Keep only the cheapest matching product from each supermarket, so one list item is never priced as several
+    cheapest_products = {}
+    for matching_product in query_matching_products(product, current_supermarket_id):
+        cheapest_products.setdefault(matching_product.supermarket_category.supermarket_id, matching_product)
+
+    return list(cheapest_products.values())
 
 
 def compare_supermarkets(shopping_list, current_supermarket_id):
@@ -84,9 +91,9 @@ def compare_supermarkets(shopping_list, current_supermarket_id):
         shopping_lists[current_supermarket_id].append(item)
 
         # Query for alternative versions of the product from other supermarkets
-        matching_products = find_matching_products(item.product.product_name, current_supermarket_id)
+        matching_products = find_matching_products(item.product, current_supermarket_id)
         for product in matching_products:
-            shopping_lists[product.supermarket_category.supermarket.id].append(product)
+            shopping_lists[product.supermarket_category.supermarket_id].append(product)
 
         # Calculate total value for each supermarket's shopping list
         for supermarket_id, products in shopping_lists.items():
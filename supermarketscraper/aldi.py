@@ -1,8 +1,9 @@
 import logging
 import unicodedata
-import re
 
-from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+
+from readiness import ReadinessCondition, SelectorReady
 from supermarkets import Supermarkets
 
 log = logging.getLogger(__name__)
@@ -22,7 +23,7 @@ class Aldi(Supermarkets):
 
     def filter_categories(self, html: str | None) -> list:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "category")
             supermarket_categories = []
 
             try:
@@ -56,7 +57,7 @@ class Aldi(Supermarkets):
 
     def filter_products(self, html: str | None) -> list:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "listing")
             supermarket_category_products = []
 
             try:
@@ -65,7 +66,7 @@ class Aldi(Supermarkets):
 
                     # Extract product name
                     for product_name in divtag.find('a', {'class': 'p text-default-font'}):
-                        product['name'] = product_name
+                        product['name'] = str(product_name)
 
                     # Extract product price
                     for product_price in divtag.find('span', {'class': 'h4'}):
@@ -98,30 +99,27 @@ class Aldi(Supermarkets):
 
     def filter_product_details(self, html: str | None) -> dict | None:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "detail")
             allergy_list = []
 
             try:
                 for table_row in soup.find('tbody'):
+                    row_text = table_row.get_text()
 
                     # Extract product allergens
-                    if "Ingredients" in table_row.get_text():
-                        ingredients_text = table_row.get_text().replace("Ingredients", "").strip()
+                    if "Ingredients" in row_text:
+                        ingredients_text = row_text.replace("Ingredients", "").strip()
                         ingredients_text = unicodedata.normalize("NFKC", ingredients_text)
-                        for allergen in self.get_allergens():
-                            if ingredients_text.lower().find(allergen) >= 0:
-                                allergy_list.append(allergen)
+                        allergy_list.extend(self.find_allergens(ingredients_text))
 
-                    if "Allergy advice" in table_row.get_text():
-                        allergy_text = table_row.get_text().replace("Allergy advice", "").strip()
-                        for allergen in self.get_allergens():
-                            if allergy_text.lower().find(allergen) >= 0:
-                                allergy_list.append(allergen)
-                        allergy_list = list(set(allergy_list))
+                    if "Allergy advice" in row_text:
+                        allergy_text = row_text.replace("Allergy advice", "").strip()
+                        allergy_list.extend(self.find_allergens(allergy_text))
+                        allergy_list = list(dict.fromkeys(allergy_list))
 
                     # Extract product nutritional values
-                    if "Nutrition information" in table_row.get_text():
-                        nutrition_text = table_row.get_text().replace("Nutrition information", "").strip()
+                    if "Nutrition information" in row_text:
+                        nutrition_text = row_text.replace("Nutrition information", "").strip()
                         values = self.format_nutritional_information(nutrition_text)
                         product_details = self.assign_product_values(values, allergy_list)
                         if product_details is None:
@@ -140,7 +138,7 @@ class Aldi(Supermarkets):
         # List to store formatted nutritional values
         formatted_values = []
         # Extract matches from the nutrition text using a regular expression
-        matches = re.findall(self.nutrition_pattern, nutrition_text)
+        matches = self.nutrition_pattern.findall(nutrition_text)
 
         if matches:
             # Check if the number of matches is valid
@@ -152,16 +150,16 @@ class Aldi(Supermarkets):
                 # Default value for missing nutritional information
                 default_value = 0
 
-                for label in nutritional_labels:
+                for index, label in enumerate(nutritional_labels):
                     # Check if the label is for energy (kJ or kcal)
                     if label == "energy_kj" or label == "energy_kcal":
                         try:
-                            value = matches[nutritional_labels.index(label)][2].lower()
+                            value = matches[index][2].lower()
 
                             if value == '':
                                 # Log a warning if the value is empty
                                 log.warning(
-                                    f"Value for {nutritional_labels[nutritional_labels.index(label) + 1]} may be "
+                                    f"Value for {nutritional_labels[index + 1]} may be "
                                     f"incorrect")
                                 raise ValueError
 
@@ -179,7 +177,7 @@ class Aldi(Supermarkets):
                     else:
                         try:
                             # Extract the value for the current label then format it and add it to the list
-                            value = matches[nutritional_labels.index(label)][1]
+                            value = matches[index][1]
                             formatted_value = str(value).replace("<", "").strip()
                             formatted_values.append(formatted_value)
                         except IndexError:
@@ -201,3 +199,31 @@ class Aldi(Supermarkets):
         # Regular expression pattern to match nutritional information
         return (r"(Fat|of which saturates|Carbohydrate|of which sugars|Fibre|Protein|Salt)(\s+[<]?\d+[.]?\d+|\s+\d+)|("
                 r"\d+[.]?[kK][jJ]|\d+[.]?kcal)")
+
+    def get_parse_regions(self, page_type: str) -> list:
+        # Aldi's filter methods only read the category menu, the product tiles and the product details table
+        if page_type == "category":
+            return [('li', 'submenu')]
+        elif page_type == "listing":
+            return [('div', 'product-tile')]
+        return [('tbody', None)]
+
+    def get_fetch_strategy(self, page_type: str) -> str:
+        # Aldi renders its menu, product tiles and nutrition tables on the server
+        return "http"
+
+    def get_html_markers(self, page_type: str) -> list:
+        # Aldi pages are only usable once they contain the elements their filter methods read
+        if page_type == "category":
+            return ['submenu']
+        elif page_type == "listing":
+            return ['product-tile']
+        return ['<tbody']
+
+    def get_readiness_condition(self, page_type: str) -> ReadinessCondition:
+        # Each Aldi page type renders a known element once its content has loaded
+        if page_type == "category":
+            return SelectorReady(By.CSS_SELECTOR, "li.submenu")
+        elif page_type == "listing":
+            return SelectorReady(By.CLASS_NAME, "product-tile")
+        return SelectorReady(By.TAG_NAME, "tbody")
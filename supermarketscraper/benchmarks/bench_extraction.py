@@ -0,0 +1,65 @@
+import re
+import timeit
+from pathlib import Path
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from tesco import Tesco
+
+fixtures = Path(__file__).parent.parent / "tests" / "fixtures"
+
+ingredients = ("Wheat Flour (Wheat Flour, Calcium Carbonate, Iron, Niacin, Thiamin), Water, Yeast, Salt, Soya Flour, "
+               "Preservative: Calcium Propionate, Emulsifiers: Mono- and Diacetyl Tartaric Acid Esters of Mono- and "
+               "Diglycerides of Fatty Acids, Vegetable Oil (Rapeseed Oil), Flour Treatment Agent: Ascorbic Acid. "
+               "May also contain Sesame, Milk and Barley.")
+nutrition = ("Energy 1046kJ 247kcal Fat 2.1g of which saturates 0.5g Carbohydrate 45.6g of which sugars 3.2g "
+             "Fibre 2.8g Protein 9.1g Salt 1.00g")
+nutritional_labels = ["energy_kj", "energy_kcal", "fat", "fat_sat", "carb", "sugars", "fibre", "protein", "salt"]
+
+
+def find_allergens_before(aldi: Aldi, text: str) -> list:
+    # The previous behaviour, rebuilding the allergen list and searching the lowercased text once per allergen
+    allergy_list = []
+    for allergen in aldi.get_allergens():
+        if text.lower().find(allergen) >= 0:
+            allergy_list.append(allergen)
+    return allergy_list
+
+
+def match_nutrition_before(aldi: Aldi, text: str) -> list:
+    # The previous behaviour, passing the raw pattern to re.findall and looking up each label's position
+    matches = re.findall(aldi.get_nutrition_pattern(), text)
+    return [matches[nutritional_labels.index(label)] for label in nutritional_labels]
+
+
+def match_nutrition_after(aldi: Aldi, text: str) -> list:
+    matches = aldi.nutrition_pattern.findall(text)
+    return [matches[index] for index, label in enumerate(nutritional_labels)]
+
+
+def main() -> None:
+    # Time the per-product allergen and nutrition extraction before and after compiling the patterns once
+    calls = 20000
+    aldi = Aldi()
+
+    long_ingredients = ingredients * 8
+    for name, before, after in [
+        ("allergens", lambda: find_allergens_before(aldi, ingredients), lambda: aldi.find_allergens(ingredients)),
+        ("allergens in a long ingredients list", lambda: find_allergens_before(aldi, long_ingredients),
+         lambda: aldi.find_allergens(long_ingredients)),
+        ("nutrition", lambda: match_nutrition_before(aldi, nutrition), lambda: match_nutrition_after(aldi, nutrition)),
+    ]:
+        before_time = timeit.timeit(before, number=calls) / calls
+        after_time = timeit.timeit(after, number=calls) / calls
+        print(f"{name:<36} before {before_time * 1e6:7.2f} us, after {after_time * 1e6:7.2f} us per product")
+
+    # The whole of each supermarket's detail extraction, including parsing the page
+    for supermarket in [aldi, Morrisons(), Iceland(), Tesco()]:
+        html = (fixtures / f"{supermarket.name.lower()}_detail.html").read_text(encoding="utf-8")
+        detail_time = timeit.timeit(lambda: supermarket.filter_product_details(html), number=200) / 200
+        print(f"{supermarket.name:<10} filter_product_details {detail_time * 1000:6.2f} ms per product")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import random
+import time
+
+from matcher import ProductMatcher
+
+brands = [f"Brand{number:04d}" for number in range(2000)]
+words = ["bread", "milk", "chicken", "white", "wholemeal", "organic", "cheddar", "butter", "yoghurt", "apple",
+         "orange", "juice", "pasta", "rice", "beans", "soup", "tomato", "potato", "crisps", "chocolate"]
+sizes = ["100g", "250g", "400g", "500g", "800g", "1kg", "500ml", "1L", "2 Litre", "4 x 125g", "6 pack"]
+
+
+def make_products(items: int, generator: random.Random) -> list:
+    # Each item is sold by three supermarkets, each naming it slightly differently
+    products = []
+    for item in range(items):
+        brand = generator.choice(brands)
+        description = generator.sample(words, 3)
+        size = generator.choice(sizes)
+
+        for supermarket_id in [1, 2, 3]:
+            name_words = list(description)
+            if generator.random() < 0.5:
+                name_words.insert(generator.randrange(len(name_words) + 1), generator.choice(words))
+            name = f"{brand} {' '.join(name_words)} {size}"
+            products.append({"id": len(products) + 1, "name": name.upper() if supermarket_id == 3 else name,
+                             "supermarket_id": supermarket_id, "item": item})
+    return products
+
+
+def main() -> None:
+    # Time matching as the catalogue grows, and how many matches pair up the same item
+    generator = random.Random(0)
+    for items in [10_000, 40_000]:
+        products = make_products(items, generator)
+        items_by_id = {product["id"]: product["item"] for product in products}
+
+        start_time = time.perf_counter()
+        matches = ProductMatcher().match(products)
+        match_time = time.perf_counter() - start_time
+
+        confident = [match for match in matches if match["confidence"] >= 0.7]
+        correct = sum(items_by_id[match["product_id"]] == items_by_id[match["matched_product_id"]]
+                      for match in confident)
+        print(f"{len(products):>7} products: {match_time:6.1f} s, {len(matches)} matches, "
+              f"{len(confident)} confident of which {correct / max(len(confident), 1):.1%} are the same item, "
+              f"{len(confident) / (items * 3):.1%} of the {items * 3} true pairs found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import time
+from pathlib import Path
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from parse_pool import ParsePool, filter_page
+from tesco import Tesco
+
+fixtures = Path(__file__).parent.parent / "tests" / "fixtures"
+
+
+def main() -> None:
+    # Compare the rate listing and detail pages are filtered on one thread against a pool of parser processes
+    supermarkets = [Aldi(), Morrisons(), Iceland(), Tesco()]
+    pages = []
+    for supermarket in supermarkets:
+        for file_type, page_type in [("listing", "listing"), ("detail", "detail")]:
+            html = (fixtures / f"{supermarket.name.lower()}_{file_type}.html").read_text(encoding="utf-8")
+            pages.append((supermarket, page_type, html))
+    pages = pages * 50
+
+    start_time = time.monotonic()
+    for supermarket, page_type, html in pages:
+        filter_page(supermarket, page_type, html)
+    print(f"{'this thread':<12} {len(pages) / (time.monotonic() - start_time):7.1f} pages per second")
+
+    cpu_count = os.cpu_count() or 1
+    for workers in sorted({1, max(1, cpu_count // 2), cpu_count}):
+        pool = ParsePool(supermarkets, workers=workers)
+        # Start the workers before timing, as spawning them takes longer than parsing a page
+        pool.parse(*pages[0])
+
+        start_time = time.monotonic()
+        futures = [pool.submit(supermarket, page_type, html) for supermarket, page_type, html in pages]
+        for future in futures:
+            future.result()
+        elapsed = time.monotonic() - start_time
+        pool.close()
+
+        print(f"{f'pool of {workers}':<12} {len(pages) / elapsed:7.1f} pages per second, "
+              f"at most {pool.max_in_flight} pages in flight, {pool.get_statistics()['waits']} waits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import timeit
+import tracemalloc
+from pathlib import Path
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from parser_engines import is_available, preferred_engines
+from tesco import Tesco
+
+fixtures = Path(__file__).parent.parent / "tests" / "fixtures"
+
+
+def measure(parse, calls: int) -> tuple:
+    # Time a parse and find the most memory it allocates at once
+    parse_time = timeit.timeit(parse, number=calls) / calls
+    tracemalloc.start()
+    parse()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return parse_time, peak_memory
+
+
+def main() -> None:
+    # Compare parsing each saved page whole against parsing only the regions its filter method reads
+    calls = 50
+    engines = [engine for engine in preferred_engines if is_available(engine)]
+
+    for engine in engines:
+        print(f"{engine}:")
+        for supermarket in [Aldi(), Morrisons(), Iceland(), Tesco()]:
+            supermarket.parser_engine = engine
+
+            for file_type, page_type in [("categories", "category"), ("listing", "listing"), ("detail", "detail")]:
+                html = (fixtures / f"{supermarket.name.lower()}_{file_type}.html").read_text(encoding="utf-8")
+                whole_time, whole_memory = measure(lambda: supermarket.parse_html(html), calls)
+                region_time, region_memory = measure(lambda: supermarket.parse_html(html, page_type), calls)
+
+                print(f"  {supermarket.name + ' ' + page_type:<20} whole page {whole_time * 1000:6.2f} ms "
+                      f"{whole_memory / 1024:7.0f} KiB, regions {region_time * 1000:6.2f} ms "
+                      f"{region_memory / 1024:7.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
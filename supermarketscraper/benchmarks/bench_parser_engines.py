@@ -0,0 +1,35 @@
+import timeit
+from pathlib import Path
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from parser_engines import is_available, preferred_engines
+from tesco import Tesco
+
+fixtures = Path(__file__).parent.parent / "tests" / "fixtures"
+
+
+def main() -> None:
+    # Time each supermarket's filter methods on the fixture pages with every installed parser engine
+    calls = 50
+    engines = [engine for engine in preferred_engines if is_available(engine)]
+    print(f"{'page':<22}" + "".join(f"{engine:>14}" for engine in engines))
+
+    for supermarket in [Aldi(), Morrisons(), Iceland(), Tesco()]:
+        filter_methods = {"categories": supermarket.filter_categories, "listing": supermarket.filter_products,
+                          "detail": supermarket.filter_product_details}
+
+        for page_type, filter_method in filter_methods.items():
+            html = (fixtures / f"{supermarket.name.lower()}_{page_type}.html").read_text(encoding="utf-8")
+            times = []
+            for engine in engines:
+                supermarket.parser_engine = engine
+                times.append(timeit.timeit(lambda: filter_method(html), number=calls) / calls)
+
+            print(f"{supermarket.name + ' ' + page_type:<22}"
+                  + "".join(f"{time * 1000:11.2f} ms" for time in times))
+
+
+if __name__ == "__main__":
+    main()
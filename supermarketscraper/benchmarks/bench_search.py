@@ -0,0 +1,49 @@
+import random
+import tempfile
+import timeit
+
+import sqlalchemy as db
+
+from database import Database
+
+words = ["bread", "milk", "chicken", "white", "wholemeal", "organic", "cheddar", "butter", "yoghurt", "apple",
+         "orange", "juice", "pasta", "rice", "beans", "soup", "tomato", "potato", "crisps", "chocolate"]
+
+
+def add_products(database: Database, count: int) -> None:
+    # Add randomly named products straight into the table, which the triggers add to the search index
+    # Brands have around 20 products each, so a brand search matches about as many products at any catalogue size
+    generator = random.Random(count)
+    rows = [
+        {"supermarket_category_id": 1,
+         "product_name": f"Brand{generator.randrange(count // 20):06d} {' '.join(generator.sample(words, 3))}",
+         "product_price": 1.0, "product_image": "", "product_part_url": f"/p/{number}", "is_available": True}
+        for number in range(count)
+    ]
+    with database.session as session:
+        session.execute(db.insert(database.get_table_object("supermarket_products")), rows)
+        session.commit()
+
+
+def main() -> None:
+    # Compare searching with LIKE against the full-text index as the catalogue grows
+    calls = 20
+    for count in [10_000, 100_000, 300_000]:
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(f"sqlite:///{directory}/benchmark.db")
+            add_products(database, count)
+
+            like = db.text("SELECT id FROM supermarket_products WHERE product_name LIKE :query "
+                           "ORDER BY product_price LIMIT 50")
+            for query, pattern in [("brand000042", "%brand000042 %"), ("brand000042 bre", "%brand000042 %bre%")]:
+                like_time = timeit.timeit(lambda: database.session.execute(like, {"query": pattern}).all(),
+                                          number=calls)
+                fts_time = timeit.timeit(lambda: database.search_products(query), number=calls)
+
+                print(f"{count:>7} products, {query!r:>19}: LIKE {like_time / calls * 1000:8.2f} ms, "
+                      f"FTS5 {fts_time / calls * 1000:8.2f} ms per search")
+            database.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
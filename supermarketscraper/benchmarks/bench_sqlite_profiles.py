@@ -0,0 +1,79 @@
+import multiprocessing
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from database import Database, sqlite_profiles
+
+
+def scrape(database: Database, categories: int, products_per_category: int, cycle: int) -> None:
+    # Write pages of products the way a scrape cycle does, one transaction per page
+    for category in range(categories):
+        database.add_supermarket_category_products({
+            "supermarket_category_id": category + 1,
+            "supermarket_category_products": [
+                {'name': f'Bread {category} {number}', 'price': 1.0 + cycle + number / 100,
+                 'image': f'{number}.jpg', 'part_url': f'/p/{category}/{number}'}
+                for number in range(products_per_category)
+            ]
+        })
+
+
+def search(path: str, profile: str, stop, results) -> None:
+    # Run the web app's search query in a loop in its own process, as Django would while the scraper writes
+    latencies = []
+    connection = sqlite3.connect(path)
+    for name, value in sqlite_profiles[profile].items():
+        connection.execute(f"PRAGMA {name} = {value}")
+
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        connection.execute("SELECT id, product_name, product_price FROM supermarket_products "
+                           "WHERE product_name LIKE '%bread 1%' ORDER BY product_price LIMIT 50").fetchall()
+        latencies.append(time.perf_counter() - start_time)
+    connection.close()
+    results.put(latencies)
+
+
+def run(profile: str, categories: int = 100, products_per_category: int = 500) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/benchmark.db"
+        database = Database(f"sqlite:///{path}?check_same_thread=false", profile=profile)
+        database.session.execute(database.get_table_object("supermarkets").insert().values(
+            id=1, supermarket_name="Aldi", supermarket_logo="", supermarket_base_url=""))
+        database.session.commit()
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': f'Category {category}', 'part_url': f'/c/{category}'} for category in range(categories)]})
+
+        # Load the catalogue first, then search while a second cycle updates every product's price
+        scrape(database, categories, products_per_category, cycle=0)
+
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=search, args=(path, profile, stop, results))
+        reader.start()
+
+        start_time = time.perf_counter()
+        scrape(database, categories, products_per_category, cycle=1)
+        scrape_time = time.perf_counter() - start_time
+
+        stop.set()
+        latencies = results.get()
+        reader.join()
+        database.engine.dispose()
+
+    latencies.sort()
+    print(f"{profile:>10}: scrape {scrape_time:6.2f} s, {len(latencies):6d} searches, "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f} ms, max {latencies[-1] * 1000:7.2f} ms")
+
+
+def main() -> None:
+    # Compare search latency during a scrape with SQLite's default settings and the concurrent profile
+    for profile in sqlite_profiles:
+        run(profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import psutil
+from selenium.common.exceptions import WebDriverException
+
+log = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    def __init__(self, driver_factory, size: int = 2, max_pages: int = 50):
+        # Initialise the pool settings, the idle drivers and the usage counters
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_pages = max_pages
+        self.idle_drivers = queue.LifoQueue()
+        self.page_counts = {}
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.statistics = {"launches": 0, "hits": 0, "recycled": 0, "crashed": 0}
+
+    @contextmanager
+    def driver(self):
+        # Borrow a driver from the pool for the duration of a with block
+        self.slots.acquire()
+        driver = None
+        failed = False
+        try:
+            driver = self.acquire()
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if driver is not None:
+                self.release(driver, failed)
+            self.slots.release()
+
+    def acquire(self):
+        # Method to reuse an idle healthy driver or launch a new one if none are available
+        while True:
+            try:
+                driver = self.idle_drivers.get_nowait()
+            except queue.Empty:
+                break
+
+            if self.is_healthy(driver):
+                self.count("hits")
+                return driver
+
+            log.warning("Idle driver failed its health check, discarding it")
+            self.count("crashed")
+            self.retire(driver)
+
+        return self.launch()
+
+    def release(self, driver, failed: bool = False) -> None:
+        # Method to return a driver to the pool, recycling it if it has crashed or served too many pages
+        with self.lock:
+            self.page_counts[id(driver)] = self.page_counts.get(id(driver), 0) + 1
+            page_count = self.page_counts[id(driver)]
+
+        if failed and not self.is_healthy(driver):
+            log.warning("Driver crashed, recycling it")
+            self.count("crashed")
+            self.retire(driver)
+        elif page_count >= self.max_pages:
+            log.info(f"Driver has served {page_count} pages, recycling it")
+            self.count("recycled")
+            self.retire(driver)
+        else:
+            self.idle_drivers.put(driver)
+
+    def launch(self):
+        # Method to start a new driver session using the factory
+        log.info("Launching a new browser session")
+        driver = self.driver_factory()
+        self.count("launches")
+        with self.lock:
+            self.page_counts[id(driver)] = 0
+        return driver
+
+    def retire(self, driver) -> None:
+        # Method to quit a driver and make sure its process has been terminated
+        with self.lock:
+            self.page_counts.pop(id(driver), None)
+
+        try:
+            driver.quit()
+        except Exception as e:
+            log.warning(f"Error quitting driver: {e}")
+
+        try:
+            # psutil treats a missing pid as the current process, so it has to be checked first
+            pid = driver.service.process.pid
+            if isinstance(pid, int):
+                driver_process = psutil.Process(pid)
+                if driver_process.is_running():
+                    driver_process.terminate()
+        except (psutil.Error, AttributeError):
+            log.info("Driver has quit successfully")
+
+    def is_healthy(self, driver) -> bool:
+        # Method to check that a driver session is still responding
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+        except Exception as e:
+            log.warning(f"Driver health check failed: {e}")
+            return False
+
+    def count(self, statistic: str) -> None:
+        # Method to increment one of the pool's usage counters
+        with self.lock:
+            self.statistics[statistic] += 1
+
+    def get_statistics(self) -> dict:
+        # Method to get a copy of the pool's usage counters
+        with self.lock:
+            return dict(self.statistics)
+
+    def close(self) -> None:
+        # Method to shut down every idle driver in the pool
+        while True:
+            try:
+                driver = self.idle_drivers.get_nowait()
+            except queue.Empty:
+                break
+            self.retire(driver)
+        log.info(f"Browser pool closed: {self.get_statistics()}")
@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+
+class HtmlCache:
+    def __init__(self, directory: str | Path = "html_cache", ttl: float = 24 * 60 * 60):
+        # Initialise the cache directory and how many seconds a cached page stays fresh for
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.entries_directory = self.directory / "entries"
+        self.objects_directory = self.directory / "objects"
+        self.entries_directory.mkdir(parents=True, exist_ok=True)
+        self.objects_directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, url: str, ignore_ttl: bool = False) -> str | None:
+        # Method to get the cached HTML for a URL, or None if it isn't cached or has expired
+        entry = self.get_entry(url)
+        if entry is None:
+            return None
+
+        if not ignore_ttl and time.time() - entry["fetched_at"] > self.ttl:
+            return None
+
+        try:
+            with gzip.open(self.get_object_path(entry["content_hash"]), "rt", encoding="utf-8") as file:
+                return file.read()
+        except (OSError, EOFError) as e:
+            log.warning(f"Cached HTML for {url} could not be read: {e}")
+            return None
+
+    def get_entry(self, url: str) -> dict | None:
+        # Method to get the metadata recorded for a URL
+        try:
+            with open(self.get_entry_path(url), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Cache entry for {url} could not be read: {e}")
+            return None
+
+    def put(self, url: str, html: str, status: int | None, page_type: str) -> None:
+        # Method to store a page's HTML, compressed and addressed by its content hash, along with its metadata
+        content = html.encode("utf-8")
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self.get_object_path(content_hash)
+
+        try:
+            # Identical pages are only stored once
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                self.write_atomic(object_path, gzip.compress(content))
+
+            entry = {"url": url, "fetched_at": time.time(), "status": status, "page_type": page_type,
+                     "content_hash": content_hash}
+            self.write_atomic(self.get_entry_path(url), json.dumps(entry).encode("utf-8"))
+        except OSError as e:
+            log.warning(f"HTML for {url} could not be cached: {e}")
+
+    def get_entry_path(self, url: str) -> Path:
+        # Method to get the path of the metadata file for a URL
+        return self.entries_directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get_object_path(self, content_hash: str) -> Path:
+        # Method to get the path of the compressed HTML with a given content hash
+        return self.objects_directory / content_hash[:2] / f"{content_hash}.gz"
+
+    def write_atomic(self, path: Path, data: bytes) -> None:
+        # Method to write a file so that other threads and processes never see it half written
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+        except OSError:
+            os.unlink(temporary_path)
+            raise
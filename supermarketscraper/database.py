@@ -1,12 +1,32 @@
+import hashlib
+import json
 import logging
+import os
+import re
+from collections import defaultdict
 from datetime import datetime
 
 import sqlalchemy as db
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 
 log = logging.getLogger(__name__)
 
+# Named sets of PRAGMAs applied to every SQLite connection, chosen with the SQLITE_PROFILE environment variable
+# "concurrent" lets the web app read while the scraper writes, "default" keeps SQLite's own settings
+sqlite_profiles = {
+    "default": {},
+    "concurrent": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
 
 # Defining a base class for declarative SQLAlchemy models
 class Base(DeclarativeBase):
@@ -27,6 +47,8 @@ class Supermarkets(Base):
 # One-to-many relationship between supermarket objects and supermarket category objects
 class SupermarketCategories(Base):
     __tablename__ = "supermarket_categories"
+    __table_args__ = (db.Index("ix_categories_supermarket", "supermarket_id"),
+                      db.Index("ix_categories_name", "supermarket_category_name"))
 
     id: Mapped[int] = mapped_column(primary_key=True)
     supermarket_id: Mapped[int] = mapped_column(db.ForeignKey('supermarkets.id'))
@@ -36,10 +58,16 @@ class SupermarketCategories(Base):
 
 # Defining the structure of the supermarket_products table in the database
 # One-to-many relationship between supermarket category objects and supermarket product objects
+# A product is identified by its supermarket and part-URL, so each product has a single row
 class SupermarketProducts(Base):
     __tablename__ = "supermarket_products"
+    __table_args__ = (db.Index("ix_supermarket_products_natural_key", "supermarket_id", "product_part_url",
+                               unique=True),
+                      db.Index("ix_products_category", "supermarket_category_id"),
+                      db.Index("ix_products_name", "product_name"))
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    supermarket_id: Mapped[int | None] = mapped_column(db.ForeignKey('supermarkets.id'))
     supermarket_category_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_categories.id'))
     product_name: Mapped[str]
     product_price: Mapped[float]
@@ -48,12 +76,14 @@ class SupermarketProducts(Base):
     created: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.now(), onupdate=datetime.now())
     last_updated: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.now(), onupdate=datetime.now())
     is_available: Mapped[bool]
+    tile_hash: Mapped[str | None]
 
 
 # Defining the structure of the supermarket_product_details table in the database
 # One-to-one relationship between supermarket_product objects and supermarket_product_details objects
 class SupermarketProductDetails(Base):
     __tablename__ = "supermarket_product_details"
+    __table_args__ = (db.Index("ix_details_product", "supermarket_product_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     supermarket_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
@@ -66,27 +96,130 @@ class SupermarketProductDetails(Base):
     fibre: Mapped[float]
     protein: Mapped[float]
     salt: Mapped[float]
+    last_updated: Mapped[datetime | None] = mapped_column(db.DateTime)
+    tile_hash: Mapped[str | None]
 
 
 # Defining the structure of the supermarket_product_allergens table in the database
 # One-to-many relationship between supermarket_product objects and supermarket_product_allergens objects
 class SupermarketProductAllergens(Base):
     __tablename__ = "supermarket_product_allergens"
+    __table_args__ = (db.Index("ix_allergens_product_allergen", "supermarket_product_id", "allergen"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     supermarket_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
     allergen: Mapped[str]
 
 
+# Defining the structure of the supermarket_product_prices table in the database
+# One-to-many relationship between supermarket_product objects and the prices they have been observed at
+# Rows are only ever appended, when a product is first seen or its price changes
+class SupermarketProductPrices(Base):
+    __tablename__ = "supermarket_product_prices"
+    __table_args__ = (db.Index("ix_supermarket_product_prices_product_observed", "supermarket_product_id",
+                               "observed_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    supermarket_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
+    price_pence: Mapped[int]
+    observed_at: Mapped[datetime] = mapped_column(db.DateTime)
+
+
+# Defining the structure of the product_groups table in the database
+# Products from different supermarkets that are the same item share a group, built after each scrape run along with
+# the group's cheapest product
+class ProductGroups(Base):
+    __tablename__ = "product_groups"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    group_key: Mapped[str] = mapped_column(unique=True)
+    product_name: Mapped[str]
+    member_count: Mapped[int]
+    cheapest_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
+    cheapest_price: Mapped[float]
+
+
+# Defining the structure of the product_group_members table in the database
+# Many-to-one relationship between supermarket_product objects and product_group objects
+class ProductGroupMembers(Base):
+    __tablename__ = "product_group_members"
+    __table_args__ = (db.Index("ix_group_members_group", "product_group_id"),)
+
+    supermarket_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'), primary_key=True)
+    product_group_id: Mapped[int] = mapped_column(db.ForeignKey('product_groups.id'))
+
+
+# Defining the structure of the product_matches table in the database
+# Pairs of products from different supermarkets that the matcher found to be the same item, with how confident it was
+class ProductMatches(Base):
+    __tablename__ = "product_matches"
+    __table_args__ = (db.Index("ix_product_matches_product", "product_id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
+    matched_product_id: Mapped[int] = mapped_column(db.ForeignKey('supermarket_products.id'))
+    confidence: Mapped[float]
+
+
+# Defining the structure of the catalogue_generation table in the database
+# A single row counting scrape runs, which the web app uses to tell when its cached search results are out of date
+class CatalogueGeneration(Base):
+    __tablename__ = "catalogue_generation"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    generation: Mapped[int]
+    updated_at: Mapped[datetime] = mapped_column(db.DateTime)
+
+
 class Database:
+    # Columns added after the tables were first created, which create_all won't add to an existing database
+    added_columns = [
+        ("supermarket_products", "tile_hash", "VARCHAR"),
+        ("supermarket_products", "supermarket_id", "INTEGER REFERENCES supermarkets (id)"),
+        ("supermarket_product_details", "last_updated", "DATETIME"),
+        ("supermarket_product_details", "tile_hash", "VARCHAR"),
+    ]
+
+    # Indexes on the columns the scraper and web app filter on, which create_all won't add to an existing table
+    added_indexes = [
+        ("ix_categories_supermarket", "supermarket_categories", "supermarket_id"),
+        ("ix_categories_name", "supermarket_categories", "supermarket_category_name"),
+        ("ix_products_category", "supermarket_products", "supermarket_category_id"),
+        ("ix_products_name", "supermarket_products", "product_name"),
+        ("ix_details_product", "supermarket_product_details", "supermarket_product_id"),
+        ("ix_allergens_product_allergen", "supermarket_product_allergens", "supermarket_product_id, allergen"),
+    ]
+
+    # Full-text index over product names, kept in step with supermarket_products by triggers so that every way a
+    # product is written, including the web app, updates it
+    search_index_statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS supermarket_products_fts USING fts5(product_name, "
+        "content='supermarket_products', content_rowid='id', tokenize='unicode61 remove_diacritics 2', "
+        "prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_insert AFTER INSERT ON supermarket_products BEGIN "
+        "INSERT INTO supermarket_products_fts (rowid, product_name) VALUES (new.id, new.product_name); END",
+        "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_delete AFTER DELETE ON supermarket_products BEGIN "
+        "INSERT INTO supermarket_products_fts (supermarket_products_fts, rowid, product_name) "
+        "VALUES ('delete', old.id, old.product_name); END",
+        "CREATE TRIGGER IF NOT EXISTS supermarket_products_fts_update AFTER UPDATE OF product_name "
+        "ON supermarket_products WHEN old.product_name IS NOT new.product_name BEGIN "
+        "INSERT INTO supermarket_products_fts (supermarket_products_fts, rowid, product_name) "
+        "VALUES ('delete', old.id, old.product_name); "
+        "INSERT INTO supermarket_products_fts (rowid, product_name) VALUES (new.id, new.product_name); END",
+    ]
+
     # Database initialisation and connection setup
     # Logging initialisation
-    def __init__(self):
-        self.engine = db.create_engine(
-            "sqlite:///supermarketscrape.db?check_same_thread=false"
-        )
+    def __init__(self, url: str = "sqlite:///supermarketscrape.db?check_same_thread=false", batch_size: int = 500,
+                 profile: str | None = None):
+        self.engine = db.create_engine(url)
+        self.profile = profile if profile is not None else os.environ.get("SQLITE_PROFILE", "concurrent")
+        self.apply_profile(self.profile)
         log.info(f"Database loaded")
 
+        # Number of rows sent to the database in each executemany call
+        self.batch_size = batch_size
+
         self.Session = sessionmaker(bind=self.engine)
         self.session = self.Session()
         self.Base = declarative_base()
@@ -101,6 +234,8 @@ class Database:
 
         class SupermarketCategories(self.Base):
             __tablename__ = "supermarket_categories"
+            __table_args__ = (db.Index("ix_categories_supermarket", "supermarket_id"),
+                              db.Index("ix_categories_name", "supermarket_category_name"))
 
             id = db.Column(db.Integer, primary_key=True)
             supermarket_id = db.Column(db.Integer, db.ForeignKey('supermarkets.id'))
@@ -109,8 +244,13 @@ class Database:
 
         class SupermarketProducts(self.Base):
             __tablename__ = "supermarket_products"
+            __table_args__ = (db.Index("ix_supermarket_products_natural_key", "supermarket_id", "product_part_url",
+                                       unique=True),
+                              db.Index("ix_products_category", "supermarket_category_id"),
+                              db.Index("ix_products_name", "product_name"))
 
             id = db.Column(db.Integer, primary_key=True)
+            supermarket_id = db.Column(db.Integer, db.ForeignKey('supermarkets.id'))
             supermarket_category_id = db.Column(db.Integer, db.ForeignKey('supermarket_categories.id'))
             product_name = db.Column(db.String)
             product_price = db.Column(db.Float)
@@ -119,9 +259,11 @@ class Database:
             created = db.Column(db.DateTime, default=datetime.now(), onupdate=datetime.now())
             last_updated = db.Column(db.DateTime, default=datetime.now(), onupdate=datetime.now())
             is_available = db.Column(db.Boolean)
+            tile_hash = db.Column(db.String)
 
         class SupermarketProductDetails(self.Base):
             __tablename__ = "supermarket_product_details"
+            __table_args__ = (db.Index("ix_details_product", "supermarket_product_id"),)
 
             id = db.Column(db.Integer, primary_key=True)
             supermarket_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
@@ -134,21 +276,181 @@ class Database:
             fibre = db.Column(db.Float)
             protein = db.Column(db.Float)
             salt = db.Column(db.Float)
+            last_updated = db.Column(db.DateTime)
+            tile_hash = db.Column(db.String)
 
         class SupermarketProductAllergens(self.Base):
             __tablename__ = "supermarket_product_allergens"
+            __table_args__ = (db.Index("ix_allergens_product_allergen", "supermarket_product_id", "allergen"),)
 
             id = db.Column(db.Integer, primary_key=True)
             supermarket_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
             allergen = db.Column(db.String)
 
+        class SupermarketProductPrices(self.Base):
+            __tablename__ = "supermarket_product_prices"
+            __table_args__ = (db.Index("ix_supermarket_product_prices_product_observed", "supermarket_product_id",
+                                       "observed_at"),)
+
+            id = db.Column(db.Integer, primary_key=True)
+            supermarket_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
+            price_pence = db.Column(db.Integer)
+            observed_at = db.Column(db.DateTime)
+
+        class ProductGroups(self.Base):
+            __tablename__ = "product_groups"
+
+            id = db.Column(db.Integer, primary_key=True)
+            group_key = db.Column(db.String, unique=True)
+            product_name = db.Column(db.String)
+            member_count = db.Column(db.Integer)
+            cheapest_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
+            cheapest_price = db.Column(db.Float)
+
+        class ProductGroupMembers(self.Base):
+            __tablename__ = "product_group_members"
+            __table_args__ = (db.Index("ix_group_members_group", "product_group_id"),)
+
+            supermarket_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'), primary_key=True)
+            product_group_id = db.Column(db.Integer, db.ForeignKey('product_groups.id'))
+
+        class ProductMatches(self.Base):
+            __tablename__ = "product_matches"
+            __table_args__ = (db.Index("ix_product_matches_product", "product_id"),)
+
+            id = db.Column(db.Integer, primary_key=True)
+            product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
+            matched_product_id = db.Column(db.Integer, db.ForeignKey('supermarket_products.id'))
+            confidence = db.Column(db.Float)
+
+        class CatalogueGeneration(self.Base):
+            __tablename__ = "catalogue_generation"
+
+            id = db.Column(db.Integer, primary_key=True)
+            generation = db.Column(db.Integer)
+            updated_at = db.Column(db.DateTime)
+
         self.Base.metadata.create_all(self.engine)
+        self.migrate()
+
+        # Registry of table objects, reflected once here rather than on every lookup
+        self.tables = {}
+        self.refresh_tables()
         log.info("Database tables loaded")
 
+    def apply_profile(self, profile: str):
+        # Method to run a profile's PRAGMAs on each new connection, as SQLite only keeps most of them per connection
+        pragmas = sqlite_profiles[profile]
+
+        @db.event.listens_for(self.engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+    def migrate(self):
+        # Method to add any columns that are missing from tables created by an older version of the scraper
+        inspector = db.inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table_name, column_name, column_type in self.added_columns:
+                existing_columns = [column["name"] for column in inspector.get_columns(table_name)]
+                if column_name not in existing_columns:
+                    log.info(f"Adding {column_name} column to '{table_name}'")
+                    connection.execute(db.text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+            index_names = [index["name"] for index in inspector.get_indexes("supermarket_products")]
+            if "ix_supermarket_products_natural_key" not in index_names:
+                self.migrate_product_natural_key(connection)
+
+            for index_name, table_name, column_names in self.added_indexes:
+                connection.execute(db.text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_names})"))
+
+            self.migrate_search_index(connection)
+
+            # Start the price history of products stored before it was recorded from their current price
+            connection.execute(db.text(
+                "INSERT INTO supermarket_product_prices (supermarket_product_id, price_pence, observed_at) "
+                "SELECT id, CAST(ROUND(product_price * 100) AS INTEGER), last_updated FROM supermarket_products "
+                "WHERE product_price IS NOT NULL AND NOT EXISTS (SELECT 1 FROM supermarket_product_prices)"
+            ))
+
+    def migrate_search_index(self, connection):
+        # Method to create the product name full-text index, filling it from the existing products if it is new
+        exists = connection.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'supermarket_products_fts'")).first() is not None
+
+        for statement in self.search_index_statements:
+            connection.execute(db.text(statement))
+
+        if not exists:
+            log.info("Building the product search index")
+            connection.execute(db.text(
+                "INSERT INTO supermarket_products_fts (supermarket_products_fts) VALUES ('rebuild')"))
+
+    def migrate_product_natural_key(self, connection):
+        # Method to merge the duplicate product rows older versions inserted every cycle, then enforce one row per
+        # supermarket and part-URL
+        log.info("Merging duplicate products in 'supermarket_products'")
+        connection.execute(db.text(
+            "UPDATE supermarket_products SET supermarket_id = (SELECT supermarket_id FROM supermarket_categories "
+            "WHERE supermarket_categories.id = supermarket_products.supermarket_category_id) "
+            "WHERE supermarket_id IS NULL"
+        ))
+
+        # Keep the oldest row for each product, which is the one anything else is most likely to reference
+        connection.execute(db.text("DROP TABLE IF EXISTS temp.product_duplicates"))
+        connection.execute(db.text(
+            "CREATE TEMP TABLE product_duplicates AS "
+            "SELECT products.id AS duplicate_id, kept.kept_id FROM supermarket_products AS products "
+            "JOIN (SELECT supermarket_id, product_part_url, MIN(id) AS kept_id FROM supermarket_products "
+            "GROUP BY supermarket_id, product_part_url HAVING COUNT(*) > 1) AS kept "
+            "ON products.supermarket_id = kept.supermarket_id AND products.product_part_url = kept.product_part_url "
+            "WHERE products.id != kept.kept_id"
+        ))
+
+        # Point anything referencing a duplicate at the kept row, including the web app's shopping lists
+        referencing_tables = ["supermarket_product_details", "supermarket_product_allergens"]
+        column_names = {"shopping_list_shoppinglistitem": "product_id"}
+        if db.inspect(connection).has_table("shopping_list_shoppinglistitem"):
+            referencing_tables.append("shopping_list_shoppinglistitem")
+
+        for table_name in referencing_tables:
+            column_name = column_names.get(table_name, "supermarket_product_id")
+            connection.execute(db.text(
+                f"UPDATE {table_name} SET {column_name} = (SELECT kept_id FROM product_duplicates "
+                f"WHERE duplicate_id = {table_name}.{column_name}) "
+                f"WHERE {column_name} IN (SELECT duplicate_id FROM product_duplicates)"
+            ))
+
+        # Merging can leave a product with several details rows or repeated allergens, so keep the latest of each
+        connection.execute(db.text(
+            "DELETE FROM supermarket_product_details WHERE id NOT IN "
+            "(SELECT MAX(id) FROM supermarket_product_details GROUP BY supermarket_product_id)"
+        ))
+        connection.execute(db.text(
+            "DELETE FROM supermarket_product_allergens WHERE id NOT IN "
+            "(SELECT MAX(id) FROM supermarket_product_allergens GROUP BY supermarket_product_id, allergen)"
+        ))
+        connection.execute(db.text(
+            "DELETE FROM supermarket_products WHERE id IN (SELECT duplicate_id FROM product_duplicates)"
+        ))
+        connection.execute(db.text("DROP TABLE temp.product_duplicates"))
+
+        connection.execute(db.text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_supermarket_products_natural_key "
+            "ON supermarket_products (supermarket_id, product_part_url)"
+        ))
+
+    def refresh_tables(self):
+        # Method to rebuild the table registry from the database schema, needed if the schema changes while running
+        metadata = db.MetaData()
+        metadata.reflect(self.engine)
+        self.tables = dict(metadata.tables)
+
     def get_table_object(self, table_name):
         # Method to get metadata object for a given table name
-        self.Base.metadata.reflect(self.engine)
-        return self.Base.metadata.tables.get(table_name)
+        return self.tables.get(table_name)
 
     def add_supermarket(self, supermarkets):
         # Method to add supermarket data to the database
@@ -194,34 +496,169 @@ class Database:
 
             self.session.commit()
 
-    def add_supermarket_category_products(self, data):  # add update_necessary_checking
-        # Method to add supermarket product data to the database
+    def add_supermarket_category_products(self, data):
+        # Method to add or update supermarket product data in the database, returning how many products were new,
+        # updated or removed
         statistics = {"New": 0, "Updated": 0, "Deleted": 0}
-        products_table = self.get_table_object("supermarket_products")
+        supermarket_id = self.get_category_supermarket_id(data["supermarket_category_id"])
+        now = datetime.now()
+
+        rows = [
+            {
+                "supermarket_id": supermarket_id,
+                "supermarket_category_id": data["supermarket_category_id"],
+                "product_name": datum['name'],
+                "product_price": datum['price'],
+                "product_image": datum['image'],
+                "product_part_url": datum['part_url'],
+                "created": now,
+                "last_updated": now,
+                "is_available": True,
+                "tile_hash": self.get_tile_hash(datum)
+            }
+            for datum in data["supermarket_category_products"]
+        ]
+
+        # Products that are already stored are updated in place rather than inserted again
+        statement = sqlite_insert(SupermarketProducts)
+        statement = statement.on_conflict_do_update(
+            index_elements=["supermarket_id", "product_part_url"],
+            set_={
+                "supermarket_category_id": statement.excluded.supermarket_category_id,
+                "product_name": statement.excluded.product_name,
+                "product_price": statement.excluded.product_price,
+                "product_image": statement.excluded.product_image,
+                "last_updated": statement.excluded.last_updated,
+                "is_available": statement.excluded.is_available,
+                "tile_hash": statement.excluded.tile_hash,
+            }
+        )
 
-        #  check = (
-        #      self.session.query(table_object).filter_by().all()
-        #  )
+        # Upsert the page's products in batches with executemany, committing them in a single transaction
         with self.session as session:
-            for datum in data["supermarket_category_products"]:
-                log.info(f"Adding {datum['name']}")
-                statistics["New"] += 1
-                product = SupermarketProducts(
-                    supermarket_category_id=data["supermarket_category_id"],
-                    product_name=datum['name'],
-                    product_price=datum['price'],
-                    product_image=datum['image'],
-                    product_part_url=datum['part_url']
-                )
-                session.add(instance=product)
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                existing_products = self.get_existing_products(session, supermarket_id, batch)
+                repriced_part_urls = []
+
+                for row in batch:
+                    existing_product = existing_products.get(row["product_part_url"])
+                    if existing_product is None:
+                        statistics["New"] += 1
+                    elif existing_product.tile_hash != row["tile_hash"]:
+                        statistics["Updated"] += 1
+
+                    # A price is recorded when a product is first seen and whenever it changes after that
+                    if existing_product is None or (self.get_price_pence(existing_product.product_price)
+                                                    != self.get_price_pence(row["product_price"])):
+                        repriced_part_urls.append(row["product_part_url"])
+
+                session.execute(statement, batch)
+                log.info(f"Upserted batch of {len(batch)} products to category {data['supermarket_category_id']}")
+
+                self.add_product_prices(session, supermarket_id, batch, repriced_part_urls, now)
+
+            self.session.commit()
+
+        return statistics
 
+    def get_category_supermarket_id(self, category_id) -> int | None:
+        # Method to get the supermarket a category belongs to
+        categories_table = self.get_table_object("supermarket_categories")
+        return self.session.query(categories_table.c.supermarket_id).filter_by(id=category_id).scalar()
+
+    def get_existing_products(self, session, supermarket_id, batch: list) -> dict:
+        # Method to get the stored listing tile hash and price of each product in a batch that is already stored
+        if supermarket_id is None:
+            return {}
+
+        products_table = self.get_table_object("supermarket_products")
+        part_urls = [row["product_part_url"] for row in batch]
+        rows = session.query(products_table.c.product_part_url, products_table.c.tile_hash,
+                             products_table.c.product_price).filter(
+            products_table.c.supermarket_id == supermarket_id,
+            products_table.c.product_part_url.in_(part_urls)
+        ).all()
+        return {row.product_part_url: row for row in rows}
+
+    def add_product_prices(self, session, supermarket_id, batch: list, part_urls: list, observed_at: datetime):
+        # Method to append a price history row for each of the given products in a batch
+        if supermarket_id is None or not part_urls:
+            return
+
+        # The upsert doesn't return ids, so look up the ids of the products whose price is being recorded
+        products_table = self.get_table_object("supermarket_products")
+        product_ids = dict(session.query(products_table.c.product_part_url, products_table.c.id).filter(
+            products_table.c.supermarket_id == supermarket_id,
+            products_table.c.product_part_url.in_(part_urls)
+        ).all())
+
+        prices = [
+            {
+                "supermarket_product_id": product_ids[row["product_part_url"]],
+                "price_pence": self.get_price_pence(row["product_price"]),
+                "observed_at": observed_at
+            }
+            for row in batch
+            if row["product_part_url"] in product_ids and self.get_price_pence(row["product_price"]) is not None
+        ]
+        if prices:
+            session.execute(db.insert(SupermarketProductPrices), prices)
+            log.info(f"Recorded {len(prices)} price changes")
+
+    def get_price_history(self, product_id, since: datetime) -> list:
+        # Method to get a product's recorded prices in pence since a given time, oldest first
+        prices_table = self.get_table_object("supermarket_product_prices")
+        return self.session.query(prices_table.c.observed_at, prices_table.c.price_pence).filter(
+            prices_table.c.supermarket_product_id == product_id,
+            prices_table.c.observed_at >= since
+        ).order_by(prices_table.c.observed_at).all()
+
+    def search_products(self, query: str, limit: int = 50) -> list:
+        # Method to get the ids of the products whose names best match a search, using prefix matching on each word
+        # and ranked by BM25
+        match = self.get_search_match(query)
+        if not match:
+            return []
+
+        rows = self.session.execute(db.text(
+            "SELECT rowid FROM supermarket_products_fts WHERE supermarket_products_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit"
+        ), {"match": match, "limit": limit}).all()
+        return [row.rowid for row in rows]
+
+    def get_search_match(self, query: str) -> str:
+        # Method to turn a search into an FTS5 query matching every word as a prefix
+        words = re.findall(r"\w+", query.lower())
+        return " ".join(f'"{word}"*' for word in words)
+
+    def get_price_pence(self, price) -> int | None:
+        # Method to convert a price in pounds to whole pence, avoiding floating point differences between cycles
+        if price is None:
+            return None
+        return int(round(price * 100))
+
+    def mark_unavailable_products(self, category_id, seen_since: datetime) -> int:
+        # Method to mark a category's products as unavailable if they weren't listed during the current cycle
+        products_table = self.get_table_object("supermarket_products")
+        with self.session as session:
+            result = session.execute(
+                db.update(products_table)
+                .where(products_table.c.supermarket_category_id == category_id,
+                       products_table.c.last_updated < seen_since,
+                       products_table.c.is_available.isnot(False))
+                .values(is_available=False)
+            )
             self.session.commit()
+        return result.rowcount
 
     def add_product_information(self, data):
-        # Method to add product details to the database
+        # Method to add product details to the database, replacing any details fetched previously
 
         with self.session as session:
             datum = data["supermarket_product_details"]
+            session.query(SupermarketProductDetails).filter_by(
+                supermarket_product_id=data["supermarket_product_id"]).delete()
             supermarket_product_details = SupermarketProductDetails(
                 supermarket_product_id=data["supermarket_product_id"],
                 energy_kj=datum['energy_kj'],
@@ -232,16 +669,20 @@ class Database:
                 of_which_sugars=datum['of_which_sugars'],
                 fibre=datum['fibre'],
                 protein=datum['protein'],
-                salt=datum['salt']
+                salt=datum['salt'],
+                last_updated=datetime.now(),
+                tile_hash=data.get("tile_hash")
             )
             session.add(instance=supermarket_product_details)
             self.session.commit()
 
     def add_product_allergy_information(self, data):
-        # Method to add product allergy information to the database
+        # Method to add product allergy information to the database, replacing any allergens found previously
 
         with self.session as session:
             datum = data["supermarket_product_details"]
+            session.query(SupermarketProductAllergens).filter_by(
+                supermarket_product_id=data["supermarket_product_id"]).delete()
             for allergen in datum['allergens']:
                 supermarket_product_allergen = SupermarketProductAllergens(
                     supermarket_product_id=data["supermarket_product_id"],
@@ -249,3 +690,200 @@ class Database:
                 )
                 session.add(instance=supermarket_product_allergen)
             self.session.commit()
+
+    def add_product_details_batch(self, data: list) -> int:
+        # Method to add many products' nutritional and allergen information in a single transaction, replacing any
+        # fetched previously, and returning how many products were written
+        details_rows = []
+        allergen_rows = []
+        allergen_product_ids = []
+        now = datetime.now()
+
+        for product in data:
+            datum = product["supermarket_product_details"]
+            try:
+                details_rows.append({
+                    "supermarket_product_id": product["supermarket_product_id"],
+                    "energy_kj": datum['energy_kj'],
+                    "energy_kcal": datum['energy_kcal'],
+                    "fat": datum['fat'],
+                    "of_which_saturates": datum['of_which_saturates'],
+                    "carbohydrates": datum['carbohydrates'],
+                    "of_which_sugars": datum['of_which_sugars'],
+                    "fibre": datum['fibre'],
+                    "protein": datum['protein'],
+                    "salt": datum['salt'],
+                    "last_updated": now,
+                    "tile_hash": product.get("tile_hash")
+                })
+            except KeyError as e:
+                log.error(f"KeyError processing product {product['supermarket_product_id']}: {e}. Details: {datum}")
+                continue
+
+            if "allergens" in datum:
+                allergen_product_ids.append(product["supermarket_product_id"])
+                allergen_rows.extend({"supermarket_product_id": product["supermarket_product_id"], "allergen": allergen}
+                                     for allergen in datum['allergens'])
+
+        details_product_ids = [row["supermarket_product_id"] for row in details_rows]
+        details_table = self.get_table_object("supermarket_product_details")
+        allergens_table = self.get_table_object("supermarket_product_allergens")
+
+        with self.session as session:
+            # SQLite limits the number of parameters in a query, so delete the old rows in batches
+            for start in range(0, len(details_product_ids), self.batch_size):
+                session.execute(db.delete(details_table).where(
+                    details_table.c.supermarket_product_id.in_(details_product_ids[start:start + self.batch_size])))
+            for start in range(0, len(allergen_product_ids), self.batch_size):
+                session.execute(db.delete(allergens_table).where(
+                    allergens_table.c.supermarket_product_id.in_(allergen_product_ids[start:start + self.batch_size])))
+
+            if details_rows:
+                session.execute(db.insert(SupermarketProductDetails), details_rows)
+            if allergen_rows:
+                session.execute(db.insert(SupermarketProductAllergens), allergen_rows)
+            self.session.commit()
+
+        log.info(f"Added details for {len(details_rows)} products")
+        return len(details_rows)
+
+    def get_product_detail_states(self, product_ids: list) -> dict:
+        # Method to get when each product's details were last fetched and the listing tile they were fetched for
+        details_table = self.get_table_object("supermarket_product_details")
+        detail_states = {}
+        chunk_size = 500
+
+        # SQLite limits the number of parameters in a query, so look the products up in chunks
+        for start in range(0, len(product_ids), chunk_size):
+            rows = self.session.query(
+                details_table.c.supermarket_product_id, details_table.c.last_updated, details_table.c.tile_hash
+            ).filter(details_table.c.supermarket_product_id.in_(product_ids[start:start + chunk_size])).all()
+
+            for row in rows:
+                detail_states[row.supermarket_product_id] = {"last_updated": row.last_updated,
+                                                             "tile_hash": row.tile_hash}
+        return detail_states
+
+    def get_products_for_matching(self) -> list:
+        # Method to get the id, name and supermarket of every available product, for the matcher
+        with self.engine.connect() as connection:
+            rows = connection.execute(db.text(
+                "SELECT supermarket_products.id, supermarket_products.product_name AS name, "
+                "COALESCE(supermarket_products.supermarket_id, supermarket_categories.supermarket_id) "
+                "AS supermarket_id FROM supermarket_products "
+                "JOIN supermarket_categories "
+                "ON supermarket_categories.id = supermarket_products.supermarket_category_id "
+                "WHERE supermarket_products.is_available IS NOT 0 AND supermarket_products.product_price IS NOT NULL"
+            )).mappings().all()
+        return [dict(row) for row in rows]
+
+    def replace_product_matches(self, matches: list) -> int:
+        # Method to replace the matches from the previous matcher run, returning how many were added
+        with self.engine.begin() as connection:
+            connection.execute(db.text("DELETE FROM product_matches"))
+            for start in range(0, len(matches), self.batch_size):
+                connection.execute(db.insert(ProductMatches), matches[start:start + self.batch_size])
+
+        log.info(f"Added {len(matches)} product matches")
+        return len(matches)
+
+    def build_product_groups(self, min_confidence: float = 0.7) -> int:
+        # Method to rebuild the product groups from the available products, returning how many groups there are
+        # Products are grouped with those of the same name ignoring case and surrounding spaces, then with those the
+        # matcher is at least min_confidence sure are the same item, most confident first, along with anything those
+        # are grouped with, as long as a group never holds two products from the same supermarket
+        with self.engine.begin() as connection:
+            products = connection.execute(db.text(
+                "SELECT supermarket_products.id, supermarket_products.product_name, "
+                "supermarket_products.product_price, "
+                "COALESCE(supermarket_products.supermarket_id, supermarket_categories.supermarket_id) "
+                "AS supermarket_id FROM supermarket_products "
+                "LEFT JOIN supermarket_categories "
+                "ON supermarket_categories.id = supermarket_products.supermarket_category_id "
+                "WHERE supermarket_products.is_available IS NOT 0 AND supermarket_products.product_price IS NOT NULL"
+            )).all()
+            matches = connection.execute(db.text(
+                "SELECT product_id, matched_product_id FROM product_matches WHERE confidence >= :min_confidence "
+                "ORDER BY confidence DESC, product_id, matched_product_id"
+            ), {"min_confidence": min_confidence}).all()
+
+            # Union-find over product ids, where each product points towards the first product in its group, and each
+            # group's first product holds the supermarkets already in the group
+            parents = {product.id: product.id for product in products}
+            supermarket_ids = {product.id: {product.supermarket_id} for product in products}
+
+            def find(product_id):
+                while parents[product_id] != product_id:
+                    parents[product_id] = parents[parents[product_id]]
+                    product_id = parents[product_id]
+                return product_id
+
+            def union(first_id, second_id):
+                first_root, second_root = find(first_id), find(second_id)
+                if first_root == second_root:
+                    return
+                if not supermarket_ids[first_root].isdisjoint(supermarket_ids[second_root]):
+                    return
+                root, child = min(first_root, second_root), max(first_root, second_root)
+                parents[child] = root
+                supermarket_ids[root] |= supermarket_ids.pop(child)
+
+            names = {}
+            for product in products:
+                union(product.id, names.setdefault(product.product_name.strip().lower(), product.id))
+            for match in matches:
+                if match.product_id in parents and match.matched_product_id in parents:
+                    union(match.product_id, match.matched_product_id)
+
+            grouped_products = defaultdict(list)
+            for product in products:
+                grouped_products[find(product.id)].append(product)
+
+            # Each group is keyed by its cheapest product's name, adding the product's id if a supermarket sells two
+            # products of that name and another group already has it
+            groups, members = [], []
+            group_keys = set()
+            for group_id, group_products in enumerate(grouped_products.values(), start=1):
+                cheapest = min(group_products, key=lambda product: (product.product_price, product.id))
+                group_key = cheapest.product_name.strip().lower()
+                if group_key in group_keys:
+                    group_key = f"{group_key}#{cheapest.id}"
+                group_keys.add(group_key)
+                groups.append({"id": group_id, "group_key": group_key,
+                               "product_name": cheapest.product_name, "member_count": len(group_products),
+                               "cheapest_product_id": cheapest.id, "cheapest_price": cheapest.product_price})
+                members.extend({"supermarket_product_id": product.id, "product_group_id": group_id}
+                               for product in group_products)
+
+            connection.execute(db.text("DELETE FROM product_group_members"))
+            connection.execute(db.text("DELETE FROM product_groups"))
+            for start in range(0, len(groups), self.batch_size):
+                connection.execute(db.insert(ProductGroups), groups[start:start + self.batch_size])
+            for start in range(0, len(members), self.batch_size):
+                connection.execute(db.insert(ProductGroupMembers), members[start:start + self.batch_size])
+
+        log.info(f"Built {len(groups)} product groups")
+        return len(groups)
+
+    def bump_catalogue_generation(self) -> int:
+        # Method to count another scrape run, returning the new catalogue generation
+        statement = sqlite_insert(CatalogueGeneration).values(id=1, generation=1, updated_at=datetime.now())
+        statement = statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"generation": CatalogueGeneration.generation + 1, "updated_at": statement.excluded.updated_at}
+        )
+
+        with self.session as session:
+            session.execute(statement)
+            self.session.commit()
+        return self.get_catalogue_generation()
+
+    def get_catalogue_generation(self) -> int:
+        # Method to get how many scrape runs have finished, or 0 before the first
+        generation_table = self.get_table_object("catalogue_generation")
+        return self.session.query(generation_table.c.generation).filter_by(id=1).scalar() or 0
+
+    def get_tile_hash(self, datum: dict) -> str:
+        # Method to hash the listing tile fields that would indicate a product has changed
+        tile = json.dumps([datum.get('name'), datum.get('price'), datum.get('image'), datum.get('part_url')])
+        return hashlib.sha1(tile.encode("utf-8")).hexdigest()
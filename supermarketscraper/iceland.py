@@ -1,6 +1,8 @@
 import logging
 
-from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+
+from readiness import ReadinessCondition, SelectorReady, NetworkIdleReady
 from supermarkets import Supermarkets
 
 log = logging.getLogger(__name__)
@@ -23,7 +25,7 @@ class Iceland(Supermarkets):
     def filter_categories(self, html: str | None) -> list:
         if html is not None:
 
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "category")
             supermarket_categories = []
 
             try:
@@ -48,7 +50,7 @@ class Iceland(Supermarkets):
 
     def filter_products(self, html: str | None) -> list:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "listing")
             supermarket_category_products = []
 
             try:
@@ -58,7 +60,7 @@ class Iceland(Supermarkets):
                     # Extract product name
                     for product_name in divtag.find('a', {'class': 'name-link'}):
                         if product_name.string != '\n':
-                            product['name'] = product_name.string
+                            product['name'] = str(product_name.string) if product_name.string is not None else None
 
                     # Extract product price
                     for product_price in divtag.find('span', {'class': 'product-sales-price'}):
@@ -87,7 +89,7 @@ class Iceland(Supermarkets):
 
     def filter_product_details(self, html: str | None) -> dict | None:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "detail")
             allergy_list = []
 
             try:
@@ -95,12 +97,10 @@ class Iceland(Supermarkets):
 
                 # Extract product allergens
                 for ptag in divtag.find_all('p', {'class': 'text-muted'}):
-                    allergen_text = ptag.get_text(strip=True)
-                    for allergen in self.allergens:
-                        if allergen_text.lower().find(allergen) >= 0:
-                            allergy_list.append(allergen)
+                    allergen_text = ptag.get_text(" ", strip=True)
+                    allergy_list.extend(self.find_allergens(allergen_text))
 
-                    allergy_list = list(set(allergy_list))
+                    allergy_list = list(dict.fromkeys(allergy_list))
 
                 # Extract product nutritional information
                 nutrition_table = soup.find('tbody')
@@ -140,3 +140,33 @@ class Iceland(Supermarkets):
             log.error(f"Error formatting values: {e}")
             formatted_values = ['0', '0', '0', '0', '0', '0', '0', '0', '0']
             return formatted_values
+
+    def get_parse_regions(self, page_type: str) -> list:
+        # Iceland's filter methods only read the category links, the product tiles and the product information
+        if page_type == "category":
+            return [('a', 'menu-sub-cat-link')]
+        elif page_type == "listing":
+            return [('div', 'product-tile')]
+        return [('div', 'mt-3'), ('tbody', None)]
+
+    def get_fetch_strategy(self, page_type: str) -> str:
+        # Iceland's nutrition tables are loaded by background requests, so product pages always need the browser
+        if page_type == "detail":
+            return "browser"
+        return "http"
+
+    def get_html_markers(self, page_type: str) -> list:
+        # Iceland category and listing pages are only usable once they contain the elements their filters read
+        if page_type == "category":
+            return ['menu-sub-cat-link']
+        elif page_type == "listing":
+            return ['product-tile']
+        return ['<tbody']
+
+    def get_readiness_condition(self, page_type: str) -> ReadinessCondition:
+        # Iceland product pages load their nutrition tables through background requests
+        if page_type == "category":
+            return SelectorReady(By.CSS_SELECTOR, "a.menu-sub-cat-link.viewall")
+        elif page_type == "listing":
+            return SelectorReady(By.CLASS_NAME, "product-tile")
+        return NetworkIdleReady()
@@ -0,0 +1,171 @@
+import logging
+import re
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+log = logging.getLogger(__name__)
+
+# Pack sizes such as "800g", "1.5L", "4 x 100g" or "6 pack", found in a normalised product name
+pack_size_pattern = re.compile(r"\b(?:(\d+)\s*x\s*)?(\d+(?:\.\d+)?)\s*(kg|g|ml|cl|ltr|litres?|l|pack|pk)\b")
+
+# The unit each pack size is compared in, and how many of that unit one of the written unit is
+pack_size_units = {
+    "kg": ("g", 1000), "g": ("g", 1),
+    "l": ("ml", 1000), "ltr": ("ml", 1000), "litre": ("ml", 1000), "litres": ("ml", 1000),
+    "cl": ("ml", 10), "ml": ("ml", 1),
+    "pack": ("each", 1), "pk": ("each", 1),
+}
+
+
+class ProductMatcher:
+    def __init__(self, threshold: float = 0.5, ngram_size: int = 3, features: int = 2 ** 20, block_words: int = 2,
+                 chunk_size: int = 2000):
+        # Lowest name similarity that is recorded as a match
+        self.threshold = threshold
+
+        # Length of the character n-grams names are compared on, and how many columns they are hashed into
+        self.ngram_size = ngram_size
+        self.features = features
+
+        # Number of words at the start of a name that products are blocked on
+        self.block_words = block_words
+
+        # Number of products in a block whose similarities are worked out at once, which bounds the memory used
+        self.chunk_size = chunk_size
+
+    def normalise_name(self, name: str) -> str:
+        # Method to lowercase a product name and reduce it to words and numbers, keeping decimal points in sizes
+        name = name.lower().replace("&", " and ")
+        name = re.sub(r"[^\w.]+|(?<!\d)\.|\.(?!\d)", " ", name)
+        return " ".join(name.split())
+
+    def extract_pack_size(self, name: str) -> tuple | None:
+        # Method to get the pack size of a normalised name as a unit and quantity, such as ("g", 800.0)
+        # The last size in a name is used, as multipacks are usually written "4 x 100g"
+        matches = pack_size_pattern.findall(name)
+        if not matches:
+            return None
+
+        count, amount, written_unit = matches[-1]
+        unit, scale = pack_size_units[written_unit]
+        return unit, round(float(amount) * scale * (int(count) if count else 1), 3)
+
+    def remove_pack_size(self, name: str) -> str:
+        # Method to get the words of a normalised name without its pack sizes, which are compared separately
+        return " ".join(pack_size_pattern.sub(" ", name).split())
+
+    def vectorise(self, names: list) -> sparse.csr_matrix:
+        # Method to turn names into rows of TF-IDF weighted character n-grams, scaled to unit length so that
+        # multiplying two rows gives the cosine similarity of their names
+        indptr = [0]
+        indices = []
+        for name in names:
+            padded = f" {name} "
+            ngrams = {padded[start:start + self.ngram_size] for start in range(len(padded) - self.ngram_size + 1)}
+            indices.extend(zlib.crc32(ngram.encode("utf-8")) % self.features for ngram in ngrams)
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.int64)
+        matrix = sparse.csr_matrix((np.ones(len(indices)), indices, np.asarray(indptr)),
+                                   shape=(len(names), self.features))
+        matrix.sum_duplicates()
+
+        # N-grams found in fewer names count for more
+        document_frequency = np.bincount(matrix.indices, minlength=self.features)
+        matrix.data *= np.log((1 + len(names)) / (1 + document_frequency[matrix.indices])) + 1
+
+        lengths = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        lengths[lengths == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / lengths) @ matrix)
+
+    def get_blocks(self, names: list, pack_sizes: list) -> dict:
+        # Method to group products that could be the same item, so that only products in the same block are compared
+        # Products are blocked by pack size and each of the first words of their name, as those are usually the brand
+        # and product line, so differently named copies of an item share at least one block
+        blocks = defaultdict(list)
+        for index, (name, pack_size) in enumerate(zip(names, pack_sizes)):
+            for word in set(name.split()[:self.block_words]):
+                blocks[(pack_size, word)].append(index)
+        return blocks
+
+    def score_block(self, vectors: sparse.csr_matrix, block: np.ndarray, supermarket_ids: np.ndarray) -> tuple:
+        # Method to find the pairs in a block from different supermarkets whose names are similar enough, as arrays
+        # of first products, second products and similarities
+        block_vectors = vectors[block]
+        firsts, seconds, scores = [], [], []
+
+        for start in range(0, len(block), self.chunk_size):
+            similarities = (block_vectors[start:start + self.chunk_size] @ block_vectors.T).tocoo()
+            rows = similarities.row + start
+            keep = (similarities.col > rows) & (similarities.data >= self.threshold)
+
+            first, second, score = block[rows[keep]], block[similarities.col[keep]], similarities.data[keep]
+            different_supermarkets = supermarket_ids[first] != supermarket_ids[second]
+
+            firsts.append(first[different_supermarkets])
+            seconds.append(second[different_supermarkets])
+            scores.append(score[different_supermarkets])
+
+        return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(scores)
+
+    def match(self, products: list) -> list:
+        # Method to match products across supermarkets, where each product is a dict with id, name and supermarket_id
+        # Each product keeps its most similar match from each other supermarket, as a dict with the two product ids
+        # and the similarity as the confidence
+        start_time = time.monotonic()
+        if not products:
+            return []
+
+        names = [self.normalise_name(product["name"]) for product in products]
+        pack_sizes = [self.extract_pack_size(name) for name in names]
+        names = [self.remove_pack_size(name) for name in names]
+
+        vectors = self.vectorise(names)
+        supermarket_ids = np.array([product["supermarket_id"] for product in products])
+
+        firsts, seconds, scores = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0)]
+        for block in self.get_blocks(names, pack_sizes).values():
+            if len(block) < 2:
+                continue
+            first, second, score = self.score_block(vectors, np.asarray(block), supermarket_ids)
+            firsts.append(first)
+            seconds.append(second)
+            scores.append(score)
+
+        # A pair found in more than one block is only kept once, best matches first
+        firsts, seconds, scores = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(scores)
+        _, unique_indices = np.unique(firsts * len(products) + seconds, return_index=True)
+        order = unique_indices[np.argsort(-scores[unique_indices], kind="stable")]
+
+        matches = []
+        matched = set()
+        for first, second, score in zip(firsts[order].tolist(), seconds[order].tolist(), scores[order].tolist()):
+            first_key, second_key = (first, supermarket_ids[second]), (second, supermarket_ids[first])
+            if first_key in matched or second_key in matched:
+                continue
+            matched.update((first_key, second_key))
+            matches.append({"product_id": products[first]["id"], "matched_product_id": products[second]["id"],
+                            "confidence": round(score, 4)})
+
+        log.info(f"Matched {len(matches)} pairs of products from {len(products)} products in "
+                 f"{time.monotonic() - start_time:.1f} seconds")
+        return matches
+
+
+def match_products(database, matcher: ProductMatcher | None = None) -> int:
+    # Match every available product across supermarkets, then regroup the products using the matches and tell the
+    # web app the groups have changed, returning the number of matches
+    matcher = matcher if matcher is not None else ProductMatcher()
+    try:
+        matches = matcher.match(database.get_products_for_matching())
+        database.replace_product_matches(matches)
+        database.build_product_groups()
+        database.bump_catalogue_generation()
+        return len(matches)
+    except Exception as e:
+        log.error(f"Error matching products across supermarkets: {e}")
+        return 0
@@ -3,8 +3,9 @@ import logging
 import bs4.element
 import unicodedata
 
-from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
 
+from readiness import ReadinessCondition, SelectorReady, DomStableReady
 from supermarkets import Supermarkets
 
 log = logging.getLogger(__name__)
@@ -24,7 +25,7 @@ class Morrisons(Supermarkets):
 
     def filter_categories(self, html: str | None) -> list:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "category")
             supermarket_categories = []
 
             try:
@@ -33,7 +34,7 @@ class Morrisons(Supermarkets):
 
                     # Extract category name
                     for category_name in litag.find('a'):
-                        category['name'] = category_name
+                        category['name'] = str(category_name)
 
                     # Extract category part-URL
                     for category_part_url in litag.find_all('a', href=True):
@@ -58,7 +59,7 @@ class Morrisons(Supermarkets):
 
     def filter_products(self, html: str | None) -> list:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "listing")
             supermarket_category_products = []
             try:
                 for divtag in soup.find_all('div', {'class': 'fop-contentWrapper'}):
@@ -103,20 +104,18 @@ class Morrisons(Supermarkets):
 
     def filter_product_details(self, html: str | None) -> dict | None:
         if html is not None:
-            soup = BeautifulSoup(html, "html.parser")
+            soup = self.parse_html(html, "detail")
             allergy_list = []
             try:
 
                 # Extract product allergens
                 for divtag in soup.find_all('div', {'class': 'bop-info__content'}):
-                    allergens_text = divtag.get_text(strip=True)
+                    allergens_text = divtag.get_text(" ", strip=True)
                     allergens_text = unicodedata.normalize("NFKC", allergens_text)
 
-                    for allergen in self.allergens:
-                        if allergens_text.lower().find(allergen) >= 0:
-                            allergy_list.append(allergen)
+                    allergy_list.extend(self.find_allergens(allergens_text))
 
-                    allergy_list = list(set(allergy_list))
+                    allergy_list = list(dict.fromkeys(allergy_list))
 
                 # Extract product nutritional information
                 nutrients_table = soup.find('tbody')
@@ -178,4 +177,30 @@ class Morrisons(Supermarkets):
         return (r"([(]?[kK][jJ][)]?|[(]?kcal[)]?|Fat|of which Saturates|Carbohydrate|of which "
                 r"Sugars|Fibre|Protein|Salt)([\s]?[<]?\d\d\d|[\s]?[<]?\d+[.]?\d+)")
 
-
+    def get_parse_regions(self, page_type: str) -> list:
+        # Morrisons' filter methods only read the category menu, the product tiles and the information sections
+        if page_type == "category":
+            return [('li', 'has-children')]
+        elif page_type == "listing":
+            return [('div', 'fop-contentWrapper')]
+        return [('div', 'bop-info__content'), ('tbody', None)]
+
+    def get_readiness_condition(self, page_type: str) -> ReadinessCondition:
+        # Morrisons product pages build their information sections in stages, so wait for the DOM to settle
+        if page_type == "category":
+            return SelectorReady(By.CSS_SELECTOR, "li.level-item.has-children")
+        elif page_type == "listing":
+            return SelectorReady(By.CLASS_NAME, "fop-contentWrapper")
+        return DomStableReady()
+
+    def get_fetch_strategy(self, page_type: str) -> str:
+        # Morrisons pages are tried over plain HTTP first, falling back to the browser when their markers are missing
+        return "http"
+
+    def get_html_markers(self, page_type: str) -> list:
+        # Morrisons details fall back to default values on an empty page, so the information sections must be present
+        if page_type == "category":
+            return ['has-children']
+        elif page_type == "listing":
+            return ['fop-contentWrapper']
+        return ['bop-info__content']
@@ -0,0 +1,86 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# The supermarkets a parser worker process filters pages for, keyed by name and set when the worker starts
+worker_supermarkets = {}
+
+
+def start_worker(supermarkets: list) -> None:
+    # Entry point run once in each parser worker process, keeping its own copy of the supermarkets
+    worker_supermarkets.clear()
+    worker_supermarkets.update({supermarket.name: supermarket for supermarket in supermarkets})
+
+
+def parse_page(supermarket_name: str, page_type: str, html: str | None) -> list | dict | None:
+    # Filter a page in a parser worker process, returning the plain lists and dicts the filter methods build
+    return filter_page(worker_supermarkets[supermarket_name], page_type, html)
+
+
+def filter_page(supermarket, page_type: str, html: str | None) -> list | dict | None:
+    # Call the supermarket's filter method for a page type
+    if page_type == "category":
+        return supermarket.filter_categories(html)
+    elif page_type == "listing":
+        return supermarket.filter_products(html)
+    return supermarket.filter_product_details(html)
+
+
+class ParsePool:
+    def __init__(self, supermarkets, workers: int | None = None, max_in_flight: int | None = None):
+        # Initialise the parser worker processes and the limit on pages waiting to be parsed
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.max_in_flight = max_in_flight if max_in_flight is not None else self.workers * 2
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.lock = threading.Lock()
+        self.statistics = {"parsed": 0, "failed": 0, "waits": 0}
+        # Workers are spawned rather than forked, as fetcher threads may be holding locks when one starts
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=start_worker, initargs=(list(supermarkets),))
+
+    def submit(self, supermarket, page_type: str, html: str | None) -> Future:
+        # Method to hand a page to a parser worker, blocking while the most pages allowed are already waiting to be
+        # parsed so fetched HTML can't pile up in memory
+        if not self.slots.acquire(blocking=False):
+            self.count("waits")
+            self.slots.acquire()
+
+        try:
+            future = self.executor.submit(parse_page, supermarket.name, page_type, html)
+        except Exception:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(self.release)
+        return future
+
+    def parse(self, supermarket, page_type: str, html: str | None) -> list | dict | None:
+        # Method to parse a page in a worker and wait for its result
+        return self.submit(supermarket, page_type, html).result()
+
+    def release(self, future: Future) -> None:
+        # Method to free a page's slot once a worker has finished with it
+        self.slots.release()
+        if future.cancelled() or future.exception() is not None:
+            self.count("failed")
+        else:
+            self.count("parsed")
+
+    def count(self, statistic: str) -> None:
+        # Method to increment one of the pool's usage counters
+        with self.lock:
+            self.statistics[statistic] += 1
+
+    def get_statistics(self) -> dict:
+        # Method to get a copy of the pool's usage counters
+        with self.lock:
+            return dict(self.statistics)
+
+    def close(self) -> None:
+        # Method to wait for the pages already handed over and shut down the worker processes
+        self.executor.shutdown(wait=True)
+        log.info(f"Parse pool closed: {self.get_statistics()}")
@@ -0,0 +1,134 @@
+import logging
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import HTMLTreeBuilder, builder_registry
+from bs4.element import Comment
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+log = logging.getLogger(__name__)
+
+# Parser engines from fastest to slowest, by the name BeautifulSoup knows their tree builder by
+# html.parser is part of Python so is always available, the others are only used when their package is installed
+preferred_engines = ["selectolax", "lxml", "html.parser"]
+
+
+class RegionStrainer(SoupStrainer):
+    # Strainer that only builds the subtrees of elements in a list of (tag name, class) regions, where a class of
+    # None matches any element with that name, leaving out the scripts and navigation around them
+    def __init__(self, regions: list):
+        super().__init__()
+        self.regions = regions
+
+    def matches_region(self, name: str, attrs) -> bool:
+        # Method to check whether an element is the top of one of the regions
+        classes = (attrs or {}).get("class") or []
+        if isinstance(classes, str):
+            classes = classes.split()
+        return any(name == region_name and (region_class is None or region_class in classes)
+                   for region_name, region_class in self.regions)
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self.matches_region(name, attrs)
+
+    def allow_string_creation(self, string) -> bool:
+        # Text between regions is never needed
+        return False
+
+    def search_tag(self, markup_name=None, markup_attrs=None):
+        # BeautifulSoup before 4.13 asks this instead of allow_tag_creation
+        return markup_name if self.matches_region(markup_name, markup_attrs) else None
+
+    def get_css_selector(self) -> str:
+        # Method to write the regions as a CSS selector, for engines that can find them without building the page
+        return ", ".join(name + (f".{region_class}" if region_class else "") for name, region_class in self.regions)
+
+
+class SelectolaxTreeBuilder(HTMLTreeBuilder):
+    # Tree builder that parses pages with selectolax's Lexbor parser, then builds the same BeautifulSoup tree from it
+    # that the supermarkets' filter methods search
+    NAME = "selectolax"
+    features = [NAME]
+
+    def prepare_markup(self, markup, user_specified_encoding=None, document_declared_encoding=None,
+                       exclude_encodings=None):
+        # Method to pass the markup through unchanged, as Lexbor detects the encoding of bytes itself
+        yield markup, None, None, False
+
+    def feed(self, markup):
+        # Method to walk the parsed page, opening and closing each element in the BeautifulSoup tree
+        # When only some regions are wanted, Lexbor finds them so that only their subtrees are walked
+        tree = LexborHTMLParser(markup)
+        if isinstance(self.soup.parse_only, RegionStrainer):
+            regions = self.get_outermost(tree.css(self.soup.parse_only.get_css_selector()))
+        else:
+            regions = [tree.root]
+
+        for region in regions:
+            self.replay(region)
+
+    def get_outermost(self, nodes: list) -> list:
+        # Method to drop the matched nodes inside other matched nodes, as they are built along with those
+        matched = {node.mem_id for node in nodes}
+        outermost = []
+        for node in nodes:
+            parent = node.parent
+            while parent is not None and parent.mem_id not in matched:
+                parent = parent.parent
+            if parent is None:
+                outermost.append(node)
+        return outermost
+
+    def replay(self, root):
+        # Method to open and close each element under a node in the BeautifulSoup tree
+        # An explicit stack is used as pages can nest deeper than Python's recursion limit
+        stack = [(root, False)]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                self.soup.endData()
+                self.soup.handle_endtag(node.tag)
+            elif node.tag == "-text":
+                self.soup.handle_data(node.text_content)
+            elif node.tag == "-comment":
+                self.soup.endData()
+                self.soup.handle_data(node.comment_content or "")
+                self.soup.endData(Comment)
+            elif not node.tag.startswith("-"):
+                self.soup.endData()
+                self.soup.handle_starttag(node.tag, None, None, dict(node.attributes))
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(list(node.iter(include_text=True))))
+
+    def test_fragment_to_document(self, fragment):
+        return f"<html><body>{fragment}</body></html>"
+
+
+if LexborHTMLParser is not None:
+    builder_registry.register(SelectolaxTreeBuilder)
+
+
+def is_available(engine: str) -> bool:
+    # Check whether BeautifulSoup has a tree builder for a parser engine
+    return builder_registry.lookup(engine) is not None
+
+
+def get_parser_engine(engine: str | None = None) -> str:
+    # Choose the parser engine to use, either the one asked for, the PARSER_ENGINE environment variable or the
+    # fastest one installed, falling back to html.parser if the one asked for isn't installed
+    engine = engine if engine is not None else os.environ.get("PARSER_ENGINE")
+    if engine is None:
+        return next(engine for engine in preferred_engines if is_available(engine))
+    elif not is_available(engine):
+        log.warning(f"Parser engine {engine} is not installed, using html.parser")
+        return "html.parser"
+    return engine
+
+
+def parse_html(html: str, engine: str, regions: list | None = None) -> BeautifulSoup:
+    # Parse a page with a parser engine into a BeautifulSoup tree, of only the (tag name, class) regions if given
+    return BeautifulSoup(html, engine, parse_only=RegionStrainer(regions) if regions else None)
@@ -0,0 +1,98 @@
+import logging
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+log = logging.getLogger(__name__)
+
+
+class ReadinessCondition:
+    def __init__(self, poll_frequency: float = 0.25):
+        # Initialise how often the page is checked while waiting
+        self.poll_frequency = poll_frequency
+
+    def wait(self, driver, timeout: float) -> None:
+        # Abstract method to block until the page is ready, raising TimeoutException if it never is
+        return None
+
+
+class SelectorReady(ReadinessCondition):
+    def __init__(self, by: str, value: str, poll_frequency: float = 0.25):
+        # Initialise the locator of the element that shows the page has loaded
+        super().__init__(poll_frequency)
+        self.by = by
+        self.value = value
+
+    def wait(self, driver, timeout: float) -> None:
+        # Wait until the element is visible on the page
+        wait = WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency)
+        wait.until(EC.visibility_of_element_located((self.by, self.value)))
+
+    def __repr__(self) -> str:
+        return f"SelectorReady({self.by!r}, {self.value!r})"
+
+
+class DomStableReady(ReadinessCondition):
+    def __init__(self, stable_checks: int = 3, poll_frequency: float = 0.25):
+        # Initialise how many consecutive checks the DOM must stay the same size for
+        super().__init__(poll_frequency)
+        self.stable_checks = stable_checks
+
+    def wait(self, driver, timeout: float) -> None:
+        # Wait until the document has loaded and the number of elements stops changing
+        deadline = time.monotonic() + timeout
+        previous_size = None
+        stable_count = 0
+
+        while time.monotonic() < deadline:
+            ready_state, size = driver.execute_script(
+                "return [document.readyState, document.getElementsByTagName('*').length];"
+            )
+            if ready_state == "complete" and size == previous_size:
+                stable_count += 1
+                if stable_count >= self.stable_checks:
+                    return None
+            else:
+                stable_count = 0
+            previous_size = size
+            time.sleep(self.poll_frequency)
+
+        raise TimeoutException(f"DOM did not stabilise within {timeout} seconds")
+
+    def __repr__(self) -> str:
+        return f"DomStableReady(stable_checks={self.stable_checks})"
+
+
+class NetworkIdleReady(ReadinessCondition):
+    def __init__(self, idle_time: float = 0.5, poll_frequency: float = 0.25):
+        # Initialise how long the page must go without loading a new resource
+        super().__init__(poll_frequency)
+        self.idle_time = idle_time
+
+    def wait(self, driver, timeout: float) -> None:
+        # Wait until the document has loaded and no new resources have been requested for the idle time
+        deadline = time.monotonic() + timeout
+        previous_count = None
+        idle_since = None
+
+        while time.monotonic() < deadline:
+            ready_state, resource_count = driver.execute_script(
+                "return [document.readyState, performance.getEntriesByType('resource').length];"
+            )
+            now = time.monotonic()
+            if ready_state == "complete" and resource_count == previous_count:
+                if idle_since is None:
+                    idle_since = now
+                if now - idle_since >= self.idle_time:
+                    return None
+            else:
+                idle_since = None
+            previous_count = resource_count
+            time.sleep(self.poll_frequency)
+
+        raise TimeoutException(f"Network did not become idle within {timeout} seconds")
+
+    def __repr__(self) -> str:
+        return f"NetworkIdleReady(idle_time={self.idle_time})"
@@ -1,22 +1,69 @@
 import logging
+import queue
+import statistics
 import time
-import psutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import WebDriverException, TimeoutException
 from selenium.webdriver.chrome.options import Options
 
+from browser_pool import BrowserPool
+from cache import HtmlCache
+from parse_pool import ParsePool
+from readiness import ReadinessCondition, SelectorReady, DomStableReady
+from throttle import HostThrottle
+
 log = logging.getLogger(__name__)
 
 
 class Scraper:
-    def __init__(self, supermarkets, database):
+    def __init__(self, supermarkets, database, pool_size: int = 2, max_pages_per_driver: int = 50,
+                 ready_timeout: float = 10, detail_workers: int | None = None, host_concurrency: int = 2,
+                 politeness_delay: float = 1.0, http_timeout: float = 15, cache: HtmlCache | None = None,
+                 replay: bool = False, detail_max_age: float = 7 * 24 * 60 * 60, detail_flush_size: int = 50,
+                 detail_flush_interval: float = 5.0, parse_workers: int = 0, parse_queue_size: int | None = None,
+                 regroup: bool = True):
         self.supermarkets = supermarkets
         self.database = database
+        # Long-lived browser sessions shared by get_html and get_page
+        self.browser_pool = BrowserPool(driver_factory=self.setup_driver, size=pool_size,
+                                        max_pages=max_pages_per_driver)
+        # How long to wait for a page's readiness condition and how long each page took to become ready
+        self.ready_timeout = ready_timeout
+        self.latencies = defaultdict(list)
+        # Product detail pages are fetched concurrently, limited per host and spaced out by a politeness delay
+        self.detail_workers = detail_workers if detail_workers is not None else pool_size
+        self.throttle = HostThrottle(max_concurrency=host_concurrency, delay=politeness_delay)
+        # Keep-alive HTTP session tried before the browser, and a count of which path served each page
+        self.http_session = self.setup_session(pool_size=max(self.detail_workers, host_concurrency))
+        self.http_timeout = http_timeout
+        self.fetch_paths = defaultdict(int)
+        # On-disk HTML cache, and whether to serve every page from it without touching the network
+        self.cache = cache
+        self.replay = replay
+        # Seconds before a product's details are fetched again even if its listing tile hasn't changed
+        self.detail_max_age = detail_max_age
+        self.detail_statistics = {"New": 0, "Refreshed": 0, "Skipped": 0}
+        self.product_statistics = {"New": 0, "Updated": 0, "Deleted": 0}
+        # Fetched details are buffered and written together every so many products or seconds
+        self.detail_flush_size = detail_flush_size
+        self.detail_flush_interval = detail_flush_interval
+        self.detail_buffer = []
+        self.detail_flushed_at = time.monotonic()
+        # Paginated listing and detail pages are parsed in a pool of worker processes while the next pages are fetched
+        # when parse workers are asked for, keeping at most parse_queue_size pages waiting to be parsed, otherwise
+        # they are parsed on the thread that fetched them
+        self.parse_pool = (ParsePool(supermarkets, workers=parse_workers, max_in_flight=parse_queue_size)
+                           if parse_workers > 0 else None)
+        # Whether to regroup the products when the cycle finishes, which is left to the caller when every supermarket
+        # is scraped first and the products are then matched
+        self.regroup = regroup
 
     def scrape(self) -> None:
         try:
@@ -27,21 +74,87 @@ class Scraper:
             log.warning("Too many redirects")
         except requests.exceptions.RequestException as e:
             log.warning(f"Request except: {e}")
+        finally:
+            self.finish_cycle()
+            self.close()
         return None
 
+    def finish_cycle(self) -> None:
+        # Regroup products across supermarkets, then tell the web app new data has landed so it stops using search
+        # results it cached before this run
+        if not self.regroup:
+            return
+
+        try:
+            self.database.build_product_groups()
+            generation = self.database.bump_catalogue_generation()
+            log.info(f"Catalogue generation is now {generation}")
+        except Exception as e:
+            log.error(f"Error finishing the scrape cycle: {e}")
+
+    def close(self) -> None:
+        # Shut down the browser sessions that were kept alive during the cycle
+        self.browser_pool.close()
+        self.http_session.close()
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+        self.log_latency_statistics()
+        self.log_fetch_path_statistics()
+        log.info(f"Products: {self.product_statistics}")
+        log.info(f"Product detail fetches: {self.detail_statistics}")
+
+    def add_product_statistics(self, statistics: dict | None) -> None:
+        # Method to add the statistics returned for a page of products to the cycle's totals
+        if isinstance(statistics, dict):
+            for statistic, count in statistics.items():
+                self.product_statistics[statistic] += count
+
+    def record_latency(self, supermarket, page_type: str, seconds: float) -> None:
+        # Method to record how long a page took to load and become ready
+        supermarket_name = supermarket.name if supermarket is not None else "Unknown"
+        self.latencies[(supermarket_name, page_type)].append(seconds)
+
+    def log_latency_statistics(self) -> None:
+        # Method to log the page latency for each supermarket and page type
+        for (supermarket_name, page_type), latencies in sorted(self.latencies.items()):
+            log.info(f"{supermarket_name} {page_type} pages: {len(latencies)} fetched, "
+                     f"mean {statistics.mean(latencies):.2f}s, median {statistics.median(latencies):.2f}s, "
+                     f"max {max(latencies):.2f}s")
+
+    def record_fetch_path(self, supermarket, page_type: str, path: str) -> None:
+        # Method to record whether a page was served over plain HTTP or by the browser
+        supermarket_name = supermarket.name if supermarket is not None else "Unknown"
+        self.fetch_paths[(supermarket_name, page_type, path)] += 1
+
+    def log_fetch_path_statistics(self) -> None:
+        # Method to log how many pages of each type were served by each path
+        for (supermarket_name, page_type, path), count in sorted(self.fetch_paths.items()):
+            log.info(f"{supermarket_name} {page_type} pages served by {path}: {count}")
+
+    def get_readiness_condition(self, supermarket, page_type: str) -> ReadinessCondition:
+        # Method to get the condition a page must meet before its HTML is read
+        if supermarket is not None:
+            return supermarket.get_readiness_condition(page_type)
+        elif page_type == "listing":
+            return SelectorReady(By.CLASS_NAME, "product-tile")
+        return DomStableReady()
+
     def scrape_cycle(self):
         # Indices for accessing category information
         category_id_index = 0
         category_part_url_index = 1
         category_name_index = 2
 
+        # Products not listed since the cycle started are marked as unavailable
+        cycle_start = datetime.now()
+
         # Add supermarkets to the database
         self.database.add_supermarket(self.supermarkets)
 
         # Iterate over supermarkets and add categories to the database
         for supermarket in self.supermarkets:
             log.info(f"Adding {supermarket.name} categories")
-            html = self.get_html(url=supermarket.base_url)
+            html = self.fetch(url=supermarket.base_url, supermarket=supermarket, page_type="category")
             supermarket_categories = supermarket.filter_categories(html)
             self.database.add_supermarket_category(
                 {"supermarket_id": supermarket.get_id(), "supermarket_categories": supermarket_categories}
@@ -63,6 +176,8 @@ class Scraper:
                     start_page_url = supermarket.base_url + category_information[category_part_url_index]
                     page = 1
                     finished_category = False
+                    listed_products = 0
+                    parsing_pages = []
 
                     while not finished_category:
                         empty_string = ""
@@ -70,71 +185,260 @@ class Scraper:
 
                         if url == empty_string:
                             # Get the category products if they are shown on a single page e.g. Morrisons
-                            html = self.get_html(url=start_page_url)
+                            html = self.fetch(url=start_page_url, supermarket=supermarket, page_type="listing")
                             supermarket_category_products = supermarket.filter_products(html)
-                            self.database.add_supermarket_category_products(
+                            self.add_product_statistics(self.database.add_supermarket_category_products(
                                 {"supermarket_category_id": category_information[category_id_index],
                                  "supermarket_category_products": supermarket_category_products}
-                            )
+                            ))
+                            listed_products += len(supermarket_category_products)
                             finished_category = True
 
                         else:
-                            html = self.get_page(url=url)
+                            html = self.fetch(url=url, supermarket=supermarket, page_type="listing", paginated=True)
 
                             if html is None:
                                 finished_category = True
                                 log.info(f"Moving to next category")
 
                             else:
-                                # Iterate over the categories pages and get the products
-                                supermarket_category_products = supermarket.filter_products(html)
-                                self.database.add_supermarket_category_products(
-                                    {"supermarket_category_id": category_information[category_id_index],
-                                     "supermarket_category_products": supermarket_category_products}
+                                # Iterate over the categories pages, handing each to be parsed while the next one is
+                                # fetched and writing the products of the pages that have already been parsed
+                                parsing_pages.append((self.submit_listing(supermarket, html), html))
+                                listed_products += self.write_parsed_listings(
+                                    supermarket, category_information[category_id_index], parsing_pages
                                 )
                                 page += 1
 
                     if finished_category:
-                        # Retrieve the products table and query all the products belonging to the current category
+                        listed_products += self.write_parsed_listings(
+                            supermarket, category_information[category_id_index], parsing_pages, wait=True
+                        )
+
+                        # Only mark products as unavailable if the category's listing could actually be read
+                        if listed_products > 0:
+                            self.product_statistics["Deleted"] += self.database.mark_unavailable_products(
+                                category_information[category_id_index], cycle_start
+                            )
+
+                        # Retrieve the products table and query the available products in the current category
                         supermarket_products_table = self.database.get_table_object("supermarket_products")
                         products = self.database.session.query(supermarket_products_table).filter_by(
                             supermarket_category_id=category_information[category_id_index]
-                        ).all()
-
-                        # Iterate over each product and extract the products allergen and nutritional information
-                        for product in products:
-                            product_id, product_part_url = product.id, product.product_part_url
-
-                            # Constructing URL for Morrisons products
-                            url = supermarket.base_url.replace("/browse", "") + product_part_url
-
-                            html = self.get_html(url=url)
-                            supermarket_product_details = supermarket.filter_product_details(html)
-
-                            if supermarket_product_details is not None:
-                                try:
-                                    self.database.add_product_information(
-                                        {"supermarket_product_id": product_id,
-                                         "supermarket_product_details": supermarket_product_details
-                                         }
-                                    )
-                                except KeyError as e:
-                                    log.error(f"KeyError processing product {product_id}: {e}. "
-                                              f"Details: {supermarket_product_details}")
-                                    continue
-                                except Exception as ex:
-                                    log.error(f"Error processing product {product_id}: {ex}")
-                                    continue
-
-                                if "allergens" in supermarket_product_details:
-                                    self.database.add_product_allergy_information(
-                                        {"supermarket_product_id": product_id,
-                                         "supermarket_product_details": supermarket_product_details
-                                         }
-                                    )
-                            else:
-                                log.warning(f"{product.product_name} has no nutritional information")
-                                continue
+                        ).filter(supermarket_products_table.c.is_available.isnot(False)).all()
+
+                        # Fetch the allergen and nutritional information of new or changed products concurrently
+                        products = self.select_products_for_details(products)
+                        self.scrape_product_details(supermarket, products)
+
+    def select_products_for_details(self, products: list) -> list:
+        # Method to choose the products whose details are missing, out of date or whose listing tile has changed
+        detail_states = self.database.get_product_detail_states([product.id for product in products])
+        oldest_allowed = datetime.now() - timedelta(seconds=self.detail_max_age)
+        selected_products = []
+
+        for product in products:
+            detail_state = detail_states.get(product.id)
+
+            if detail_state is None:
+                self.detail_statistics["New"] += 1
+            elif (detail_state["last_updated"] is None or detail_state["last_updated"] < oldest_allowed
+                  or detail_state["tile_hash"] != product.tile_hash):
+                self.detail_statistics["Refreshed"] += 1
+            else:
+                self.detail_statistics["Skipped"] += 1
+                continue
+
+            selected_products.append(product)
+
+        log.info(f"Fetching details for {len(selected_products)} of {len(products)} products")
+        return selected_products
+
+    def scrape_product_details(self, supermarket, products: list) -> None:
+        # Method to fetch product detail pages in a bounded thread pool while writing the results on this thread
+        # so that SQLite writes stay serialised through a single queue
+        results = queue.Queue()
+
+        with ThreadPoolExecutor(max_workers=self.detail_workers) as executor:
+            for product in products:
+                executor.submit(self.fetch_product_details, supermarket, product, results)
+
+            received = 0
+            while received < len(products):
+                # Wake up at least every flush interval so slow fetches don't hold buffered details back
+                try:
+                    product, supermarket_product_details = results.get(timeout=self.detail_flush_interval)
+                except queue.Empty:
+                    self.flush_product_details()
+                    continue
+                received += 1
+                self.write_product_details(product, supermarket_product_details)
+
+        self.flush_product_details()
+
+    def fetch_product_details(self, supermarket, product, results: queue.Queue) -> None:
+        # Method to fetch a single product's detail page and filter it, or hand it to the parse pool so this thread
+        # can move on to the next fetch, always handing a result to the writer
+        supermarket_product_details = None
+        try:
+            # Constructing URL for Morrisons products
+            url = supermarket.base_url.replace("/browse", "") + product.product_part_url
+
+            html = self.fetch(url=url, supermarket=supermarket, page_type="detail")
+            if self.parse_pool is not None and html is not None:
+                try:
+                    future = self.parse_pool.submit(supermarket, "detail", html)
+                    future.add_done_callback(
+                        lambda parsed: self.hand_over_details(results, supermarket, product, html, parsed)
+                    )
+                    return
+                except Exception as e:
+                    log.error(f"Error handing product {product.id} to the parse pool, parsing it here instead: {e}")
+            supermarket_product_details = supermarket.filter_product_details(html)
+        except Exception as e:
+            log.error(f"Error fetching details for product {product.id}: {e}")
+        results.put((product, supermarket_product_details))
+
+    def hand_over_details(self, results: queue.Queue, supermarket, product, html: str, future: Future) -> None:
+        # Method to hand the details a parser worker filtered from a product's page to the writer, parsing the page
+        # here instead if the worker failed
+        try:
+            supermarket_product_details = future.result()
+        except Exception as e:
+            log.error(f"Error parsing details for product {product.id} in the parse pool, parsing it here instead: {e}")
+            supermarket_product_details = supermarket.filter_product_details(html)
+        results.put((product, supermarket_product_details))
+
+    def submit_listing(self, supermarket, html: str) -> Future:
+        # Method to hand a listing page to the parse pool, or parse it on this thread if there is no pool or it has
+        # failed, giving back a future either way
+        if self.parse_pool is not None:
+            try:
+                return self.parse_pool.submit(supermarket, "listing", html)
+            except Exception as e:
+                log.error(f"Error handing a listing page to the parse pool, parsing it here instead: {e}")
+
+        future = Future()
+        future.set_result(supermarket.filter_products(html))
+        return future
+
+    def write_parsed_listings(self, supermarket, category_id: int, parsing_pages: list, wait: bool = False) -> int:
+        # Method to write the products of listing pages in the order they were fetched, stopping at the first page
+        # still being parsed unless asked to wait for every page, returning how many products were written
+        listed_products = 0
+        while parsing_pages and (wait or parsing_pages[0][0].done()):
+            future, html = parsing_pages.pop(0)
+            try:
+                supermarket_category_products = future.result()
+            except Exception as e:
+                log.error(f"Error parsing a listing page in the parse pool, parsing it here instead: {e}")
+                supermarket_category_products = supermarket.filter_products(html)
+
+            self.add_product_statistics(self.database.add_supermarket_category_products(
+                {"supermarket_category_id": category_id,
+                 "supermarket_category_products": supermarket_category_products}
+            ))
+            listed_products += len(supermarket_category_products)
+        return listed_products
+
+    def write_product_details(self, product, supermarket_product_details: dict | None) -> None:
+        # Method to buffer a product's nutritional and allergen information, writing the buffer once it is full or
+        # hasn't been written for the flush interval
+        if supermarket_product_details is not None:
+            self.detail_buffer.append(
+                {"supermarket_product_id": product.id,
+                 "supermarket_product_details": supermarket_product_details,
+                 "tile_hash": getattr(product, "tile_hash", None)
+                 }
+            )
+        else:
+            log.warning(f"{product.product_name} has no nutritional information")
+
+        if (len(self.detail_buffer) >= self.detail_flush_size
+                or time.monotonic() - self.detail_flushed_at >= self.detail_flush_interval):
+            self.flush_product_details()
+
+    def flush_product_details(self) -> None:
+        # Method to write the buffered product details to the database in one batch
+        self.detail_flushed_at = time.monotonic()
+        if not self.detail_buffer:
+            return
+
+        buffer, self.detail_buffer = self.detail_buffer, []
+        try:
+            self.database.add_product_details_batch(buffer)
+        except Exception as ex:
+            log.error(f"Error writing details for {len(buffer)} products: {ex}")
+
+    def fetch(self, url: str, supermarket=None, page_type: str = "detail", paginated: bool = False) -> str | None:
+        # Method to fetch a page from the cache, then over plain HTTP when the supermarket's strategy allows it,
+        # falling back to the browser when the response can't be parsed
+        if self.cache is not None:
+            html = self.cache.get(url, ignore_ttl=self.replay)
+            if html is not None:
+                self.record_fetch_path(supermarket, page_type, "cache")
+                return html
+
+        if self.replay:
+            log.info(f"{url} is not in the cache, skipping it in replay mode")
+            self.record_fetch_path(supermarket, page_type, "failed")
+            return None
+
+        if supermarket is not None and supermarket.get_fetch_strategy(page_type) == "http":
+            html = self.get_http(url)
+            if html is not None and supermarket.validate_html(html, page_type):
+                self.record_fetch_path(supermarket, page_type, "http")
+                self.store(url, html, 200, page_type)
+                return html
+            log.info(f"Plain HTTP response for {url} was not usable, falling back to the browser")
+
+        if paginated:
+            html = self.get_page(url=url, supermarket=supermarket)
+        else:
+            html = self.get_html(url=url, supermarket=supermarket, page_type=page_type)
+
+        if html is not None:
+            # Selenium doesn't expose the response status of a page
+            self.record_fetch_path(supermarket, page_type, "browser")
+            self.store(url, html, None, page_type)
+        else:
+            self.record_fetch_path(supermarket, page_type, "failed")
+        return html
+
+    def store(self, url: str, html: str, status: int | None, page_type: str) -> None:
+        # Method to add a fetched page to the cache if one is being used
+        if self.cache is not None:
+            self.cache.put(url, html, status, page_type)
+
+    def setup_session(self, pool_size: int) -> requests.Session:
+        user_agent = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                      "Chrome/124.0.0.0 Safari/537.36")
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+            "Accept-Language": "en-GB,en;q=0.9",
+            "Connection": "keep-alive",
+        })
+        return session
+
+    def get_http(self, url: str) -> str | None:
+        log.info(f"Requesting {url}")
+        try:
+            with self.throttle.request(url):
+                response = self.http_session.get(url, timeout=self.http_timeout)
+            if response.status_code != 200:
+                log.info(f"Plain HTTP request for {url} returned status {response.status_code}")
+                return None
+            return response.text
+        except requests.exceptions.RequestException as e:
+            log.warning(f"Request except: {e}")
+            return None
 
     def setup_driver(self):
         user_agent = ("Mozilla/5.0 (iPhone; CPU iPhone OS 12_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
@@ -151,51 +455,37 @@ class Scraper:
 
         return webdriver.Chrome(options=options)
 
-    def get_html(self, url: str) -> str | None:
+    def get_html(self, url: str, supermarket=None, page_type: str = "detail") -> str | None:
         log.info(f"Scraping {url}")
-        driver = None
         try:
-            driver = self.setup_driver()
-            driver.get(url)
-            time.sleep(5)
-            html = driver.page_source
-            return html
+            with self.throttle.request(url), self.browser_pool.driver() as driver:
+                start_time = time.monotonic()
+                driver.get(url)
+                try:
+                    self.get_readiness_condition(supermarket, page_type).wait(driver, self.ready_timeout)
+                except TimeoutException:
+                    # The page may still have usable content, so read whatever has loaded
+                    log.warning(f"Page was not ready after {self.ready_timeout} seconds: {url}")
+                self.record_latency(supermarket, page_type, time.monotonic() - start_time)
+                html = driver.page_source
+                return html
         except (WebDriverException, Exception) as e:
             log.error(f"Selenium exception: {e}")
             return None
-        finally:
-            if driver:
-                driver_process = psutil.Process(driver.service.process.pid)
-                if driver_process.is_running():
-                    driver.close()
-                    driver_process.terminate()
-                else:
-                    log.info("Driver has quit successfully")
-
-    def get_page(self, url: str) -> str | None:
+
+    def get_page(self, url: str, supermarket=None) -> str | None:
         log.info(f"Scraping {url}")
-        driver = None
         try:
-            driver = self.setup_driver()
-            driver.get(url)
-            wait = WebDriverWait(driver, 10)
-            element = wait.until(
-                EC.visibility_of_element_located((By.CLASS_NAME, "product-tile"))
-            )
-            time.sleep(5)
-            html = driver.page_source
-            return html
+            with self.throttle.request(url), self.browser_pool.driver() as driver:
+                start_time = time.monotonic()
+                driver.get(url)
+                self.get_readiness_condition(supermarket, "listing").wait(driver, self.ready_timeout)
+                self.record_latency(supermarket, "listing", time.monotonic() - start_time)
+                html = driver.page_source
+                return html
         except TimeoutException:
             log.warning(f"Time out waiting for an element")
             return None
         except Exception as e:
             log.error(f"An error occurred while fetching the page: {e}")
             return None
-        finally:
-            if driver:
-                driver_process = psutil.Process(driver.service.process.pid)
-                if driver_process.is_running():
-                    driver.close()
-                    driver_process.terminate()
-                else:
-                    log.info("Driver has quit successfully")
@@ -1,13 +1,23 @@
 import logging
 import re
+import string
 
 import sqlalchemy.sql.schema
+from bs4 import BeautifulSoup
 
 from database import Database
+from parser_engines import get_parser_engine, parse_html
+from readiness import ReadinessCondition, DomStableReady
 
 db = Database()
 log = logging.getLogger(__name__)
 
+# Registry of compiled regular expressions shared by every supermarket, keyed by pattern and flags
+compiled_patterns = {}
+
+# Table turning the punctuation and digits between words into spaces, so text can be split into words
+word_separators = str.maketrans(string.punctuation + string.digits, " " * len(string.punctuation + string.digits))
+
 
 class Supermarkets:
     def __init__(self):
@@ -18,7 +28,9 @@ class Supermarkets:
         self.id = None
         self.categories = self.get_categories()
         self.allergens = self.get_allergens()
-        self.nutrition_pattern = self.get_nutrition_pattern()
+        self.allergen_words = frozenset(self.allergens)
+        self.nutrition_pattern = self.get_pattern(self.get_nutrition_pattern())
+        self.parser_engine = get_parser_engine()
 
     def build_url(self, url: str, page: int) -> str:
         # Abstract method to build a URL for a specific page
@@ -36,6 +48,11 @@ class Supermarkets:
         # Abstract method to filter products from HTML content
         return {}
 
+    def parse_html(self, html: str, page_type: str | None = None) -> BeautifulSoup:
+        # Method to parse a page with the supermarket's parser engine, for its filter methods to search
+        # Only the regions the page type's filter method needs are built, or the whole page without a page type
+        return parse_html(html, self.parser_engine, self.get_parse_regions(page_type) if page_type else None)
+
     def assign_product_values(self, nutritional_values: list, allergens: list) -> dict | None:
         # Method to assign the values of a products nutritional information
         product_details = {}
@@ -148,6 +165,46 @@ class Supermarkets:
             "mustard", "lupin", "rye", "sulphites", "fish", "shellfish", "celery", "sesame", "molluscs"
         ]
 
+    def get_pattern(self, pattern: str, flags: int = 0) -> re.Pattern:
+        # Method to get a regular expression from the registry, compiling it the first time it is used
+        key = (pattern, flags)
+        if key not in compiled_patterns:
+            compiled_patterns[key] = re.compile(pattern, flags)
+        return compiled_patterns[key]
+
+    def find_allergens(self, text: str) -> list:
+        # Method to find the allergens mentioned as whole words in a piece of text, in a single pass that splits it
+        # into words and looks each one up, so "shellfish" isn't also read as "fish"
+        words = self.allergen_words.intersection(text.lower().translate(word_separators).split())
+        return [allergen for allergen in self.allergens if allergen in words]
+
     def get_nutrition_pattern(self) -> str:
         # Abstract method representing the regular expressions used to extract values from nutritional information
         return r""
+
+    def get_readiness_condition(self, page_type: str) -> ReadinessCondition:
+        # Method representing what the scraper waits for before reading a 'category', 'listing' or 'detail' page
+        return DomStableReady()
+
+    def get_parse_regions(self, page_type: str) -> list:
+        # Method representing the (tag name, class) elements a 'category', 'listing' or 'detail' page's filter method
+        # searches within, where an empty list means the whole page is parsed
+        return []
+
+    def get_fetch_strategy(self, page_type: str) -> str:
+        # Method representing whether a page type is tried over plain 'http' first or always loaded in the 'browser',
+        # which is assumed unless a supermarket knows the page's content is in its HTML
+        return "browser"
+
+    def get_html_markers(self, page_type: str) -> list:
+        # Method representing the text a 'category', 'listing' or 'detail' page's HTML must contain for its filter
+        # method to have something to read, where an empty list means the page can't be checked
+        return []
+
+    def validate_html(self, html: str | None, page_type: str) -> bool:
+        # Method to check that a page contains the content its filter method needs by looking for its markers, so a
+        # page fetched over plain HTTP isn't parsed once to check it and again to filter it
+        markers = self.get_html_markers(page_type)
+        if html is None or not markers:
+            return False
+        return all(marker in html for marker in markers)
@@ -1,11 +1,18 @@
+import argparse
 import logging
+import multiprocessing
 import os
+import time
 from pathlib import Path
 from scraper import Scraper
+from cache import HtmlCache
 from database import Database
+from matcher import match_products
+from writer import QueuedDatabase, run_writer
 from aldi import Aldi
 from morrisons import Morrisons
 from iceland import Iceland
+from tesco import Tesco
 
 # Define the path to the log file and ensures that it exists or creates it if it doesn't
 logs_file = Path(Path().resolve(), "log.text")
@@ -13,7 +20,7 @@ logs_file.touch(exist_ok=True)
 
 # Set up the logging configuration, specifying formats
 logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
     level=os.environ.get("LOGLEVEL", "INFO"),
     handlers=[logging.FileHandler(logs_file), logging.StreamHandler()],
@@ -23,11 +30,124 @@ logging.basicConfig(
 # Creating a logger object specific to this module
 log = logging.getLogger(__name__)
 
-# Creating the required instances
-db = Database()
-aldi, morrisons, iceland = Aldi(), Morrisons(), Iceland()
-supermarkets = [aldi, morrisons, iceland]
-scraper = Scraper(supermarkets=supermarkets, database=db)
+# The supermarkets to scrape, created inside each worker process when scraping in parallel
+supermarket_classes = [Aldi, Morrisons, Iceland, Tesco]
 
-# Scraping the necessary supermarket data
-scraper.scrape()
+
+def scrape_serial(cache_options: dict, parse_workers: int) -> None:
+    # Creating the required instances
+    db = Database()
+    supermarkets = [supermarket_class() for supermarket_class in supermarket_classes]
+    scraper = Scraper(supermarkets=supermarkets, database=db, parse_workers=parse_workers, regroup=False,
+                      **create_cache(**cache_options))
+
+    # Scraping the necessary supermarket data
+    scraper.scrape()
+
+
+def create_cache(cache_directory: str | None, cache_ttl: float, replay: bool) -> dict:
+    # Build the cache arguments for a Scraper, where the TTL is given in hours
+    if cache_directory is None:
+        return {"cache": None, "replay": False}
+    return {"cache": HtmlCache(directory=cache_directory, ttl=cache_ttl * 60 * 60), "replay": replay}
+
+
+def scrape_supermarket(supermarket_class, write_queue, reply_queue, cache_options: dict, parse_workers: int) -> None:
+    # Entry point for a worker process that scrapes one supermarket with its own browser pool
+    supermarket = supermarket_class()
+    database = QueuedDatabase(write_queue=write_queue, reply_queue=reply_queue,
+                              worker_name=supermarket_class.__name__)
+    scraper = Scraper(supermarkets=[supermarket], database=database, parse_workers=parse_workers, regroup=False,
+                      **create_cache(**cache_options))
+
+    try:
+        scraper.scrape()
+    finally:
+        database.close()
+
+
+def scrape_parallel(cache_options: dict, parse_workers: int) -> None:
+    # One worker process per supermarket, with a single writer process owning the database connection, and the
+    # parse workers split between them so the processes together use each core once
+    write_queue = multiprocessing.Queue()
+    reply_queues = {supermarket_class.__name__: multiprocessing.Queue() for supermarket_class in supermarket_classes}
+
+    writer = multiprocessing.Process(target=run_writer, args=(write_queue, reply_queues), name="Writer")
+    writer.start()
+
+    worker_parse_workers = max(1, parse_workers // len(supermarket_classes)) if parse_workers > 0 else 0
+    workers = [
+        multiprocessing.Process(target=scrape_supermarket, name=supermarket_class.__name__,
+                                args=(supermarket_class, write_queue, reply_queues[supermarket_class.__name__],
+                                      cache_options, worker_parse_workers))
+        for supermarket_class in supermarket_classes
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        if worker.exitcode != 0:
+            log.error(f"{worker.name} worker exited with code {worker.exitcode}")
+
+    # Tell the writer to stop once every worker has flushed its writes
+    write_queue.put(None)
+    writer.join()
+
+
+def regroup_products(database: Database) -> None:
+    # Regroup the products once every supermarket has been scraped, then tell the web app the groups have changed
+    try:
+        groups = database.build_product_groups()
+        generation = database.bump_catalogue_generation()
+        log.info(f"Built {groups} product groups, catalogue generation is now {generation}")
+    except Exception as e:
+        log.error(f"Error regrouping products: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scrape supermarket products into the database")
+    parser.add_argument("--parallel", action="store_true",
+                        help="scrape each supermarket in its own process with a single database writer")
+    parser.add_argument("--replay", action="store_true",
+                        help="re-run the cycle entirely from cached HTML without fetching anything")
+    parser.add_argument("--cache-dir", default="html_cache",
+                        help="directory for cached HTML (default: %(default)s)")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="hours a cached page is used for before it is fetched again (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write cached HTML")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes parsing fetched pages, or 0 to parse them as they are fetched "
+                             "(default: %(default)s)")
+    parser.add_argument("--skip-matching", action="store_true",
+                        help="don't match products across supermarkets after scraping")
+    parser.add_argument("--match-only", action="store_true",
+                        help="only match the products already in the database across supermarkets")
+    args = parser.parse_args()
+
+    if args.replay and args.no_cache:
+        parser.error("--replay needs the cache")
+
+    cache_options = {"cache_directory": None if args.no_cache else args.cache_dir, "cache_ttl": args.cache_ttl,
+                     "replay": args.replay}
+
+    if args.skip_matching and args.match_only:
+        parser.error("--match-only can't skip matching")
+
+    start_time = time.monotonic()
+    if args.parallel and not args.match_only:
+        scrape_parallel(cache_options, args.parse_workers)
+    elif not args.match_only:
+        scrape_serial(cache_options, args.parse_workers)
+
+    # Matching runs once every supermarket has been scraped, as it compares the whole catalogue, and regroups the
+    # products afterwards, so they are only regrouped here if matching is skipped
+    if not args.skip_matching:
+        matches = match_products(Database())
+        log.info(f"Matched {matches} products across supermarkets")
+    else:
+        regroup_products(Database())
+    log.info(f"Scrape cycle finished in {time.monotonic() - start_time:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,174 @@
 import logging
 
-from bs4 import BeautifulSoup
-from scraper import Scraper
+import bs4.element
+from selenium.webdriver.common.by import By
+
+from readiness import ReadinessCondition, SelectorReady
+from supermarkets import Supermarkets
 
 log = logging.getLogger(__name__)
 
 
-class Tesco:
-    def __init__(self) -> None:
+class Tesco(Supermarkets):
+    def __init__(self):
+        # Initialise Tesco-specific attributes
+        super().__init__()
         self.name = "Tesco"
-        self.base_url = f"https://www.tesco.com/groceries/"
-        self.start_page = 1
+        self.logo = "https://www.tesco.com/groceries/assets/oop/images/tesco-logo.svg"
+        self.base_url = "https://www.tesco.com/groceries/"
         log.info(f"{self.name} loaded")
 
-    def build_url(self, page):
-        return self.base_url + f"page={self.start_page + page}&count=48"
-
-    def return_supermarket_categories(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        supermarket_categories = []
-
-
+    def build_url(self, url: str, page: int) -> str:
+        return url + f"?page={page}&count=48"
+
+    def filter_categories(self, html: str | None) -> list:
+        if html is not None:
+            soup = self.parse_html(html, "category")
+            supermarket_categories = []
+
+            try:
+                # Each department's "all" link, such as /groceries/en-GB/shop/fresh-food/all
+                for a_tag in soup.find_all('a', {'class': 'menu__link--superdepartment'}, href=True):
+                    part_url = self.format_part_url(a_tag.get('href'))
+                    category_name = part_url.split("/shop/")[-1].split("/")[0].replace("-", " ")
+                    supermarket_categories.append({'name': category_name, 'part_url': part_url})
+
+                return supermarket_categories
+
+            except Exception as e:
+                log.error(f"Error filtering {self.name} categories: {e}")
+                return []
+        else:
+            log.error(f"Page was not found: category html for {self.name} was not passed correctly")
+            return []
+
+    def filter_products(self, html: str | None) -> list:
+        if html is not None:
+            soup = self.parse_html(html, "listing")
+            supermarket_category_products = []
+
+            try:
+                for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
+                    product = {}
+
+                    # Extract every field in one walk over the tile's elements
+                    for tag in litag.find_all(True):
+                        classes = tag.get('class') or []
+
+                        if tag.name == 'span' and 'ddsweb-link__text' in classes and 'name' not in product:
+                            product['name'] = tag.get_text(strip=True)
+                        elif tag.name == 'p' and 'beans-price__text' in classes and 'price' not in product:
+                            product['price'] = self.format_product_price_pound(tag.get_text(strip=True))
+                        elif tag.name == 'img' and 'image' not in product and tag.get('src'):
+                            product['image'] = tag.get('src')
+                        elif tag.name == 'a' and 'part_url' not in product and "/products/" in tag.get('href', ''):
+                            product['part_url'] = self.format_part_url(tag.get('href'))
+
+                    supermarket_category_products.append(product)
+
+                return self.format_supermarket_category_products(supermarket_category_products)
+
+            except Exception as e:
+                log.error(f"Error filtering products for {self.name}: {e}")
+                return []
+        else:
+            log.error(f"Page was not found: product html for {self.name} was not passed correctly")
+            return []
+
+    def filter_product_details(self, html: str | None) -> dict | None:
+        if html is not None:
+            soup = self.parse_html(html, "detail")
+            allergy_list = []
+
+            try:
+                # Extract product allergens from the ingredients and allergy information sections
+                for divtag in soup.find_all('div', {'class': 'product-info-block'}):
+                    heading = divtag.find('h3')
+                    if heading is None or heading.get_text(strip=True) not in ["Ingredients", "Allergy Information"]:
+                        continue
+
+                    allergy_list.extend(self.find_allergens(divtag.get_text(" ", strip=True)))
+
+                    allergy_list = list(dict.fromkeys(allergy_list))
+
+                # Extract product nutritional information
+                nutrition_table = soup.find('table', {'class': 'product__info-table'})
+                values = self.format_nutritional_information(nutrition_table.find('tbody'))
+                product_details = self.assign_product_values(values, allergy_list)
+
+                if product_details is None:
+                    product_details = self.assign_default_values(allergy_list)
+
+                return product_details if product_details else None
+
+            except Exception as e:
+                log.error(f"Error filtering product details for {self.name}: {e}")
+                return None
+        else:
+            log.error(f"Page was not found: product information html for {self.name} was not passed correctly")
+            return None
+
+    def format_nutritional_information(self, nutrition_text: bs4.element.Tag) -> list:
+        # Method to format the nutrition table, where Tesco lists energy as "1046kJ / 247kcal" or over two rows, then
+        # one row per nutrient
+        nutrient_labels = ["fat", "saturates", "carbohydrate", "sugars", "fibre", "protein", "salt"]
+        energy = {}
+        nutrients = {}
 
-    def return_stock_names(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        stock_names = []
         try:
-            for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
-                for stock_name in litag.find('span', {'class': 'ddsweb-link__text'}):
-                    stock_names.append(stock_name)
-        except TypeError as e:
-            log.error(f"Filter type exception: {e}")
-        except Exception as e:
-            log.error(f"Filter exception: {e}")
-        return stock_names
+            for row in nutrition_text.find_all('tr'):
+                cells = row.find_all(['th', 'td'])
+                if len(cells) < 2:
+                    continue
 
-    def return_stock_prices(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        stock_prices = []
-        try:
-            for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
-                for stock_price in litag.find('p', {'class': 'beans-price__text'}):
-                    chr_to_remove = "£"
-                    stock_price = stock_price.replace(chr_to_remove, "")
-                    stock_prices.append(stock_price)
-        except TypeError as e:
-            log.error(f"Filter type exception: {e}")
-        except Exception as e:
-            log.error(f"Filter exception: {e}")
-        return stock_prices
+                label = cells[0].get_text(strip=True).lower()
+                value = cells[1].get_text(strip=True)
 
-    def return_stock_images(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        stock_images = []
-        try:
-            for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
-                for stock_image in litag.find_all('img'):
-                    stock_images.append(stock_image.get('src'))
-        except TypeError as e:
-            log.error(f"Filter type exception: {e}")
-        except Exception as e:
-            log.error(f"Filter exception: {e}")
-        return stock_images
+                for number, unit in self.get_pattern(r"(\d+(?:\.\d+)?)\s*(kj|kcal)").findall(value.lower()):
+                    energy.setdefault(unit, number)
 
-    def return_stock_part_urls(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        stock_part_urls = []
-        try:
-            for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
-                for stock_part_url in litag.find_all('a', href=True):
-                    if "/groceries" in stock_part_url.get('href'):
-                        stock_part_urls.append(stock_part_url.get('href'))
-        except TypeError as e:
-            log.error(f"Filter type exception: {e}")
-        except Exception as e:
-            log.error(f"Filter exception: {e}")
-        return stock_part_urls
+                for nutrient_label in nutrient_labels:
+                    if nutrient_label in label and nutrient_label not in nutrients:
+                        number = self.get_pattern(r"\d+(?:\.\d+)?").search(value)
+                        nutrients[nutrient_label] = number.group() if number else '0'
+                        break
 
-    def filter_stock(self, html):
-        stock_details = []
-        soup = BeautifulSoup(html, "html.parser")
+            formatted_values = [energy.get('kj', '0'), energy.get('kcal', '0')]
+            formatted_values.extend(nutrients.get(nutrient_label, '0') for nutrient_label in nutrient_labels)
+            return formatted_values
 
-        try:
-            for litag in soup.find_all('li', {'class': 'product-list--list-item'}):
-                stock = {}
-                for stock_name in litag.find('span', {'class': 'ddsweb-link__text'}):
-                    stock["name"] = stock_name
-                for stock_price in litag.find('p', {'class': 'beans-price__text'}):
-                    chr_to_remove = "£"
-                    stock_price = stock_price.replace(chr_to_remove, "")
-                    stock["price"] = stock_price
-                for stock_image in litag.find_all('img'):
-                    stock["image"] = stock_image.get('src')
-                for stock_part_url in litag.find_all('a', href=True):
-                    if "/groceries" in stock_part_url.get('href'):
-                        stock["part_url"] = stock_part_url.get('href')
-                stock_details.append(stock)
-        except TypeError as e:
-            log.error(f"Filter type exception: {e}")
         except Exception as e:
-            log.error(f"Filter exception: {e}")
-        return stock_details
-
-
-"""
-tesco = Tesco()
-scraper = Scraper(tesco)
-
-html = scraper.get_html(tesco.url)
-stock_details = tesco.filter(html)
-print(stock_details)
-"""
\ No newline at end of file
+            log.error(f"Error trying to format nutritional information for {self.name}: {e}")
+            return ['0', '0', '0', '0', '0', '0', '0', '0', '0']
+
+    def format_part_url(self, href: str) -> str:
+        # Method to make a link relative to the groceries base URL, which both absolute and rooted links can be
+        return href.replace("https://www.tesco.com", "").replace("/groceries/", "", 1)
+
+    def get_parse_regions(self, page_type: str) -> list:
+        # Tesco's filter methods only read the department links, the product tiles and the product information
+        if page_type == "category":
+            return [('a', 'menu__link--superdepartment')]
+        elif page_type == "listing":
+            return [('li', 'product-list--list-item')]
+        return [('div', 'product-info-block'), ('table', 'product__info-table')]
+
+    def get_fetch_strategy(self, page_type: str) -> str:
+        # Tesco pages are tried over plain HTTP first, falling back to the browser when their markers are missing
+        return "http"
+
+    def get_html_markers(self, page_type: str) -> list:
+        # Tesco pages are only usable once they contain the elements their filter methods read
+        if page_type == "category":
+            return ['menu__link--superdepartment']
+        elif page_type == "listing":
+            return ['product-list--list-item']
+        return ['product__info-table']
+
+    def get_readiness_condition(self, page_type: str) -> ReadinessCondition:
+        # Each Tesco page type renders a known element once its content has loaded
+        if page_type == "category":
+            return SelectorReady(By.CLASS_NAME, "menu__link--superdepartment")
+        elif page_type == "listing":
+            return SelectorReady(By.CLASS_NAME, "product-list--list-item")
+        return SelectorReady(By.CLASS_NAME, "product__info-table")
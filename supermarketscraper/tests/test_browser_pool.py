@@ -0,0 +1,77 @@
+from unittest import TestCase
+from unittest.mock import Mock, PropertyMock
+
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+from browser_pool import BrowserPool
+
+
+class TestBrowserPool(TestCase):
+    def setUp(self):
+        self.drivers = []
+        self.pool = BrowserPool(driver_factory=self.create_driver, size=2, max_pages=3)
+
+    def create_driver(self):
+        # Create a mock driver that looks like a healthy Chrome session
+        driver = Mock()
+        driver.service.process.pid = None
+        self.drivers.append(driver)
+        return driver
+
+    # Test case for checking that drivers are reused between pages
+    def test_driver_reused(self):
+        for _ in range(2):
+            with self.pool.driver() as driver:
+                driver.get("https://example.com")
+
+        statistics = self.pool.get_statistics()
+        self.assertEqual(1, statistics["launches"], msg="Only one browser should have been launched")
+        self.assertEqual(1, statistics["hits"], msg="The second page should have reused the idle browser")
+
+    # Test case for checking that drivers are recycled after serving the maximum number of pages
+    def test_driver_recycled_after_max_pages(self):
+        for _ in range(4):
+            with self.pool.driver() as driver:
+                driver.get("https://example.com")
+
+        statistics = self.pool.get_statistics()
+        self.assertEqual(2, statistics["launches"], msg="A new browser should be launched after recycling")
+        self.assertEqual(1, statistics["recycled"], msg="The first browser should have been recycled")
+        self.drivers[0].quit.assert_called_once()
+
+    # Test case for checking that crashed drivers are discarded
+    def test_crashed_driver_discarded(self):
+        with self.assertRaises(WebDriverException):
+            with self.pool.driver() as driver:
+                type(driver).current_url = PropertyMock(side_effect=WebDriverException("crashed"))
+                raise WebDriverException("crashed")
+
+        with self.pool.driver():
+            pass
+
+        statistics = self.pool.get_statistics()
+        self.assertEqual(1, statistics["crashed"], msg="The crashed browser should have been counted")
+        self.assertEqual(2, statistics["launches"], msg="A replacement browser should have been launched")
+
+    # Test case for checking that a timeout on a healthy driver does not discard it
+    def test_timeout_keeps_healthy_driver(self):
+        with self.assertRaises(TimeoutException):
+            with self.pool.driver():
+                raise TimeoutException("element not found")
+
+        with self.pool.driver():
+            pass
+
+        statistics = self.pool.get_statistics()
+        self.assertEqual(0, statistics["crashed"], msg="A timeout should not count as a crash")
+        self.assertEqual(1, statistics["launches"], msg="The healthy browser should have been reused")
+
+    # Test case for checking that closing the pool quits the idle drivers
+    def test_close(self):
+        with self.pool.driver():
+            pass
+
+        self.pool.close()
+
+        self.drivers[0].quit.assert_called_once()
+        self.assertTrue(self.pool.idle_drivers.empty(), msg="No drivers should be left idle after closing")
@@ -0,0 +1,48 @@
+import tempfile
+from unittest import TestCase
+
+from cache import HtmlCache
+
+
+class TestHtmlCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = HtmlCache(directory=self.directory.name, ttl=60)
+        self.html = "<html><body><div class='product-tile'>Bread</div></body></html>"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Test case for checking that stored HTML is returned for its URL
+    def test_put_and_get(self):
+        self.cache.put("https://groceries.aldi.co.uk/en-GB/bakery?", self.html, 200, "listing")
+
+        self.assertEqual(self.html, self.cache.get("https://groceries.aldi.co.uk/en-GB/bakery?"))
+        self.assertIsNone(self.cache.get("https://groceries.aldi.co.uk/en-GB/frozen?"),
+                          msg="A URL that wasn't cached should not be found")
+
+    # Test case for checking that the URL's metadata is recorded
+    def test_entry_metadata(self):
+        self.cache.put("https://groceries.aldi.co.uk/en-GB/bakery?", self.html, 200, "listing")
+
+        entry = self.cache.get_entry("https://groceries.aldi.co.uk/en-GB/bakery?")
+        self.assertEqual("https://groceries.aldi.co.uk/en-GB/bakery?", entry["url"])
+        self.assertEqual(200, entry["status"])
+        self.assertEqual("listing", entry["page_type"])
+
+    # Test case for checking that expired pages are only returned when the TTL is ignored
+    def test_ttl(self):
+        cache = HtmlCache(directory=self.directory.name, ttl=-1)
+        cache.put("https://www.iceland.co.uk/bakery", self.html, None, "listing")
+
+        self.assertIsNone(cache.get("https://www.iceland.co.uk/bakery"), msg="Expired HTML should not be returned")
+        self.assertEqual(self.html, cache.get("https://www.iceland.co.uk/bakery", ignore_ttl=True),
+                         msg="Expired HTML should be returned when replaying")
+
+    # Test case for checking that identical pages share one compressed object
+    def test_content_addressed(self):
+        self.cache.put("https://www.iceland.co.uk/bakery", self.html, 200, "listing")
+        self.cache.put("https://www.iceland.co.uk/bakery?start=0", self.html, 200, "listing")
+
+        objects = list(self.cache.objects_directory.glob("*/*.gz"))
+        self.assertEqual(1, len(objects), msg="Identical HTML should only be stored once")
@@ -1,6 +1,13 @@
+import tempfile
+from datetime import datetime
 from unittest import TestCase
+from unittest.mock import patch
+
+import sqlalchemy
 
 from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
 from database import Database
 
 
@@ -155,4 +162,380 @@ class TestDatabase(TestCase):
             supermarket_product_id=1).all()
 
         # Assert that the correct number of allergens were added to the database
-        self.assertEqual(len(test_allergens_data), len(added_allergens))
\ No newline at end of file
+        self.assertEqual(len(test_allergens_data), len(added_allergens))
+
+    def test_migrate_adds_missing_columns(self):
+        # Create a database with the original products and details tables
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        url = f"sqlite:///{directory.name}/old.db"
+        engine = sqlalchemy.create_engine(url)
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(
+                "CREATE TABLE supermarket_products (id INTEGER PRIMARY KEY, supermarket_category_id INTEGER, "
+                "product_name VARCHAR, product_price FLOAT, product_image VARCHAR, product_part_url VARCHAR, "
+                "created DATETIME, last_updated DATETIME, is_available BOOLEAN)"))
+            connection.execute(sqlalchemy.text(
+                "CREATE TABLE supermarket_product_details (id INTEGER PRIMARY KEY, supermarket_product_id INTEGER, "
+                "energy_kj FLOAT, energy_kcal FLOAT, fat FLOAT, of_which_saturates FLOAT, carbohydrates FLOAT, "
+                "of_which_sugars FLOAT, fibre FLOAT, protein FLOAT, salt FLOAT)"))
+        engine.dispose()
+
+        # Loading the database should add the columns the scraper now relies on
+        database = Database(url)
+        inspector = sqlalchemy.inspect(database.engine)
+        product_columns = [column["name"] for column in inspector.get_columns("supermarket_products")]
+        detail_columns = [column["name"] for column in inspector.get_columns("supermarket_product_details")]
+        self.assertIn("tile_hash", product_columns, msg="Products should have a tile hash column")
+        self.assertIn("last_updated", detail_columns, msg="Details should record when they were fetched")
+        database.engine.dispose()
+
+    def test_add_product_details_replaces_previous_details(self):
+        database = Database("sqlite://")
+        details = {'energy_kj': 1500.0, 'energy_kcal': 350.0, 'fat': 10.5, 'of_which_saturates': 3.2,
+                   'carbohydrates': 50.0, 'of_which_sugars': 5.0, 'fibre': 3.0, 'protein': 15.0, 'salt': 1.2}
+
+        # Add details for the same product twice, as happens when its details are refreshed
+        database.add_product_information({"supermarket_product_id": 1, "supermarket_product_details": details,
+                                          "tile_hash": "old"})
+        database.add_product_information({"supermarket_product_id": 1,
+                                          "supermarket_product_details": dict(details, fat=11.0),
+                                          "tile_hash": "new"})
+
+        # Only the latest details should remain and their state should be reported
+        details_table = database.get_table_object("supermarket_product_details")
+        rows = database.session.query(details_table).filter_by(supermarket_product_id=1).all()
+        self.assertEqual(1, len(rows), msg="Refreshed details should replace the previous details")
+        self.assertEqual(11.0, rows[0].fat)
+
+        detail_states = database.get_product_detail_states([1, 2])
+        self.assertEqual({1}, set(detail_states), msg="Only products with details should have a state")
+        self.assertEqual("new", detail_states[1]["tile_hash"])
+        self.assertIsNotNone(detail_states[1]["last_updated"])
+
+    def test_get_table_object_uses_registry(self):
+        database = Database("sqlite://")
+
+        # Looking tables up should not read the schema from the database again
+        with patch.object(sqlalchemy.MetaData, "reflect") as mock_reflect:
+            for _ in range(10):
+                table = database.get_table_object("supermarket_products")
+        mock_reflect.assert_not_called()
+        self.assertEqual("supermarket_products", table.name)
+
+        # Refreshing the registry should pick up tables created after the database was loaded
+        with database.engine.begin() as connection:
+            connection.execute(sqlalchemy.text("CREATE TABLE new_table (id INTEGER PRIMARY KEY)"))
+        self.assertIsNone(database.get_table_object("new_table"))
+        database.refresh_tables()
+        self.assertIsNotNone(database.get_table_object("new_table"), msg="Refreshing should reflect new tables")
+
+    def test_add_supermarket_products_in_batches(self):
+        database = Database("sqlite://", batch_size=2)
+        test_products_data = [
+            {'name': f'Product {number}', 'price': 1.0 + number, 'image': f'{number}.jpg', 'part_url': f'/p/{number}'}
+            for number in range(5)
+        ]
+
+        # Count the statements run while adding a page of products, one to look up the supermarket then the batches
+        with patch.object(database.session, "execute", wraps=database.session.execute) as mock_execute:
+            database.add_supermarket_category_products(
+                {"supermarket_category_id": 1, "supermarket_category_products": test_products_data})
+        self.assertEqual(4, mock_execute.call_count,
+                         msg="Five products in batches of two should take one lookup and three upserts")
+
+        # Check every product was inserted with its listing tile hash
+        products_table = database.get_table_object("supermarket_products")
+        added_products = database.session.query(products_table).order_by(products_table.c.id).all()
+        self.assertEqual([product['name'] for product in test_products_data],
+                         [product.product_name for product in added_products])
+        self.assertEqual(database.get_tile_hash(test_products_data[0]), added_products[0].tile_hash)
+
+    def test_add_supermarket_products_upserts(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi()])
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': 'bakery', 'part_url': '/en-GB/bakery?'}]})
+        test_products_data = [
+            {'name': 'Organic Bread', 'price': 2.99, 'image': 'bread.jpg', 'part_url': '/en-GB/organic-bread'},
+            {'name': 'Vegan Burger', 'price': 4.49, 'image': 'burger.jpg', 'part_url': '/en-GB/vegan-burger'}
+        ]
+
+        # Add the same products in two cycles, with one product's price changing between them
+        first_statistics = database.add_supermarket_category_products(
+            {"supermarket_category_id": 1, "supermarket_category_products": test_products_data})
+        test_products_data[0] = dict(test_products_data[0], price=2.49)
+        second_statistics = database.add_supermarket_category_products(
+            {"supermarket_category_id": 1, "supermarket_category_products": test_products_data})
+
+        self.assertEqual({"New": 2, "Updated": 0, "Deleted": 0}, first_statistics)
+        self.assertEqual({"New": 0, "Updated": 1, "Deleted": 0}, second_statistics)
+
+        # Check each product has a single row holding its latest price
+        products_table = database.get_table_object("supermarket_products")
+        added_products = database.session.query(products_table).order_by(products_table.c.id).all()
+        self.assertEqual(2, len(added_products), msg="Products should not be duplicated across cycles")
+        self.assertEqual(2.49, added_products[0].product_price, msg="The product's price should be updated")
+        self.assertEqual(1, added_products[0].supermarket_id)
+
+    def test_mark_unavailable_products(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi()])
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': 'bakery', 'part_url': '/en-GB/bakery?'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'Organic Bread', 'price': 2.99, 'image': 'bread.jpg', 'part_url': '/en-GB/organic-bread'}]})
+
+        # A product not listed since the cycle started should be marked as unavailable
+        cycle_start = datetime.now()
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'Vegan Burger', 'price': 4.49, 'image': 'burger.jpg', 'part_url': '/en-GB/vegan-burger'}]})
+        deleted = database.mark_unavailable_products(1, cycle_start)
+
+        products_table = database.get_table_object("supermarket_products")
+        availability = dict(database.session.query(products_table.c.product_name, products_table.c.is_available))
+        self.assertEqual(1, deleted)
+        self.assertEqual({'Organic Bread': False, 'Vegan Burger': True}, availability)
+
+    def test_migrate_merges_duplicate_products(self):
+        # Create a database where an older version inserted the same product in two cycles
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        url = f"sqlite:///{directory.name}/old.db"
+        engine = sqlalchemy.create_engine(url)
+        with engine.begin() as connection:
+            for statement in [
+                "CREATE TABLE supermarket_categories (id INTEGER PRIMARY KEY, supermarket_id INTEGER, "
+                "supermarket_category_name VARCHAR, supermarket_category_part_url VARCHAR)",
+                "CREATE TABLE supermarket_products (id INTEGER PRIMARY KEY, supermarket_category_id INTEGER, "
+                "product_name VARCHAR, product_price FLOAT, product_image VARCHAR, product_part_url VARCHAR, "
+                "created DATETIME, last_updated DATETIME, is_available BOOLEAN)",
+                "CREATE TABLE supermarket_product_allergens (id INTEGER PRIMARY KEY, supermarket_product_id INTEGER, "
+                "allergen VARCHAR)",
+                "INSERT INTO supermarket_categories VALUES (1, 1, 'bakery', '/en-GB/bakery?')",
+                "INSERT INTO supermarket_products (id, supermarket_category_id, product_name, product_part_url) "
+                "VALUES (1, 1, 'Bread', '/p/bread'), (2, 1, 'Bread', '/p/bread'), (3, 1, 'Rolls', '/p/rolls')",
+                "INSERT INTO supermarket_product_allergens VALUES (1, 2, 'wheat')",
+            ]:
+                connection.execute(sqlalchemy.text(statement))
+        engine.dispose()
+
+        database = Database(url)
+
+        # The duplicate should be merged into the first row, keeping what referenced it
+        products_table = database.get_table_object("supermarket_products")
+        allergens_table = database.get_table_object("supermarket_product_allergens")
+        self.assertEqual([1, 3], [row.id for row in database.session.query(products_table.c.id)])
+        self.assertEqual(1, database.session.query(allergens_table).one().supermarket_product_id)
+        inspector = sqlalchemy.inspect(database.engine)
+        index_names = [index["name"] for index in inspector.get_indexes("supermarket_products")]
+        self.assertIn("ix_products_category", index_names, msg="Lookup indexes should be added to existing tables")
+        self.assertEqual([3], database.search_products("rolls"),
+                         msg="Existing products should be added to the search index")
+        database.engine.dispose()
+
+    def test_migrate_seeds_price_history_with_existing_search_index(self):
+        # Create a database from before price history, whose search index was already made by the web app
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        url = f"sqlite:///{directory.name}/old.db"
+        engine = sqlalchemy.create_engine(url)
+        with engine.begin() as connection:
+            for statement in [
+                "CREATE TABLE supermarket_products (id INTEGER PRIMARY KEY, supermarket_category_id INTEGER, "
+                "product_name VARCHAR, product_price FLOAT, product_image VARCHAR, product_part_url VARCHAR, "
+                "created DATETIME, last_updated DATETIME, is_available BOOLEAN)",
+                "INSERT INTO supermarket_products (id, supermarket_category_id, product_name, product_price, "
+                "product_part_url, last_updated) VALUES (1, 1, 'Bread', 1.25, '/p/bread', '2024-01-01 00:00:00')",
+                Database.search_index_statements[0],
+            ]:
+                connection.execute(sqlalchemy.text(statement))
+        engine.dispose()
+
+        database = Database(url)
+
+        # The starting price history should still be taken from the current prices
+        prices_table = database.get_table_object("supermarket_product_prices")
+        self.assertEqual([(1, 125)], [(row.supermarket_product_id, row.price_pence)
+                                      for row in database.session.query(prices_table)])
+        database.engine.dispose()
+
+    def test_price_history_records_changes(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi()])
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': 'bakery', 'part_url': '/en-GB/bakery?'}]})
+        cycle_start = datetime.now()
+
+        # Add the same product over three cycles, where its price only changes in the last one
+        for price in [2.99, 2.99, 2.49]:
+            database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+                {'name': 'Organic Bread', 'price': price, 'image': 'bread.jpg', 'part_url': '/en-GB/organic-bread'}]})
+
+        price_history = database.get_price_history(1, cycle_start)
+        self.assertEqual([299, 249], [price.price_pence for price in price_history],
+                         msg="A price should only be recorded when it is first seen or changes")
+
+        # Check the history for one product is read with a range scan of the product and time index
+        plan = database.session.execute(sqlalchemy.text(
+            "EXPLAIN QUERY PLAN SELECT observed_at, price_pence FROM supermarket_product_prices "
+            "WHERE supermarket_product_id = 1 AND observed_at >= '2024-01-01' ORDER BY observed_at"
+        )).all()
+        self.assertIn("ix_supermarket_product_prices_product_observed", " ".join(row[-1] for row in plan))
+
+    def test_add_product_details_batch(self):
+        database = Database("sqlite://")
+        details = {'energy_kj': 1500.0, 'energy_kcal': 350.0, 'fat': 10.5, 'of_which_saturates': 3.2,
+                   'carbohydrates': 50.0, 'of_which_sugars': 5.0, 'fibre': 3.0, 'protein': 15.0, 'salt': 1.2}
+        database.add_product_allergy_information({"supermarket_product_id": 1,
+                                                  "supermarket_product_details": {"allergens": ["Gluten"]}})
+
+        # Write several products' details in one call, including one that is missing a nutrient
+        written = database.add_product_details_batch([
+            {"supermarket_product_id": 1, "supermarket_product_details": dict(details, allergens=["Milk", "Egg"]),
+             "tile_hash": "one"},
+            {"supermarket_product_id": 2, "supermarket_product_details": details, "tile_hash": "two"},
+            {"supermarket_product_id": 3, "supermarket_product_details": {"allergens": ["Milk"]}, "tile_hash": "three"}
+        ])
+
+        self.assertEqual(2, written, msg="The product with missing nutrients should be skipped")
+        details_table = database.get_table_object("supermarket_product_details")
+        allergens_table = database.get_table_object("supermarket_product_allergens")
+        self.assertEqual([1, 2], [row.supermarket_product_id for row in database.session.query(details_table)])
+        allergens = database.session.query(allergens_table.c.supermarket_product_id, allergens_table.c.allergen)
+        self.assertEqual({(1, "Milk"), (1, "Egg")}, set(allergens),
+                         msg="Previous allergens should be replaced and skipped products not written")
+
+    def test_sqlite_profiles(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        # Check the concurrent profile's settings are applied to the connections the database uses
+        database = Database(f"sqlite:///{directory.name}/concurrent.db", profile="concurrent")
+        self.assertEqual("wal", database.session.execute(sqlalchemy.text("PRAGMA journal_mode")).scalar())
+        self.assertEqual(1, database.session.execute(sqlalchemy.text("PRAGMA synchronous")).scalar(),
+                         msg="synchronous should be NORMAL")
+        self.assertEqual(5000, database.session.execute(sqlalchemy.text("PRAGMA busy_timeout")).scalar())
+        database.engine.dispose()
+
+        database = Database(f"sqlite:///{directory.name}/default.db", profile="default")
+        self.assertEqual("delete", database.session.execute(sqlalchemy.text("PRAGMA journal_mode")).scalar())
+        database.engine.dispose()
+
+    def test_hot_queries_use_indexes(self):
+        database = Database("sqlite://")
+        categories_table = database.get_table_object("supermarket_categories")
+        products_table = database.get_table_object("supermarket_products")
+        details_table = database.get_table_object("supermarket_product_details")
+        allergens_table = database.get_table_object("supermarket_product_allergens")
+
+        # The queries the scraper and web app run most often, with the index each should be answered from
+        hot_queries = [
+            (database.session.query(categories_table).filter_by(supermarket_category_name="bakery"),
+             "ix_categories_name"),
+            (database.session.query(categories_table).filter_by(supermarket_id=1), "ix_categories_supermarket"),
+            (database.session.query(products_table).filter_by(supermarket_category_id=1).filter(
+                products_table.c.is_available.isnot(False)), "ix_products_category"),
+            (database.session.query(products_table).filter_by(product_name="Organic Bread"), "ix_products_name"),
+            (database.session.query(details_table.c.last_updated).filter(
+                details_table.c.supermarket_product_id.in_([1, 2])), "ix_details_product"),
+            (database.session.query(allergens_table.c.id).filter(
+                allergens_table.c.supermarket_product_id == 1, allergens_table.c.allergen.in_(["Milk", "Egg"])),
+             "ix_allergens_product_allergen"),
+        ]
+
+        for query, index_name in hot_queries:
+            sql = str(query.statement.compile(database.engine, compile_kwargs={"literal_binds": True}))
+            plan = database.session.execute(sqlalchemy.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+            self.assertIn(index_name, " ".join(row[-1] for row in plan), msg=f"Query should use an index: {sql}")
+
+    def test_search_products(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi()])
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': 'bakery', 'part_url': '/en-GB/bakery?'}]})
+        test_products_data = [
+            {'name': 'Warburtons Toastie White Bread 800G', 'price': 1.45, 'image': '1.jpg', 'part_url': '/p/1'},
+            {'name': 'Breaded Chicken Goujons', 'price': 2.99, 'image': '2.jpg', 'part_url': '/p/2'},
+            {'name': 'Semi Skimmed Milk', 'price': 1.25, 'image': '3.jpg', 'part_url': '/p/3'},
+        ]
+        database.add_supermarket_category_products(
+            {"supermarket_category_id": 1, "supermarket_category_products": test_products_data})
+
+        # Each word should match as a prefix, and every word has to match
+        self.assertEqual({1, 2}, set(database.search_products("bread")))
+        self.assertEqual([1], database.search_products("white brea"))
+        self.assertEqual([], database.search_products("  "))
+
+        # Renaming a product should be reflected in the index by the triggers
+        test_products_data[2] = dict(test_products_data[2], name='Whole Milk')
+        database.add_supermarket_category_products(
+            {"supermarket_category_id": 1, "supermarket_category_products": test_products_data})
+        self.assertEqual([3], database.search_products("whole"))
+        self.assertEqual([], database.search_products("skimmed"))
+
+    def test_bump_catalogue_generation(self):
+        database = Database("sqlite://")
+        self.assertEqual(0, database.get_catalogue_generation())
+        self.assertEqual(1, database.bump_catalogue_generation())
+        self.assertEqual(2, database.bump_catalogue_generation())
+        self.assertEqual(2, database.get_catalogue_generation())
+
+    def test_build_product_groups(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi(), Morrisons()])
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": [
+            {'name': 'bakery', 'part_url': '/en-GB/bakery?'}]})
+        database.add_supermarket_category({"supermarket_id": 2, "supermarket_categories": [
+            {'name': 'Bakery & Cakes', 'part_url': '/bakery-cakes'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'White Bread', 'price': 0.75, 'image': 'aldi.jpg', 'part_url': '/p/white-bread'},
+            {'name': 'Semi Skimmed Milk', 'price': 1.25, 'image': 'milk.jpg', 'part_url': '/p/milk'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 2, "supermarket_category_products": [
+            {'name': 'white bread ', 'price': 0.65, 'image': 'morrisons.jpg', 'part_url': '/p/white-bread'}]})
+
+        self.assertEqual(2, database.build_product_groups())
+        self.assertEqual(2, database.build_product_groups(), msg="Rebuilding should replace the previous groups")
+
+        # Both supermarkets' white bread should share a group whose cheapest member is Morrisons'
+        groups_table = database.get_table_object("product_groups")
+        members_table = database.get_table_object("product_group_members")
+        bread_group = database.session.query(groups_table).filter_by(group_key="white bread").one()
+        self.assertEqual((2, 3, 0.65), (bread_group.member_count, bread_group.cheapest_product_id,
+                                        bread_group.cheapest_price))
+        members = database.session.query(members_table.c.supermarket_product_id).filter_by(
+            product_group_id=bread_group.id).all()
+        self.assertEqual({1, 3}, {member.supermarket_product_id for member in members})
+
+    def test_build_product_groups_one_product_per_supermarket(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi(), Morrisons(), Iceland()])
+        for supermarket_id, part_url in [(1, '/en-GB/bakery?'), (2, '/bakery-cakes'), (3, '/bakery')]:
+            database.add_supermarket_category({"supermarket_id": supermarket_id, "supermarket_categories": [
+                {'name': f'bakery {supermarket_id}', 'part_url': part_url}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'Warburtons Toastie White Bread 800g', 'price': 1.35, 'image': 'a.jpg',
+             'part_url': '/p/toastie'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 2, "supermarket_category_products": [
+            {'name': 'Warburtons Toastie Sliced White Bread 800g', 'price': 1.40, 'image': 'm.jpg',
+             'part_url': '/p/toastie'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 3, "supermarket_category_products": [
+            {'name': 'Warburtons Thick White Bread 800g', 'price': 1.30, 'image': 'i.jpg', 'part_url': '/p/thick'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'Warburtons Thick Sliced White Bread 800g', 'price': 1.25, 'image': 'a.jpg',
+             'part_url': '/p/thick'}]})
+
+        # Each loaf matches its copy at another supermarket, and a weaker match chains the two loaves together
+        database.replace_product_matches([
+            {"product_id": 2, "matched_product_id": 3, "confidence": 0.77},
+            {"product_id": 1, "matched_product_id": 2, "confidence": 1.0},
+            {"product_id": 3, "matched_product_id": 4, "confidence": 1.0},
+        ])
+
+        self.assertEqual(2, database.build_product_groups(),
+                         msg="The weaker match would put both of Aldi's loaves in one group, so it should be skipped")
+        members_table = database.get_table_object("product_group_members")
+        groups = {}
+        for member in database.session.query(members_table):
+            groups.setdefault(member.product_group_id, set()).add(member.supermarket_product_id)
+        self.assertEqual([{1, 2}, {3, 4}], sorted(groups.values(), key=min))
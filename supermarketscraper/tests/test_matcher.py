@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+from aldi import Aldi
+from database import Database
+from iceland import Iceland
+from matcher import ProductMatcher, match_products
+from morrisons import Morrisons
+
+
+class TestProductMatcher(TestCase):
+    def setUp(self):
+        self.matcher = ProductMatcher()
+
+    # Test case for checking that names are reduced to lowercase words and numbers
+    def test_normalise_name(self):
+        self.assertEqual("cravendale semi skimmed milk 1.5l",
+                         self.matcher.normalise_name("Cravendale Semi-Skimmed Milk, 1.5L."))
+        self.assertEqual("fish and chips", self.matcher.normalise_name("Fish & Chips"))
+
+    # Test case for checking that pack sizes are converted to a common unit
+    def test_extract_pack_size(self):
+        for name, pack_size in [("warburtons toastie 800g", ("g", 800.0)),
+                                ("cravendale milk 2 litre", ("ml", 2000.0)),
+                                ("coca cola 1.5l", ("ml", 1500.0)),
+                                ("heinz baked beans 4 x 415g", ("g", 1660.0)),
+                                ("walkers crisps 6 pack", ("each", 6.0)),
+                                ("bananas", None)]:
+            self.assertEqual(pack_size, self.matcher.extract_pack_size(name), msg=f"Pack size of {name!r}")
+
+    # Test case for checking that the same item is matched across supermarkets despite different names
+    def test_match_across_supermarkets(self):
+        products = [
+            {"id": 1, "name": "Warburtons Toastie 800g", "supermarket_id": 1},
+            {"id": 2, "name": "Warburtons Toastie White Bread 800G", "supermarket_id": 2},
+            {"id": 3, "name": "Cravendale Semi Skimmed Milk 2L", "supermarket_id": 1},
+            {"id": 4, "name": "Cravendale Semi-Skimmed Filtered Milk 2 Litre", "supermarket_id": 3},
+            {"id": 5, "name": "Cravendale Whole Milk 2L", "supermarket_id": 2},
+        ]
+        matches = {(match["product_id"], match["matched_product_id"]): match["confidence"]
+                   for match in self.matcher.match(products)}
+
+        self.assertGreater(matches.get((1, 2), 0), 0.7, msg="Both Warburtons Toasties should be a confident match")
+        self.assertGreater(matches.get((3, 4), 0), 0.7, msg="Both semi skimmed milks should be a confident match")
+        self.assertLess(matches.get((3, 5), 0), 0.7, msg="Semi skimmed and whole milk should not be confident")
+
+    # Test case for checking that products of different pack sizes or from the same supermarket aren't matched
+    def test_no_match_different_size_or_supermarket(self):
+        products = [
+            {"id": 1, "name": "Warburtons Toastie 800g", "supermarket_id": 1},
+            {"id": 2, "name": "Warburtons Toastie 400g", "supermarket_id": 2},
+            {"id": 3, "name": "Warburtons Toastie 800g", "supermarket_id": 1},
+        ]
+        self.assertEqual([], self.matcher.match(products))
+
+    # Test case for checking that each product keeps only its best match from each other supermarket
+    def test_best_match_per_supermarket(self):
+        products = [
+            {"id": 1, "name": "Heinz Baked Beans 415g", "supermarket_id": 1},
+            {"id": 2, "name": "Heinz Baked Beans 415g", "supermarket_id": 2},
+            {"id": 3, "name": "Heinz Baked Beans Reduced Sugar 415g", "supermarket_id": 2},
+        ]
+        matches = self.matcher.match(products)
+
+        self.assertEqual([(1, 2)], [(match["product_id"], match["matched_product_id"]) for match in matches])
+        self.assertEqual(1.0, matches[0]["confidence"])
+
+
+class TestMatchProducts(TestCase):
+    # Test case for checking that matched products from different supermarkets share a product group
+    def test_match_products_groups(self):
+        database = Database("sqlite://")
+        database.add_supermarket([Aldi(), Morrisons(), Iceland()])
+        for supermarket_id in [1, 2, 3]:
+            database.add_supermarket_category({"supermarket_id": supermarket_id, "supermarket_categories": [
+                {'name': f'Bakery {supermarket_id}', 'part_url': f'/bakery/{supermarket_id}'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 1, "supermarket_category_products": [
+            {'name': 'Warburtons Toastie 800g', 'price': 1.45, 'image': 'a.jpg', 'part_url': '/p/toastie'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 2, "supermarket_category_products": [
+            {'name': 'Warburtons Toastie White Bread 800G', 'price': 1.25, 'image': 'm.jpg', 'part_url': '/p/toastie'}]})
+        database.add_supermarket_category_products({"supermarket_category_id": 3, "supermarket_category_products": [
+            {'name': 'Hovis Soft White Medium Bread 800g', 'price': 1.10, 'image': 'i.jpg', 'part_url': '/p/hovis'}]})
+
+        self.assertEqual(3, database.build_product_groups(), msg="Without matches every name is its own group")
+        self.assertEqual(1, match_products(database))
+        self.assertEqual(1, database.get_catalogue_generation(), msg="Matching should bump the catalogue generation")
+
+        groups_table = database.get_table_object("product_groups")
+        toastie_group = database.session.query(groups_table).filter_by(member_count=2).one()
+        self.assertEqual((2, 1.25), (toastie_group.cheapest_product_id, toastie_group.cheapest_price))
+        self.assertEqual(2, database.session.query(groups_table).count())
@@ -0,0 +1,44 @@
+from pathlib import Path
+from unittest import TestCase
+
+from aldi import Aldi
+from parse_pool import ParsePool, filter_page
+from tesco import Tesco
+
+fixtures = Path(__file__).parent / "fixtures"
+
+
+class TestParsePool(TestCase):
+    def setUp(self):
+        self.supermarkets = [Aldi(), Tesco()]
+        self.pool = ParsePool(self.supermarkets, workers=2, max_in_flight=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    # Test case for checking that worker processes filter every page type the same as the fetching process would
+    def test_parse(self):
+        for supermarket in self.supermarkets:
+            for file_type, page_type in [("categories", "category"), ("listing", "listing"), ("detail", "detail")]:
+                html = (fixtures / f"{supermarket.name.lower()}_{file_type}.html").read_text(encoding="utf-8")
+                self.assertEqual(filter_page(supermarket, page_type, html),
+                                 self.pool.parse(supermarket, page_type, html),
+                                 msg=f"{supermarket.name} {page_type} parsed in a worker")
+
+    # Test case for checking that handing over more pages than are allowed in flight waits for a free slot
+    def test_submit_backpressure(self):
+        aldi = self.supermarkets[0]
+        html = (fixtures / "aldi_detail.html").read_text(encoding="utf-8")
+
+        futures = [self.pool.submit(aldi, "detail", html) for _ in range(6)]
+        results = [future.result() for future in futures]
+
+        self.assertEqual([filter_page(aldi, "detail", html)] * 6, results)
+        self.assertGreater(self.pool.get_statistics()["waits"], 0,
+                           msg="Six pages with two slots should have to wait for a worker")
+        self.assertEqual(6, self.pool.get_statistics()["parsed"])
+
+    # Test case for checking that a page which can't be found still gets the filter method's empty result
+    def test_parse_missing_page(self):
+        self.assertEqual([], self.pool.parse(self.supermarkets[0], "listing", None))
+        self.assertIsNone(self.pool.parse(self.supermarkets[1], "detail", None))
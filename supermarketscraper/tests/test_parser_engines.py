@@ -0,0 +1,92 @@
+import os
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from parser_engines import get_parser_engine, is_available, parse_html, preferred_engines
+from tesco import Tesco
+
+fixtures = Path(__file__).parent / "fixtures"
+
+
+class TestParserEngines(TestCase):
+    # Test case for checking that the fastest installed engine is chosen, and html.parser is always available
+    def test_get_parser_engine_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            engine = get_parser_engine()
+
+        self.assertTrue(is_available("html.parser"))
+        self.assertEqual([engine for engine in preferred_engines if is_available(engine)][0], engine)
+
+    # Test case for checking that an engine can be chosen, and one that isn't installed falls back to html.parser
+    def test_get_parser_engine_chosen(self):
+        self.assertEqual("html.parser", get_parser_engine("html.parser"))
+        with patch.dict(os.environ, {"PARSER_ENGINE": "html.parser"}):
+            self.assertEqual("html.parser", get_parser_engine())
+        self.assertEqual("html.parser", get_parser_engine("not-a-parser"))
+
+    # Test case for checking that every engine builds a tree with the same text and attributes
+    def test_parse_html(self):
+        html = "<ul><li class='submenu first'>Bread &amp; Cakes</li><li><a href='/milk'>Milk</a></ul>"
+        for engine in [engine for engine in preferred_engines if is_available(engine)]:
+            soup = parse_html(html, engine)
+            self.assertEqual(["submenu", "first"], soup.find('li')['class'], msg=f"Classes parsed by {engine}")
+            self.assertEqual("Bread & Cakes", soup.find('li').get_text(), msg=f"Text parsed by {engine}")
+            self.assertEqual("/milk", soup.find('a').get('href'), msg=f"Attributes parsed by {engine}")
+
+    # Test case for checking that every engine only builds the regions asked for, including regions inside regions
+    def test_parse_html_regions(self):
+        html = ("<html><head><script>var tile = 1;</script></head><body><nav><div class='product-tile'>A"
+                "<div class='product-tile'>B</div></div></nav><p>Offers</p><table><tbody><tr><td>1</td></tr>"
+                "</tbody></table></body></html>")
+        for engine in [engine for engine in preferred_engines if is_available(engine)]:
+            soup = parse_html(html, engine, [('div', 'product-tile'), ('tbody', None)])
+            self.assertEqual('<div class="product-tile">A<div class="product-tile">B</div></div>'
+                             '<tbody><tr><td>1</td></tr></tbody>', str(soup), msg=f"Regions parsed by {engine}")
+
+
+class TestParserEngineParity(TestCase):
+    def assert_parity(self, supermarket, page_type: str):
+        # Assert that each installed engine, building only the page type's regions, extracts exactly what html.parser
+        # does from the whole of a fixture page
+        html = (fixtures / f"{supermarket.name.lower()}_{page_type}.html").read_text(encoding="utf-8")
+        filter_method = {"categories": supermarket.filter_categories, "listing": supermarket.filter_products,
+                         "detail": supermarket.filter_product_details}[page_type]
+
+        supermarket.parser_engine = "html.parser"
+        with patch.object(supermarket, "get_parse_regions", return_value=[]):
+            expected = filter_method(html)
+        self.assertTrue(expected, msg=f"{supermarket.name} {page_type} fixture should have something to extract")
+
+        for engine in preferred_engines:
+            if not is_available(engine):
+                continue
+            supermarket.parser_engine = engine
+            self.assertEqual(expected, filter_method(html), msg=f"{supermarket.name} {page_type} with {engine}")
+
+    # Test case for checking that every engine extracts the same Aldi categories, products and details
+    def test_aldi_parity(self):
+        aldi = Aldi()
+        for page_type in ["categories", "listing", "detail"]:
+            self.assert_parity(aldi, page_type)
+
+    # Test case for checking that every engine extracts the same Morrisons categories, products and details
+    def test_morrisons_parity(self):
+        morrisons = Morrisons()
+        for page_type in ["categories", "listing", "detail"]:
+            self.assert_parity(morrisons, page_type)
+
+    # Test case for checking that every engine extracts the same Iceland categories, products and details
+    def test_iceland_parity(self):
+        iceland = Iceland()
+        for page_type in ["categories", "listing", "detail"]:
+            self.assert_parity(iceland, page_type)
+
+    # Test case for checking that every engine extracts the same Tesco categories, products and details
+    def test_tesco_parity(self):
+        tesco = Tesco()
+        for page_type in ["categories", "listing", "detail"]:
+            self.assert_parity(tesco, page_type)
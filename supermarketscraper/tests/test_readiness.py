@@ -0,0 +1,53 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from selenium.common.exceptions import TimeoutException
+
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from readiness import SelectorReady, DomStableReady, NetworkIdleReady
+
+
+class TestReadiness(TestCase):
+    # Test case for checking that the DOM-stable condition returns once the element count stops changing
+    def test_dom_stable_ready(self):
+        driver = Mock()
+        driver.execute_script.side_effect = [["loading", 10], ["complete", 50], ["complete", 80]] + \
+                                            [["complete", 80]] * 5
+        DomStableReady(stable_checks=2, poll_frequency=0).wait(driver, timeout=5)
+        self.assertEqual(5, driver.execute_script.call_count, msg="The DOM should be checked until it is stable")
+
+    # Test case for checking that the DOM-stable condition times out on a page that keeps changing
+    def test_dom_stable_timeout(self):
+        driver = Mock()
+        sizes = iter(range(100000))
+        driver.execute_script.side_effect = lambda script: ["complete", next(sizes)]
+        with self.assertRaises(TimeoutException):
+            DomStableReady(poll_frequency=0.01).wait(driver, timeout=0.1)
+
+    # Test case for checking that the network-idle condition returns once no new resources are loaded
+    def test_network_idle_ready(self):
+        driver = Mock()
+        driver.execute_script.side_effect = [["complete", 3], ["complete", 7]] + [["complete", 7]] * 50
+        NetworkIdleReady(idle_time=0, poll_frequency=0).wait(driver, timeout=5)
+        self.assertEqual(3, driver.execute_script.call_count, msg="The network should be idle once requests stop")
+
+    # Test case for checking that the network-idle condition times out on a page that never settles
+    def test_network_idle_timeout(self):
+        driver = Mock()
+        driver.execute_script.return_value = ["loading", 0]
+        with self.assertRaises(TimeoutException):
+            NetworkIdleReady(poll_frequency=0.01).wait(driver, timeout=0.1)
+
+    # Test case for checking that each supermarket declares a readiness condition for every page type
+    def test_supermarket_conditions(self):
+        for supermarket in [Aldi(), Morrisons(), Iceland()]:
+            for page_type in ["category", "listing", "detail"]:
+                condition = supermarket.get_readiness_condition(page_type)
+                self.assertTrue(hasattr(condition, "wait"),
+                                msg=f"{supermarket.name} should have a {page_type} readiness condition")
+
+        self.assertIsInstance(Aldi().get_readiness_condition("listing"), SelectorReady)
+        self.assertIsInstance(Morrisons().get_readiness_condition("detail"), DomStableReady)
+        self.assertIsInstance(Iceland().get_readiness_condition("detail"), NetworkIdleReady)
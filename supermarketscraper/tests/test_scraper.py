@@ -1,3 +1,7 @@
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
 from unittest import TestCase
 from unittest.mock import patch, Mock
 from scraper import Scraper
@@ -37,6 +41,17 @@ class TestScraper(TestCase):
         # Check if get_html method is called once
         self.assertEqual(mock_get_html.call_count, 1)
 
+    # Test case for checking that products are only regrouped at the end of a cycle when the caller doesn't do it
+    def test_finish_cycle_regroup(self):
+        mock_database = Mock()
+        Scraper([], mock_database, regroup=False).finish_cycle()
+        mock_database.build_product_groups.assert_not_called()
+        mock_database.bump_catalogue_generation.assert_not_called()
+
+        Scraper([], mock_database).finish_cycle()
+        mock_database.build_product_groups.assert_called_once_with()
+        mock_database.bump_catalogue_generation.assert_called_once_with()
+
     def test_get_html(self):
         # Test when URL is valid
         valid_url = 'https://groceries.aldi.co.uk/en-GB/bakery?'
@@ -56,3 +71,205 @@ class TestScraper(TestCase):
         html = scraper.get_html(valid_url)
         self.assertIsNotNone(html)
 
+    def test_get_html_waits_for_readiness(self):
+        # Mock a browser and a supermarket whose page is ready immediately
+        driver = Mock(page_source='<html><body><p>Test HTML</p></body></html>')
+        driver.service.process.pid = None
+        supermarket = Mock()
+        supermarket.name = "Aldi"
+        scraper = Scraper([], None)
+        scraper.browser_pool.driver_factory = Mock(return_value=driver)
+
+        html = scraper.get_html('https://groceries.aldi.co.uk', supermarket=supermarket, page_type="category")
+
+        # Check the supermarket's condition was waited on and the latency was recorded
+        self.assertEqual(driver.page_source, html)
+        supermarket.get_readiness_condition.assert_called_once_with("category")
+        supermarket.get_readiness_condition().wait.assert_called_once_with(driver, scraper.ready_timeout)
+        self.assertEqual(1, len(scraper.latencies[("Aldi", "category")]))
+
+    @patch('scraper.Scraper.get_html', return_value='<html><body><p>Test HTML</p></body></html>')
+    def test_scrape_product_details(self, mock_get_html):
+        # Mock a supermarket whose detail pages all contain nutritional information
+        supermarket = Mock(base_url="https://groceries.aldi.co.uk")
+        supermarket.filter_product_details.return_value = {"energy_kj": 1.0, "allergens": ["milk"]}
+        products = [Mock(id=product_id, product_part_url=f"/p/{product_id}", product_name=f"Product {product_id}")
+                    for product_id in range(10)]
+
+        # Record which thread each database write happens on
+        writer_threads = set()
+        mock_database = Mock()
+        mock_database.add_product_details_batch.side_effect = lambda data: writer_threads.add(threading.get_ident())
+
+        scraper = Scraper([], mock_database, pool_size=4, politeness_delay=0, detail_flush_size=4)
+        scraper.scrape_product_details(supermarket, products)
+
+        # Check every product was fetched and written in batches, and that all writes happened on the calling thread
+        self.assertEqual(10, mock_get_html.call_count)
+        written = [detail for call in mock_database.add_product_details_batch.call_args_list for detail in call.args[0]]
+        self.assertEqual(list(range(10)), sorted(detail["supermarket_product_id"] for detail in written))
+        self.assertEqual(3, mock_database.add_product_details_batch.call_count,
+                         msg="Ten products in batches of four should take three writes")
+        self.assertEqual({threading.get_ident()}, writer_threads)
+
+    # Test case for checking that detail pages handed to the parse pool are filtered in workers and still written
+    def test_scrape_product_details_parse_pool(self):
+        aldi = Aldi()
+        html = (Path(__file__).parent / "fixtures" / "aldi_detail.html").read_text(encoding="utf-8")
+        products = [Mock(id=product_id, product_part_url=f"/p/{product_id}", product_name=f"Product {product_id}")
+                    for product_id in range(6)]
+        mock_database = Mock()
+
+        scraper = Scraper([aldi], mock_database, politeness_delay=0, parse_workers=2, parse_queue_size=2)
+        try:
+            with patch.object(scraper, "fetch", return_value=html):
+                scraper.scrape_product_details(aldi, products)
+        finally:
+            scraper.parse_pool.close()
+
+        # Check every product's details were parsed in the pool and match parsing them on this thread
+        written = [detail for call in mock_database.add_product_details_batch.call_args_list for detail in call.args[0]]
+        self.assertEqual(list(range(6)), sorted(detail["supermarket_product_id"] for detail in written))
+        for detail in written:
+            self.assertEqual(aldi.filter_product_details(html), detail["supermarket_product_details"])
+        self.assertEqual(6, scraper.parse_pool.get_statistics()["parsed"])
+
+    # Test case for checking that detail pages are parsed here when the parse pool can't take them or fails to parse
+    def test_scrape_product_details_parse_pool_fails(self):
+        aldi = Aldi()
+        html = (Path(__file__).parent / "fixtures" / "aldi_detail.html").read_text(encoding="utf-8")
+        products = [Mock(id=product_id, product_part_url=f"/p/{product_id}", product_name=f"Product {product_id}")
+                    for product_id in range(2)]
+        failed_parse = Future()
+        failed_parse.set_exception(RuntimeError("worker died"))
+
+        for parse_pool in [Mock(**{"submit.side_effect": RuntimeError("pool is broken")}),
+                           Mock(**{"submit.return_value": failed_parse})]:
+            mock_database = Mock()
+            scraper = Scraper([aldi], mock_database, politeness_delay=0)
+            scraper.parse_pool = parse_pool
+            with patch.object(scraper, "fetch", return_value=html):
+                scraper.scrape_product_details(aldi, products)
+
+            # Check every product still gets the details parsing the page on this thread would give
+            written = [detail for call in mock_database.add_product_details_batch.call_args_list
+                       for detail in call.args[0]]
+            self.assertEqual([aldi.filter_product_details(html)] * 2,
+                             [detail["supermarket_product_details"] for detail in written],
+                             msg=f"Details should be parsed here when {parse_pool.submit} fails")
+
+    # Test case for checking that listing pages handed to the parse pool are written in the order they were fetched
+    def test_write_parsed_listings_parse_pool(self):
+        aldi = Aldi()
+        html = (Path(__file__).parent / "fixtures" / "aldi_listing.html").read_text(encoding="utf-8")
+        expected = aldi.filter_products(html)
+        mock_database = Mock()
+        mock_database.add_supermarket_category_products.return_value = {"New": len(expected)}
+
+        scraper = Scraper([aldi], mock_database, parse_workers=2, parse_queue_size=2)
+        try:
+            parsing_pages = [(scraper.submit_listing(aldi, html), html) for _ in range(3)]
+            listed_products = scraper.write_parsed_listings(aldi, 7, parsing_pages, wait=True)
+        finally:
+            scraper.parse_pool.close()
+
+        # Check every page was parsed in a worker and its products written for the category
+        self.assertEqual([], parsing_pages)
+        self.assertEqual(3 * len(expected), listed_products)
+        self.assertEqual([{"supermarket_category_id": 7, "supermarket_category_products": expected}] * 3,
+                         [call.args[0] for call in mock_database.add_supermarket_category_products.call_args_list])
+        self.assertEqual(3, scraper.parse_pool.get_statistics()["parsed"])
+
+    # Test case for checking that without a parse pool listing pages are parsed as they are handed over
+    def test_write_parsed_listings_inline(self):
+        aldi = Aldi()
+        html = (Path(__file__).parent / "fixtures" / "aldi_listing.html").read_text(encoding="utf-8")
+        scraper = Scraper([aldi], Mock())
+
+        parsing_pages = [(scraper.submit_listing(aldi, html), html)]
+        self.assertTrue(parsing_pages[0][0].done())
+        self.assertEqual(len(aldi.filter_products(html)), scraper.write_parsed_listings(aldi, 7, parsing_pages))
+
+    # Test case for checking that buffered details are written once the flush interval has passed
+    def test_write_product_details_flush_interval(self):
+        mock_database = Mock()
+        scraper = Scraper([], mock_database, detail_flush_size=100, detail_flush_interval=60)
+        product = Mock(id=1, tile_hash="hash")
+
+        scraper.write_product_details(product, {"energy_kj": 1.0})
+        mock_database.add_product_details_batch.assert_not_called()
+
+        scraper.detail_flushed_at -= 60
+        scraper.write_product_details(Mock(id=2, tile_hash="hash"), {"energy_kj": 1.0})
+        self.assertEqual(2, len(mock_database.add_product_details_batch.call_args.args[0]))
+
+    @patch('scraper.Scraper.get_html', return_value='<html><body><p>Browser HTML</p></body></html>')
+    @patch('scraper.Scraper.get_http', return_value='<html><body><p>HTTP HTML</p></body></html>')
+    def test_fetch_uses_http_when_valid(self, mock_get_http, mock_get_html):
+        supermarket = Mock()
+        supermarket.name = "Aldi"
+        supermarket.get_fetch_strategy.return_value = "http"
+        supermarket.validate_html.return_value = True
+        scraper = Scraper([], None)
+
+        html = scraper.fetch('https://groceries.aldi.co.uk', supermarket=supermarket, page_type="category")
+
+        # Check the browser wasn't needed and the HTTP path was recorded
+        self.assertEqual(mock_get_http.return_value, html)
+        mock_get_html.assert_not_called()
+        self.assertEqual(1, scraper.fetch_paths[("Aldi", "category", "http")])
+
+    @patch('scraper.Scraper.get_page', return_value='<html><body><p>Browser HTML</p></body></html>')
+    @patch('scraper.Scraper.get_http', return_value='<html><body><p>Loading...</p></body></html>')
+    def test_fetch_falls_back_to_browser(self, mock_get_http, mock_get_page):
+        supermarket = Mock()
+        supermarket.name = "Aldi"
+        supermarket.get_fetch_strategy.return_value = "http"
+        supermarket.validate_html.return_value = False
+        scraper = Scraper([], None)
+
+        html = scraper.fetch('https://groceries.aldi.co.uk/en-GB/bakery?&page=2', supermarket=supermarket,
+                             page_type="listing", paginated=True)
+
+        # Check the browser served the page after the HTTP response failed validation
+        self.assertEqual(mock_get_page.return_value, html)
+        self.assertEqual(1, scraper.fetch_paths[("Aldi", "listing", "browser")])
+        self.assertEqual(0, scraper.fetch_paths[("Aldi", "listing", "http")])
+
+    @patch('scraper.Scraper.get_http')
+    @patch('scraper.Scraper.get_html')
+    def test_fetch_replays_from_cache(self, mock_get_html, mock_get_http):
+        cache = Mock()
+        cache.get.side_effect = lambda url, ignore_ttl: '<html></html>' if url.endswith("bakery?") else None
+        scraper = Scraper([], None, cache=cache, replay=True)
+
+        cached_html = scraper.fetch('https://groceries.aldi.co.uk/en-GB/bakery?', supermarket=Aldi(),
+                                    page_type="listing")
+        missing_html = scraper.fetch('https://groceries.aldi.co.uk/en-GB/frozen?', supermarket=Aldi(),
+                                     page_type="listing")
+
+        # Check pages only come from the cache and nothing is fetched over the network when replaying
+        self.assertEqual('<html></html>', cached_html)
+        self.assertIsNone(missing_html)
+        cache.get.assert_called_with('https://groceries.aldi.co.uk/en-GB/frozen?', ignore_ttl=True)
+        mock_get_http.assert_not_called()
+        mock_get_html.assert_not_called()
+
+    def test_select_products_for_details(self):
+        # Mock products that are new, unchanged, stale and changed since their details were fetched
+        now = datetime.now()
+        products = [Mock(id=1, tile_hash="a"), Mock(id=2, tile_hash="b"), Mock(id=3, tile_hash="c"),
+                    Mock(id=4, tile_hash="d")]
+        mock_database = Mock()
+        mock_database.get_product_detail_states.return_value = {
+            2: {"last_updated": now, "tile_hash": "b"},
+            3: {"last_updated": now - timedelta(days=30), "tile_hash": "c"},
+            4: {"last_updated": now, "tile_hash": "changed"},
+        }
+        scraper = Scraper([], mock_database)
+
+        selected_products = scraper.select_products_for_details(products)
+
+        # Check only the unchanged product with recent details is skipped
+        self.assertEqual([1, 3, 4], [product.id for product in selected_products])
+        self.assertEqual({"New": 1, "Refreshed": 2, "Skipped": 1}, scraper.detail_statistics)
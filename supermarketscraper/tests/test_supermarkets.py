@@ -1,7 +1,15 @@
+import re
+from pathlib import Path
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from supermarkets import Supermarkets
 from database import Database
+from aldi import Aldi
+from iceland import Iceland
+from morrisons import Morrisons
+from tesco import Tesco
+
+fixtures = Path(__file__).parent / "fixtures"
 
 
 class TestSupermarkets(TestCase):
@@ -552,3 +560,56 @@ class TestSupermarkets(TestCase):
         except re.error:
             valid_regex = False
         self.assertTrue(valid_regex)
+
+    def test_get_fetch_strategy_default(self):
+        # Test get_fetch_strategy method uses the browser unless a supermarket knows its pages can be fetched over HTTP
+        self.assertEqual("browser", self.supermarkets.get_fetch_strategy("listing"))
+
+    def test_get_fetch_strategy_per_supermarket(self):
+        # Test get_fetch_strategy method loads Iceland's product pages, whose nutrition arrives later, in the browser
+        self.assertEqual("browser", Iceland().get_fetch_strategy("detail"))
+        self.assertEqual("http", Iceland().get_fetch_strategy("listing"))
+        for supermarket in [Aldi(), Morrisons(), Tesco()]:
+            self.assertEqual("http", supermarket.get_fetch_strategy("detail"), msg=supermarket.name)
+
+    def test_validate_html_markers(self):
+        # Test validate_html method accepts each supermarket's saved pages without filtering them, and rejects pages
+        # missing their content
+        for supermarket in [Aldi(), Morrisons(), Iceland(), Tesco()]:
+            for file_type, page_type in [("categories", "category"), ("listing", "listing"), ("detail", "detail")]:
+                html = (fixtures / f"{supermarket.name.lower()}_{file_type}.html").read_text(encoding="utf-8")
+                with patch.object(supermarket, "parse_html") as parse_html:
+                    self.assertTrue(supermarket.validate_html(html, page_type), msg=f"{supermarket.name} {page_type}")
+                    self.assertFalse(supermarket.validate_html("<html><body>Loading...</body></html>", page_type),
+                                     msg=f"{supermarket.name} {page_type}")
+                parse_html.assert_not_called()
+
+    def test_validate_html_with_none_html(self):
+        # Test validate_html method rejects missing HTML
+        self.assertFalse(self.supermarkets.validate_html(None, "category"))
+
+    def test_validate_html_without_products(self):
+        # Test validate_html method rejects a listing page where no products could be filtered
+        html = "<div class='product'>Product 1</div>"
+        self.assertFalse(self.supermarkets.validate_html(html, "listing"))
+
+    def test_get_pattern_compiled_once(self):
+        # Test get_pattern method returns the same compiled regular expression every time it is asked for
+        pattern = self.supermarkets.get_pattern(r"\d+g")
+        self.assertIs(pattern, self.supermarkets.get_pattern(r"\d+g"))
+        self.assertIsNot(pattern, self.supermarkets.get_pattern(r"\d+g", re.IGNORECASE))
+        self.assertEqual(["400g"], pattern.findall("Bread 400g"))
+
+    def test_find_allergens(self):
+        # Test find_allergens method finds each allergen once, as whole words in any case
+        allergens = self.supermarkets.find_allergens("Contains: Shellfish, EGGS, Milk and milk; may contain peanuts.")
+        self.assertEqual(["peanuts", "milk", "eggs", "shellfish"], allergens)
+
+    def test_find_allergens_whole_words(self):
+        # Test find_allergens method doesn't find allergens inside other words
+        self.assertEqual([], self.supermarkets.find_allergens("Ryegrass, Fishcake seasoning"))
+        self.assertEqual(["shellfish"], self.supermarkets.find_allergens("shellfish"))
+
+    def test_find_allergens_empty(self):
+        # Test find_allergens method finds nothing in text without allergens
+        self.assertEqual([], self.supermarkets.find_allergens(""))
@@ -0,0 +1,87 @@
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from tesco import Tesco
+
+fixtures = Path(__file__).parent / "fixtures"
+
+
+class TestTesco(TestCase):
+    def setUp(self):
+        self.tesco = Tesco()
+
+    def read_fixture(self, page_type: str) -> str:
+        return (fixtures / f"tesco_{page_type}.html").read_text(encoding="utf-8")
+
+    # Test case for checking the initialization of Tesco class
+    def test_init(self):
+        self.assertEqual(self.tesco.name, "Tesco", msg="Supermarket name has changed")
+        self.assertEqual(self.tesco.base_url, "https://www.tesco.com/groceries/",
+                         msg="Supermarket base url has changed")
+
+    # Test case for testing the build_url method
+    def test_build_url(self):
+        url = "https://www.tesco.com/groceries/en-GB/shop/bakery/all"
+        expected_url = "https://www.tesco.com/groceries/en-GB/shop/bakery/all?page=2&count=48"
+        self.assertEqual(expected_url, self.tesco.build_url(url, 2),
+                         msg="The result of incrementing the url is incorrect")
+
+    # Test case for testing the filter_categories method
+    def test_filter_categories(self):
+        categories = self.tesco.filter_categories(self.read_fixture("categories"))
+        self.assertEqual([{'name': 'fresh food', 'part_url': 'en-GB/shop/fresh-food/all'},
+                          {'name': 'bakery', 'part_url': 'en-GB/shop/bakery/all'},
+                          {'name': 'frozen food', 'part_url': 'en-GB/shop/frozen-food/all'},
+                          {'name': 'drinks', 'part_url': 'en-GB/shop/drinks/all'}], categories,
+                         msg="Categories should be the department links, named after their URLs")
+
+    # Test case for testing the filter_categories method with None HTML
+    def test_filter_categories_none(self):
+        self.assertEqual([], self.tesco.filter_categories(None))
+
+    # Test case for testing the filter_products method
+    def test_filter_products(self):
+        products = self.tesco.filter_products(self.read_fixture("listing"))
+
+        self.assertEqual(24, len(products), msg="Every product tile should be filtered")
+        self.assertEqual({'name': 'Warburtons Toastie White Bread 800g', 'price': 5.86,
+                          'image': 'https://digitalcontent.api.tesco.com/v2/media/ghs/0.jpeg',
+                          'part_url': 'en-GB/products/300000000'}, products[0],
+                         msg="The first product's fields should all be filtered from its tile")
+        for product in products:
+            self.assertEqual({'name', 'price', 'image', 'part_url'}, set(product),
+                             msg="Every product should have a name, price, image and part-URL")
+
+    # Test case for checking that the listing page is parsed once rather than once per field
+    def test_filter_products_single_parse(self):
+        with patch.object(self.tesco, "parse_html", wraps=self.tesco.parse_html) as parse_html:
+            self.tesco.filter_products(self.read_fixture("listing"))
+        self.assertEqual(1, parse_html.call_count, msg="The listing page should only be parsed once")
+
+    # Test case for testing the filter_products method with None HTML
+    def test_filter_products_none(self):
+        self.assertEqual([], self.tesco.filter_products(None))
+
+    # Test case for testing the filter_product_details method
+    def test_filter_product_details(self):
+        product_details = self.tesco.filter_product_details(self.read_fixture("detail"))
+        expected_values = {'energy_kj': 1046.0, 'energy_kcal': 247.0, 'fat': 2.1, 'of_which_saturates': 0.5,
+                           'carbohydrates': 45.6, 'of_which_sugars': 3.2, 'fibre': 2.8, 'protein': 9.1, 'salt': 1.0}
+
+        self.assertEqual(expected_values, {key: value for key, value in product_details.items()
+                                           if key != 'allergens'}, msg="Nutritional values should be per 100g")
+        self.assertEqual(['milk', 'sesame', 'soya', 'wheat'], sorted(product_details['allergens']),
+                         msg="Allergens should only come from the ingredients and allergy information")
+
+    # Test case for checking that energy split over two rows is still read
+    def test_format_nutritional_information_energy_rows(self):
+        soup = self.tesco.parse_html("<table><tbody><tr><td>Energy</td><td>560kJ</td></tr>"
+                                     "<tr><td></td><td>133kcal</td></tr><tr><td>Fat</td><td>4.1g</td></tr>"
+                                     "<tr><td>Salt</td><td>&lt;0.01g</td></tr></tbody></table>")
+        self.assertEqual(['560', '133', '4.1', '0', '0', '0', '0', '0', '0.01'],
+                         self.tesco.format_nutritional_information(soup.find('tbody')))
+
+    # Test case for testing the filter_product_details method with None HTML
+    def test_filter_product_details_none(self):
+        self.assertIsNone(self.tesco.filter_product_details(None))
@@ -0,0 +1,55 @@
+import threading
+import time
+from unittest import TestCase
+
+from throttle import HostThrottle
+
+
+class TestHostThrottle(TestCase):
+    # Test case for checking that requests to the same host are spaced out by the politeness delay
+    def test_delay_between_requests(self):
+        throttle = HostThrottle(max_concurrency=2, delay=0.05)
+        start_time = time.monotonic()
+
+        for _ in range(3):
+            with throttle.request("https://groceries.aldi.co.uk/en-GB/bakery"):
+                pass
+
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.1,
+                                msg="Three requests should take at least two politeness delays")
+
+    # Test case for checking that different hosts do not delay each other
+    def test_hosts_independent(self):
+        throttle = HostThrottle(max_concurrency=1, delay=10)
+        start_time = time.monotonic()
+
+        with throttle.request("https://groceries.aldi.co.uk"):
+            pass
+        with throttle.request("https://www.iceland.co.uk"):
+            pass
+
+        self.assertLess(time.monotonic() - start_time, 1, msg="Requests to different hosts should not wait")
+
+    # Test case for checking that no more than the maximum number of requests run against a host at once
+    def test_max_concurrency(self):
+        throttle = HostThrottle(max_concurrency=2, delay=0)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def request():
+            with throttle.request("https://groceries.morrisons.com/browse"):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 2, msg="At most two requests should be active for one host")
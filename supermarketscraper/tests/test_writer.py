@@ -0,0 +1,90 @@
+import queue
+from unittest import TestCase
+from unittest.mock import patch, Mock
+
+from aldi import Aldi
+from writer import DatabaseWriter, QueuedDatabase
+
+
+class TestWriter(TestCase):
+    def setUp(self):
+        self.write_queue = queue.Queue()
+        self.reply_queue = queue.Queue()
+
+    # Test case for checking that detail writes are buffered and sent as batches
+    @patch('writer.Database')
+    def test_detail_writes_batched(self, mock_database):
+        database = QueuedDatabase(self.write_queue, self.reply_queue, worker_name="Aldi", batch_size=3)
+
+        for product_id in range(3):
+            database.add_product_information({"supermarket_product_id": product_id})
+
+        worker_name, batch, wait = self.write_queue.get_nowait()
+        self.assertEqual("Aldi", worker_name)
+        self.assertEqual(3, len(batch), msg="Three writes should be sent as one batch")
+        self.assertFalse(wait, msg="Detail writes should not wait for the writer")
+        self.assertTrue(self.write_queue.empty())
+
+    # Test case for checking that writes which are read back wait for the writer's acknowledgement
+    @patch('writer.Database')
+    def test_category_writes_acknowledged(self, mock_database):
+        database = QueuedDatabase(self.write_queue, self.reply_queue, worker_name="Aldi")
+        database.add_product_information({"supermarket_product_id": 1})
+        self.reply_queue.put(([None, None], []))
+
+        database.add_supermarket_category({"supermarket_id": 1, "supermarket_categories": []})
+
+        worker_name, batch, wait = self.write_queue.get_nowait()
+        self.assertEqual(["add_product_information", "add_supermarket_category"], [name for name, _ in batch],
+                         msg="Buffered writes should be flushed ahead of the acknowledged write")
+        self.assertTrue(wait)
+        self.assertTrue(self.reply_queue.empty(), msg="The acknowledgement should have been consumed")
+
+    # Test case for checking that supermarkets are sent as plain values
+    @patch('writer.Database')
+    def test_add_supermarket_sends_plain_values(self, mock_database):
+        database = QueuedDatabase(self.write_queue, self.reply_queue, worker_name="Aldi")
+        self.reply_queue.put(([None, None], []))
+
+        database.add_supermarket([Aldi()])
+
+        _, batch, _ = self.write_queue.get_nowait()
+        supermarket = batch[0][1][0][0]
+        self.assertEqual("Aldi", supermarket.name)
+        self.assertFalse(hasattr(supermarket, "categories"), msg="Only the supermarket's columns should be sent")
+
+    # Test case for checking that the writer applies batches and reports errors without stopping
+    def test_writer_applies_batches(self):
+        reply_queues = {"Aldi": queue.Queue()}
+        writer = DatabaseWriter(self.write_queue, reply_queues)
+        writer.database = Mock()
+        writer.database.add_product_information.side_effect = KeyError("fat")
+
+        results, errors = writer.apply([("add_product_information", ({},)),
+                                        ("add_product_allergy_information", ({},))])
+
+        self.assertEqual(1, len(errors), msg="The failing write should be reported")
+        self.assertEqual(2, len(results), msg="Every write should have a result")
+        writer.database.add_product_allergy_information.assert_called_once_with({})
+
+    # Test case for checking that the result of an acknowledged write is returned to the worker
+    @patch('writer.Database')
+    def test_acknowledged_write_returns_result(self, mock_database):
+        database = QueuedDatabase(self.write_queue, self.reply_queue, worker_name="Aldi")
+        self.reply_queue.put(([{"New": 3, "Updated": 0, "Deleted": 0}], []))
+
+        statistics = database.add_supermarket_category_products(
+            {"supermarket_category_id": 1, "supermarket_category_products": []})
+
+        self.assertEqual({"New": 3, "Updated": 0, "Deleted": 0}, statistics)
+
+    # Test case for checking that a batch of details is sent to the writer without waiting for more writes
+    @patch('writer.Database')
+    def test_detail_batch_sent_immediately(self, mock_database):
+        database = QueuedDatabase(self.write_queue, self.reply_queue, worker_name="Aldi", batch_size=50)
+
+        database.add_product_details_batch([{"supermarket_product_id": 1}])
+
+        _, batch, wait = self.write_queue.get_nowait()
+        self.assertEqual(["add_product_details_batch"], [name for name, _ in batch])
+        self.assertFalse(wait)
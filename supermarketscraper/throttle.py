@@ -0,0 +1,43 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+
+class HostThrottle:
+    def __init__(self, max_concurrency: int = 2, delay: float = 1.0):
+        # Initialise the number of requests allowed per host at once and the gap between request starts
+        self.max_concurrency = max_concurrency
+        self.delay = delay
+        self.semaphores = {}
+        self.next_request_times = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def request(self, url: str):
+        # Hold one of the host's request slots for the duration of a with block
+        host = urlparse(url).netloc
+        semaphore = self.get_semaphore(host)
+        with semaphore:
+            self.wait_turn(host)
+            yield
+
+    def get_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        # Method to get the semaphore limiting concurrent requests to a host
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.max_concurrency)
+            return self.semaphores[host]
+
+    def wait_turn(self, host: str) -> None:
+        # Method to reserve the host's next request time and sleep until it arrives
+        with self.lock:
+            now = time.monotonic()
+            start_time = max(now, self.next_request_times.get(host, now))
+            self.next_request_times[host] = start_time + self.delay
+
+        if start_time > now:
+            time.sleep(start_time - now)
@@ -0,0 +1,135 @@
+import logging
+from types import SimpleNamespace
+
+from database import Database
+
+log = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    def __init__(self, write_queue, reply_queues: dict):
+        # Initialise the queue batches arrive on and the queues used to acknowledge them
+        self.write_queue = write_queue
+        self.reply_queues = reply_queues
+        self.database = None
+
+    def run(self) -> None:
+        # Method to own the database connection and apply batches until a stop message arrives
+        self.database = Database()
+        batches = 0
+
+        while True:
+            message = self.write_queue.get()
+            if message is None:
+                break
+
+            worker_name, batch, wait = message
+            results, errors = self.apply(batch)
+            batches += 1
+
+            if wait:
+                self.reply_queues[worker_name].put((results, errors))
+
+        log.info(f"Database writer finished after applying {batches} batches")
+
+    def apply(self, batch: list) -> tuple:
+        # Method to apply each write in a batch, collecting results and errors rather than stopping the writer
+        results = []
+        errors = []
+        for method_name, data in batch:
+            try:
+                results.append(getattr(self.database, method_name)(*data))
+            except Exception as e:
+                log.error(f"Error applying {method_name}: {e}")
+                self.database.session.rollback()
+                results.append(None)
+                errors.append(f"{method_name}: {e}")
+        return results, errors
+
+
+class QueuedDatabase:
+    def __init__(self, write_queue, reply_queue, worker_name: str, batch_size: int = 50):
+        # Reads go to a local connection while writes are sent to the writer process
+        self.reader = Database()
+        self.session = self.reader.session
+        self.write_queue = write_queue
+        self.reply_queue = reply_queue
+        self.worker_name = worker_name
+        self.batch_size = batch_size
+        self.pending = []
+
+    def get_table_object(self, table_name):
+        # Method to get metadata object for a given table name from the local connection
+        return self.reader.get_table_object(table_name)
+
+    def get_product_detail_states(self, product_ids: list) -> dict:
+        return self.reader.get_product_detail_states(product_ids)
+
+    def add_supermarket(self, supermarkets):
+        # Supermarket objects hold database handles, so only the columns the writer needs are sent
+        supermarkets = [SimpleNamespace(name=supermarket.name, logo=supermarket.logo, base_url=supermarket.base_url)
+                        for supermarket in supermarkets]
+        return self.submit("add_supermarket", supermarkets, wait=True)
+
+    def add_supermarket_category(self, data):
+        # Categories are read back straight away, so wait for them to be written
+        return self.submit("add_supermarket_category", data, wait=True)
+
+    def add_supermarket_category_products(self, data):
+        # Products are read back for the detail stage, so wait for them to be written
+        return self.submit("add_supermarket_category_products", data, wait=True)
+
+    def mark_unavailable_products(self, category_id, seen_since):
+        return self.submit("mark_unavailable_products", category_id, seen_since, wait=True)
+
+    def build_product_groups(self):
+        return self.submit("build_product_groups", wait=True)
+
+    def bump_catalogue_generation(self):
+        return self.submit("bump_catalogue_generation", wait=True)
+
+    def add_product_information(self, data):
+        return self.submit("add_product_information", data, wait=False)
+
+    def add_product_allergy_information(self, data):
+        return self.submit("add_product_allergy_information", data, wait=False)
+
+    def add_product_details_batch(self, data):
+        # The scraper has already buffered these details, so send them to the writer straight away
+        self.pending.append(("add_product_details_batch", (data,)))
+        self.flush(wait=False)
+
+    def submit(self, method_name: str, *data, wait: bool):
+        # Method to buffer a write, sending the buffer once it is full or when the write must be acknowledged, in
+        # which case the write's result is returned
+        self.pending.append((method_name, data))
+        if wait or len(self.pending) >= self.batch_size:
+            results = self.flush(wait=wait)
+            if results:
+                return results[-1]
+        return None
+
+    def flush(self, wait: bool = True) -> list:
+        # Method to send the buffered writes to the writer process, returning their results if waiting for them
+        if not self.pending:
+            return []
+
+        self.write_queue.put((self.worker_name, self.pending, wait))
+        self.pending = []
+
+        if not wait:
+            return []
+
+        results, errors = self.reply_queue.get()
+        for error in errors:
+            log.error(f"Writer reported an error for {self.worker_name}: {error}")
+        return results
+
+    def close(self) -> None:
+        # Method to send any remaining writes and wait for them to be applied
+        self.flush(wait=True)
+
+
+def run_writer(write_queue, reply_queues: dict) -> None:
+    # Entry point for the writer process
+    DatabaseWriter(write_queue, reply_queues).run()